@@ -1,10 +1,22 @@
-from flask import Flask, request, redirect, url_for, render_template, session, make_response, jsonify
+from flask import Flask, request, redirect, url_for, render_template, session, make_response, jsonify, g, has_app_context, Response
+from flask import before_render_template, template_rendered, has_request_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
-import sqlite3, os, csv, io, calendar
+import sqlite3, os, io, calendar, threading, time, json, collections, zipfile, multiprocessing, uuid
+import logging, re, sys, cProfile, pstats, marshal, tracemalloc
+from logging.handlers import RotatingFileHandler
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import click
 from functools import wraps
 from datetime import date, datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
+import migrate
+import report_engine
+from report_engine import (compute_period_minutes, iter_days_in_range, history_range,
+                           report_days, report_csv_rows, fmt_hhmm, encode_csv_chunks)
+
+_IMPORT_T0 = time.perf_counter()   # Boot-Zeit (siehe _BOOT am Dateiende)
 
 # ---- Aktionen (DB-Keys + Anzeige-Labels) ----
 ACTIONS = [
@@ -24,6 +36,26 @@ ACTION_LABELS = {
     "mache weiter": "Mache weiter", "pausenende": "Mache weiter",
 }
 
+# Neue Buchung "jetzt": ts/local_day aus demselben 'now' wie created_at (stabil pro Statement)
+BOOKING_INSERT_NOW_SQL = """
+    INSERT INTO bookings (user_id, action, created_at, note, ts, local_day)
+    VALUES (?, ?, datetime('now'), ?, CAST(strftime('%s','now') AS INTEGER), date('now','localtime'))
+"""
+# Buchung mit vorgegebener UTC-Zeit (Group-Commit-Writer, Spool-Nachtrag)
+BOOKING_INSERT_AT_SQL = """
+    INSERT INTO bookings (user_id, action, created_at, note, ts, local_day)
+    VALUES (?, ?, ?, ?, CAST(strftime('%s', ?) AS INTEGER), date(?, 'localtime'))
+"""
+# Fallback für DBs mit altem CHECK auf den früheren Aktions-Keys
+MAP_NEW_TO_OLD = {
+    "bin da": "kommt",
+    "gehe": "geht",
+    "afk": "abwesend",
+    "wieder da": "wieder_da",
+    "päuschen": "pause",
+    "mache weiter": "pausenende",
+}
+
 load_dotenv()
 
 # ---- Zeitzone: Europe/Berlin erzwingen (für SQLite localtime etc.) ----
@@ -59,88 +91,649 @@ try:
 except OSError:
     pass
 
-DB_PATH = os.path.join(app.instance_path, "users.db")
-
-def get_db():
-    conn = sqlite3.connect(DB_PATH, timeout=15)
+DB_PATH = os.getenv("DB_PATH") or os.path.join(app.instance_path, "users.db")
+
+# ---- DB-Pool ----------------------------------------------------------------
+# Ein Pool pro Worker-Prozess. Größe = Threads pro gthread-Worker (Procfile --threads),
+# damit jeder Request-Thread eine Verbindung bekommt, ohne zu warten.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_TIMEOUT   = 15
+
+# SQLite-Profil je Verbindung (per Env anpassbar). mmap spart read()-Kopien,
+# cache_size negativ = KiB pro Verbindung, Temp-B-Trees im RAM.
+SQLITE_PROFILE = {
+    "mmap_size":    int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size":   -int(os.getenv("SQLITE_CACHE_KB", "16384")),
+    "temp_store":   os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", str(DB_TIMEOUT * 1000))),
+}
+# wirkt nur beim Anlegen einer neuen DB (bestehende: flask --app app enable-auto-vacuum)
+SQLITE_AUTO_VACUUM = os.getenv("SQLITE_AUTO_VACUUM", "INCREMENTAL")
+
+def _open_connection():
+    """Neue SQLite-Verbindung; PRAGMAs nur einmal pro Verbindung."""
+    fresh = not os.path.exists(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT, check_same_thread=False,
+                           factory=_PooledConnection)
     conn.row_factory = sqlite3.Row
+    pragma = sqlite3.Connection.execute      # ungemessen (nicht in Metriken/Slow-Log)
     try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA synchronous=NORMAL;")
+        if fresh and SQLITE_AUTO_VACUUM:
+            pragma(conn, f"PRAGMA auto_vacuum = {SQLITE_AUTO_VACUUM}")   # vor WAL/erster Tabelle
+        pragma(conn, "PRAGMA journal_mode=WAL;")
+        pragma(conn, "PRAGMA synchronous=NORMAL;")
+        for name, value in SQLITE_PROFILE.items():
+            pragma(conn, f"PRAGMA {name} = {value}")
     except Exception:
         pass
+    if METRICS_ENABLED:
+        conn.set_trace_callback(_trace_statement)
     return conn
 
-def init_db():
-    first_time = not os.path.exists(DB_PATH)
-    conn = get_db()
+class _PooledConnection(sqlite3.Connection):
+    """close() gibt die Verbindung an den Pool zurück statt sie zu schließen.
+
+    Innerhalb eines App-Contexts ist die Verbindung an g gebunden (_scoped) –
+    dann ist close() ein No-op und erst das Teardown gibt sie zurück.
+    """
+    _pool = None
+    _scoped = False
+
+    # Im Request (Metriken aktiv) liefern execute*() einen _TimedCursor, der
+    # SQL-Zeit und gelesene Zeilen dem laufenden Request zuschreibt.
+    def execute(self, sql, params=()):
+        if getattr(_req_metrics, "m", None) is None:
+            return sqlite3.Connection.execute(self, sql, params)
+        return self.cursor(_TimedCursor).execute(sql, params)
+
+    def executemany(self, sql, seq):
+        if getattr(_req_metrics, "m", None) is None:
+            return sqlite3.Connection.executemany(self, sql, seq)
+        return self.cursor(_TimedCursor).executemany(sql, seq)
+
+    def cursor(self, factory=None):
+        # auch explizite conn.cursor() (z. B. admin_resolve) zählen mit
+        if factory is None:
+            factory = sqlite3.Cursor if getattr(_req_metrics, "m", None) is None else _TimedCursor
+        return super().cursor(factory)
+
+    def close(self):
+        if self._scoped:
+            return
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            sqlite3.Connection.close(self)
+
+class _ConnectionPool:
+    def __init__(self, size):
+        self.size = max(1, size)
+        self._idle = []            # LIFO: zuletzt benutzte Verbindung zuerst (warmer Cache)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "wait_ms": 0.0, "discarded": 0}
+
+    def _check_fork(self):
+        # Nach fork() (gunicorn --preload) keine Verbindungen des Masters weiterverwenden.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._open = 0
+
+    def acquire(self):
+        t0 = time.perf_counter()
+        waited = False
+        with self._cond:
+            self._check_fork()
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    self.stats["hits"] += 1
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    self.stats["misses"] += 1
+                    break
+                waited = True
+                remaining = DB_TIMEOUT - (time.perf_counter() - t0)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise sqlite3.OperationalError("DB-Pool erschöpft (keine freie Verbindung)")
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_ms"] += (time.perf_counter() - t0) * 1000.0
+        if conn is None:
+            try:
+                conn = _open_connection()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            conn._pool = self
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            sqlite3.Connection.close(conn)
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self.stats["discarded"] += 1
+            self._cond.notify()
+
+    def close_idle(self):
+        """Leerlauf-Verbindungen schließen (Master nach init_db, vor dem fork)."""
+        with self._cond:
+            self._check_fork()
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            try:
+                sqlite3.Connection.close(conn)
+            except sqlite3.Error:
+                pass
 
-    # Users (mit weekly_minutes)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('admin','user')),
-            weekly_minutes INTEGER DEFAULT 2400
-        )
-    """)
+    def snapshot(self):
+        with self._cond:
+            total = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats,
+                        wait_ms=round(self.stats["wait_ms"], 1),
+                        size=self.size, open=self._open, idle=len(self._idle),
+                        hit_ratio=round(self.stats["hits"] / total, 3) if total else None)
 
-    # Journal
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS journal_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            entry_date TEXT NOT NULL,         -- YYYY-MM-DD
-            content   TEXT NOT NULL,
-            created_at TEXT NOT NULL DEFAULT (datetime('now')),
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    """)
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_user_date ON journal_entries(user_id, entry_date)")
+_db_pool = _ConnectionPool(DB_POOL_SIZE)
 
-    # Bookings
+def get_db():
+    """Verbindung aus dem Pool; im Request/App-Context eine Verbindung pro Context."""
+    if has_app_context():
+        conn = g.get("_db")
+        if conn is None:
+            conn = _db_pool.acquire()
+            conn._scoped = True
+            g._db = conn
+        return conn
+    return _db_pool.acquire()
+
+# ---- Metriken (Prometheus-Textformat unter /admin/metrics) --------------------
+# Pro Request: Gesamtzeit, SQL-Zeit (execute + fetch), Jinja-Zeit, Rest = Python.
+# Statements zählt der sqlite3-Trace-Callback (inkl. implizitem BEGIN/COMMIT).
+# Die Werte gelten pro Worker-Prozess (Label "worker"); die Threads eines
+# gthread-Workers schreiben unter einem Lock in dieselbe Registry.
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS   = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_req_metrics = threading.local()     # .m = dict des laufenden Requests (oder None)
+
+def _trace_statement(_sql):
+    m = getattr(_req_metrics, "m", None)
+    if m is not None:
+        m["queries"] += 1
+
+class _TimedCursor(sqlite3.Cursor):
+    _sql = None
+    _params = ()
+    _elapsed = 0.0
+    _logged = True
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            dt = time.perf_counter() - t0
+            m = getattr(_req_metrics, "m", None)
+            if m is not None:
+                m["sql_s"] += dt
+            # Statement-Zeit = execute + alle fetches; einmal loggen, sobald die Schwelle fällt
+            self._elapsed += dt
+            if not self._logged and self._elapsed >= SLOW_QUERY_S:
+                self._logged = True
+                _log_slow_query(self.connection, self._sql, self._params, self._elapsed)
+
+    def _start(self, sql, params):
+        self._sql, self._params, self._elapsed = sql, params, 0.0
+        self._logged = SLOW_QUERY_S <= 0
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        return self._timed(super().execute, sql, params)
+
+    def executemany(self, sql, seq):
+        self._start(sql, None)
+        return self._timed(super().executemany, sql, seq)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None:
+            _count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size if size is not None else self.arraysize)
+        _count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        _count_rows(len(rows))
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        _count_rows(1)
+        return row
+
+def _count_rows(n):
+    m = getattr(_req_metrics, "m", None)
+    if m is not None:
+        m["rows"] += n
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        for i, b in enumerate(self.buckets):
+            if v <= b:
+                self.counts[i] += 1
+                break
+        self.sum += v
+        self.count += 1
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = collections.Counter()      # (endpoint, method, status) -> n
+        self.latency = {}                          # endpoint -> _Histogram (Sekunden)
+        self.queries = {}                          # endpoint -> _Histogram (Statements/Request)
+        self.phase_s = collections.Counter()       # (endpoint, phase) -> Sekunden
+        self.rows = collections.Counter()          # endpoint -> gelesene Zeilen
+        self.busy = collections.Counter()          # endpoint -> "database is locked" (-> 503)
+
+    def record(self, endpoint, method, status, m, total_s):
+        sql_s, tpl_s = m["sql_s"], m["tpl_s"]
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            h = self.latency.get(endpoint)
+            if h is None:
+                h = self.latency[endpoint] = _Histogram(LATENCY_BUCKETS)
+                self.queries[endpoint] = _Histogram(QUERY_BUCKETS)
+            h.observe(total_s)
+            self.queries[endpoint].observe(m["queries"])
+            self.phase_s[(endpoint, "sql")] += sql_s
+            self.phase_s[(endpoint, "template")] += tpl_s
+            self.phase_s[(endpoint, "python")] += max(0.0, total_s - sql_s - tpl_s)
+            self.rows[endpoint] += m["rows"]
+
+    def render(self):
+        worker = os.getpid()
+        out = []
+
+        def lbl(**kv):
+            parts = [f'worker="{worker}"']
+            for k, v in kv.items():
+                v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                parts.append(f'{k}="{v}"')
+            return "{" + ",".join(parts) + "}"
+
+        def histogram(name, help_, hists):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} histogram")
+            for ep, h in sorted(hists.items()):
+                acc = 0
+                for b, c in zip(h.buckets, h.counts):
+                    acc += c
+                    out.append(f"{name}_bucket{lbl(endpoint=ep, le=b)} {acc}")
+                out.append(f"{name}_bucket{lbl(endpoint=ep, le='+Inf')} {h.count}")
+                out.append(f"{name}_sum{lbl(endpoint=ep)} {h.sum:.6f}")
+                out.append(f"{name}_count{lbl(endpoint=ep)} {h.count}")
+
+        with self._lock:
+            out.append("# HELP app_requests_total Requests nach Endpoint, Methode und Status.")
+            out.append("# TYPE app_requests_total counter")
+            for (ep, method, status), n in sorted(self.requests.items()):
+                out.append(f"app_requests_total{lbl(endpoint=ep, method=method, status=status)} {n}")
+            histogram("app_request_duration_seconds", "Antwortzeit pro Endpoint.", self.latency)
+            histogram("app_sql_statements_per_request", "SQL-Statements pro Request.", self.queries)
+            out.append("# HELP app_request_phase_seconds_total Zeit pro Endpoint in SQL, Jinja und Python.")
+            out.append("# TYPE app_request_phase_seconds_total counter")
+            for (ep, phase), v in sorted(self.phase_s.items()):
+                out.append(f"app_request_phase_seconds_total{lbl(endpoint=ep, phase=phase)} {v:.6f}")
+            out.append("# HELP app_sql_rows_read_total An Python gelieferte Zeilen pro Endpoint.")
+            out.append("# TYPE app_sql_rows_read_total counter")
+            for ep, n in sorted(self.rows.items()):
+                out.append(f"app_sql_rows_read_total{lbl(endpoint=ep)} {n}")
+            out.append("# HELP app_sqlite_busy_total Requests, die am Schreib-Lock gescheitert sind (503).")
+            out.append("# TYPE app_sqlite_busy_total counter")
+            for ep, n in sorted(self.busy.items()):
+                out.append(f"app_sqlite_busy_total{lbl(endpoint=ep)} {n}")
+
+        pool = _db_pool.snapshot()
+        out.append("# HELP app_db_pool_connections Verbindungen im DB-Pool.")
+        out.append("# TYPE app_db_pool_connections gauge")
+        out.append(f"app_db_pool_connections{lbl(state='open')} {pool['open']}")
+        out.append(f"app_db_pool_connections{lbl(state='idle')} {pool['idle']}")
+        out.append("# HELP app_db_pool_waits_total Acquires, die auf eine freie Verbindung warten mussten.")
+        out.append("# TYPE app_db_pool_waits_total counter")
+        out.append(f"app_db_pool_waits_total{lbl()} {pool['waits']}")
+        out.append("# HELP app_db_pool_wait_seconds_total Wartezeit auf Pool-Verbindungen.")
+        out.append("# TYPE app_db_pool_wait_seconds_total counter")
+        out.append(f"app_db_pool_wait_seconds_total{lbl()} {pool['wait_ms'] / 1000.0:.6f}")
+        out.append("# HELP app_process_start_time_seconds Startzeit des Worker-Prozesses.")
+        out.append("# TYPE app_process_start_time_seconds gauge")
+        out.append(f"app_process_start_time_seconds{lbl()} {self.started:.3f}")
+        return "\n".join(out) + "\n"
+
+_metrics = _Metrics()
+
+# ---- Slow-Query-Log -----------------------------------------------------------
+# Statements über SLOW_QUERY_MS (execute + fetch, im Request) landen als JSON-Zeile
+# in instance/slow_queries.log (rotierend): SQL, Parameter (Strings geschwärzt,
+# außer Datum/Uhrzeit), Dauer, Route und EXPLAIN QUERY PLAN. Alle Worker hängen
+# an dieselbe Datei an; /admin/slow-queries wertet sie aus.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))     # 0 = aus
+SLOW_QUERY_S = SLOW_QUERY_MS / 1000.0
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG") or os.path.join(app.instance_path, "slow_queries.log")
+SLOW_QUERY_LOG_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+_slow_log = logging.getLogger("zeiterfassung.slow_sql")
+_slow_log.propagate = False
+_slow_plans = {}                     # SQL -> Plan-Text (Plan pro Statement nur einmal ermitteln)
+_DATE_LIKE = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2})?)?$")
+
+def _slow_log_handler():
+    if not _slow_log.handlers:
+        h = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES,
+                                backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8", delay=True)
+        h.setFormatter(logging.Formatter("%(message)s"))
+        _slow_log.addHandler(h)
+        _slow_log.setLevel(logging.INFO)
+
+def _redact_param(v):
+    if v is None or isinstance(v, (int, float)):
+        return v
+    if isinstance(v, str):
+        return v if _DATE_LIKE.match(v) else f"<str:{len(v)}>"
+    if isinstance(v, (bytes, memoryview)):
+        return f"<bytes:{len(v)}>"
+    return f"<{type(v).__name__}>"
+
+def _query_plan(conn, sql, params):
+    plan = _slow_plans.get(sql)
+    if plan is None:
+        try:
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+            depth = {0: -1}
+            lines = []
+            for node_id, parent, _, detail in rows:
+                depth[node_id] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node_id] + detail)
+            plan = "\n".join(lines)
+        except sqlite3.Error as e:
+            plan = f"(kein Plan: {e})"
+        if len(_slow_plans) < 500:
+            _slow_plans[sql] = plan
+    return plan
+
+def _log_slow_query(conn, sql, params, elapsed):
+    try:
+        if isinstance(params, dict):
+            shown = {k: _redact_param(v) for k, v in params.items()}
+        else:
+            shown = [_redact_param(v) for v in (params or ())]
+        plan = _query_plan(conn, sql, params) if params is not None else "(executemany)"
+        _slow_log_handler()
+        _slow_log.info(json.dumps({
+            "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "ms": round(elapsed * 1000.0, 1),
+            "route": f"{request.method} {request.endpoint}" if has_request_context() else None,
+            "sql": " ".join(sql.split()),
+            "params": shown,
+            "plan": plan,
+            "worker": os.getpid(),
+        }, ensure_ascii=False))
+    except Exception as e:          # Logging darf den Request nie stören
+        print("slow query log:", e)
+
+def _slow_query_summary(limit=50):
+    """Slow-Log (inkl. rotierter Dateien) nach Statement gruppieren, sortiert nach Gesamtzeit."""
+    groups = {}
+    paths = [SLOW_QUERY_LOG] + [f"{SLOW_QUERY_LOG}.{i}" for i in range(1, SLOW_QUERY_LOG_BACKUPS + 1)]
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                grp = groups.get(e["sql"])
+                if grp is None:
+                    grp = groups[e["sql"]] = {"sql": e["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                              "routes": collections.Counter(), "last_at": "", "plan": e.get("plan"),
+                                              "params": e.get("params")}
+                grp["count"] += 1
+                grp["total_ms"] += e["ms"]
+                if e["ms"] >= grp["max_ms"]:
+                    grp["max_ms"], grp["params"] = e["ms"], e.get("params")
+                if e["at"] >= grp["last_at"]:
+                    grp["last_at"], grp["plan"] = e["at"], e.get("plan")
+                grp["routes"][e.get("route") or "—"] += 1
+    rows = sorted(groups.values(), key=lambda x: x["total_ms"], reverse=True)[:limit]
+    for r in rows:
+        r["avg_ms"] = r["total_ms"] / r["count"]
+        r["scan"] = bool(r["plan"]) and "SCAN " in r["plan"]
+        r["routes"] = r["routes"].most_common(3)
+    return rows
+
+if METRICS_ENABLED or SLOW_QUERY_S > 0:
+    # Request-Kontext für _TimedCursor (Metriken und/oder Slow-Query-Log)
+    @app.before_request
+    def _metrics_start():
+        _req_metrics.m = {"t0": time.perf_counter(), "sql_s": 0.0, "tpl_s": 0.0,
+                          "queries": 0, "rows": 0, "status": 500}
+
+    @app.after_request
+    def _metrics_status(resp):
+        m = getattr(_req_metrics, "m", None)
+        if m is not None:
+            m["status"] = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def _metrics_finish(exc):
+        m = getattr(_req_metrics, "m", None)
+        _req_metrics.m = None
+        if m is None:
+            return
+        if METRICS_ENABLED:
+            endpoint = request.url_rule.endpoint if request.url_rule else "(unbekannt)"
+            _metrics.record(endpoint, request.method, m["status"], m, time.perf_counter() - m["t0"])
+
+    def _template_start(sender, template, context, **extra):
+        m = getattr(_req_metrics, "m", None)
+        if m is not None:
+            m["tpl_t0"] = time.perf_counter()
+
+    def _template_done(sender, template, context, **extra):
+        m = getattr(_req_metrics, "m", None)
+        if m is not None and "tpl_t0" in m:
+            m["tpl_s"] += time.perf_counter() - m.pop("tpl_t0")
+
+    before_render_template.connect(_template_start, app)
+    template_rendered.connect(_template_done, app)
+
+@app.errorhandler(sqlite3.OperationalError)
+def _db_busy(e):
+    # Schreib-Lock nach busy_timeout bzw. keine Pool-Verbindung: 503 + Retry-After statt 500
+    msg = str(e)
+    if not any(k in msg for k in ("locked", "busy", "DB-Pool erschöpft")):
+        raise e
+    endpoint = request.url_rule.endpoint if request.url_rule else "(unbekannt)"
+    with _metrics._lock:
+        _metrics.busy[endpoint] += 1
+    return Response("Datenbank gerade ausgelastet – bitte gleich noch einmal versuchen.", status=503,
+                    headers={"Retry-After": "1"}, mimetype="text/plain")
+
+@app.teardown_appcontext
+def _release_db(exc):
+    conn = g.pop("_db", None)
+    if conn is not None:
+        conn._scoped = False
+        _db_pool.release(conn)
+    if g.pop("_presence_dirty", False):
+        _presence_hub.notify()
+# ----------------------------------------------------------------------------
+
+# ---- Präsenz-Projektion (user_status) ---------------------------------------
+# Jede echte Änderung einer Zeile erhöht presence_meta.pv und stempelt die Zeile
+# mit diesem Wert (user_status.pv). /presence.json liefert damit ETag und Deltas.
+_USER_STATUS_REFRESH_SQL = """
+    INSERT INTO user_status (user_id, state, since_at, last_end_at, last_action, last_action_at, pv)
+    SELECT user_id,
+           CASE WHEN last_start IS NOT NULL AND (last_end IS NULL OR last_start > last_end)
+                THEN 'da' ELSE 'weg' END,
+           last_start, last_end, last_action, last_action_at,
+           (SELECT pv + 1 FROM presence_meta WHERE id = 1)
+    FROM (
+      SELECT
+        u.id AS user_id,
+        (SELECT created_at FROM bookings WHERE user_id=u.id AND action IN ('bin da','kommt') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_start,
+        (SELECT created_at FROM bookings WHERE user_id=u.id AND action IN ('gehe','geht') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_end,
+        (SELECT action FROM bookings WHERE user_id=u.id ORDER BY created_at DESC, id DESC LIMIT 1) AS last_action,
+        (SELECT created_at FROM bookings WHERE user_id=u.id ORDER BY created_at DESC, id DESC LIMIT 1) AS last_action_at
+      FROM users u
+      {where}
+    )
+    WHERE true
+    ON CONFLICT(user_id) DO UPDATE SET
+        state = excluded.state, since_at = excluded.since_at, last_end_at = excluded.last_end_at,
+        last_action = excluded.last_action, last_action_at = excluded.last_action_at, pv = excluded.pv
+    WHERE (state, since_at, last_end_at, last_action, last_action_at)
+          IS NOT (excluded.state, excluded.since_at, excluded.last_end_at,
+                  excluded.last_action, excluded.last_action_at)
+"""
+
+def _refresh_user_status(conn, uid):
+    """Status eines Users aus bookings neu ableiten (Teil der laufenden Transaktion)."""
+    if conn.execute(_USER_STATUS_REFRESH_SQL.format(where="WHERE u.id = ?"), (uid,)).rowcount > 0:
+        conn.execute("UPDATE presence_meta SET pv = pv + 1 WHERE id = 1")
+
+def _rebuild_user_status(conn):
+    conn.execute("DELETE FROM user_status")
+    conn.execute(_USER_STATUS_REFRESH_SQL.format(where=""))
+    # gelöschte Zeilen tauchen in keinem Delta auf -> Clients holen alles neu
+    conn.execute("UPDATE presence_meta SET pv = pv + 1, reset_pv = pv + 1 WHERE id = 1")
+
+def _presence_version(conn):
+    row = conn.execute("SELECT pv, reset_pv FROM presence_meta WHERE id = 1").fetchone()
+    return (row["pv"], row["reset_pv"]) if row else (0, 0)
+
+def _after_booking_write(conn, uid, days=()):
+    """Projektionen nach INSERT/UPDATE/DELETE auf bookings nachziehen – vor dem commit().
+
+    days: betroffene local_day-Werte (alt und neu), für die daily_minutes neu gerechnet wird.
+    """
+    _refresh_user_status(conn, uid)
+    _refresh_daily_minutes(conn, uid, days)
+    _bump_report_version(conn, uid)
+    if has_app_context():
+        g._presence_dirty = True   # Teardown weckt den Präsenz-Broadcaster (nach dem commit)
+# ----------------------------------------------------------------------------
+
+# ---- Ticket-Zähler (ticket_counts) ------------------------------------------
+# Offene Tickets je User für das Badge in der Navigation. Jede Ticket-Änderung
+# zählt den betroffenen User über idx_tickets_user_open neu (Teil der laufenden
+# Transaktion, wie die übrigen Projektionen).
+_TICKET_COUNT_SQL = """
+    INSERT INTO ticket_counts (user_id, open_count)
+    SELECT ?, COUNT(*) FROM tickets WHERE user_id = ? AND closed_at IS NULL
+    ON CONFLICT(user_id) DO UPDATE SET open_count = excluded.open_count
+"""
+
+def _after_ticket_write(conn, uid):
+    """ticket_counts nach INSERT/UPDATE auf tickets nachziehen – vor dem commit()."""
+    conn.execute(_TICKET_COUNT_SQL, (uid, uid))
+
+def _rebuild_ticket_counts(conn):
+    conn.execute("DELETE FROM ticket_counts")
     conn.execute("""
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            action TEXT NOT NULL,
-            created_at TEXT NOT NULL,           -- UTC 'YYYY-MM-DD HH:MM:SS'
-            note TEXT,
-            needs_review INTEGER NOT NULL DEFAULT 0,
-            ticket_action TEXT,                 -- 'aendern' | 'loeschen' | 'blank' | NULL
-            ticket_message TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
+        INSERT INTO ticket_counts (user_id, open_count)
+        SELECT user_id, COUNT(*) FROM tickets WHERE closed_at IS NULL GROUP BY user_id
     """)
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings(user_id, created_at)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_review ON bookings(needs_review)")
-
-    # Migration: weekly_minutes sicherstellen (alte DBs)
-    cols = [r["name"] for r in conn.execute("PRAGMA table_info(users)").fetchall()]
-    if "weekly_minutes" not in cols:
-        conn.execute("ALTER TABLE users ADD COLUMN weekly_minutes INTEGER")
-    conn.execute("UPDATE users SET weekly_minutes = COALESCE(weekly_minutes, 2400)")
-    conn.commit()
 
-    # Seed nur bei frischer DB
-    if first_time:
-        seed = [
-            ("chef", generate_password_hash("secret123"), "admin", 2400),
-            ("mimi", generate_password_hash("geheim123"), "user", 2400),
-        ]
-        conn.executemany(
-            "INSERT INTO users (username, password_hash, role, weekly_minutes) VALUES (?,?,?,?)",
-            seed
-        )
-        conn.commit()
-    conn.close()
+@app.context_processor
+def _inject_ticket_badge():
+    """open_tickets für base.html – nur für Admins (User-Seiten fragen nichts ab), einmal pro Request."""
+    if not has_request_context() or session.get("role") != "admin":
+        return {}
+    if "_open_tickets" not in g:
+        row = get_db().execute("SELECT IFNULL(SUM(open_count), 0) FROM ticket_counts").fetchone()
+        g._open_tickets = row[0]
+    return {"open_tickets": g._open_tickets}
+# ----------------------------------------------------------------------------
 
-# auch beim Import ausführen (WSGI)
-try:
-    init_db()
-except Exception as e:
-    print("init_db() failed:", e)
+# Schema: versionierte Migrationen in migrate.py; PRAGMA user_version = Anzahl angewandter.
+SCHEMA_VERSION = migrate.SCHEMA_VERSION
+
+def init_db():
+    """Schema anlegen/migrieren. Gibt 'fast' (aktuell, nichts zu tun) oder 'migrated' zurück.
+
+    Aktuelle DB: nur ein PRAGMA-Read, keine DDL, kein Schreib-Lock. Sonst
+    laufen die ausstehenden Migrationen (kurze Transaktionen, Batches) und,
+    falls sie Buchungen geändert haben, die Projektionen werden neu gebaut.
+    """
+    first_time = not os.path.exists(DB_PATH)
+    conn = get_db()
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        conn.close()
+        return "fast"
+
+    def after(applied):
+        # noch unter der Migrations-Sperre: parallel bootende Prozesse sehen erst danach "aktuell"
+        print("Migrationen angewandt:", ", ".join(mid for mid, _ in applied))
+        if any(rebuild for _, rebuild in applied):
+            _rebuild_projections(conn)
+        # Seed nur bei frischer DB (IGNORE: ein zweiter Prozess kann die Datei auch frisch gesehen haben)
+        if first_time:
+            seed = [
+                ("chef", generate_password_hash("secret123"), "admin", 2400),
+                ("mimi", generate_password_hash("geheim123"), "user", 2400),
+            ]
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, password_hash, role, weekly_minutes) VALUES (?,?,?,?)",
+                seed
+            )
+            conn.commit()
+
+    migrate.run(conn, after=after)
+    conn.close()
+    return "migrated"
 
 # ---- PERIODEN-HELPER --------------------------------------------------------
 def _period_range_safe(period, anchor):
@@ -171,13 +764,6 @@ def _normalize_anchor(period, anchor):
     else:
         return date(anchor.year, anchor.month, 1)
 
-def _iter_days_in_range(start_dt, end_dt):
-    d = start_dt.date()
-    last = (end_dt - timedelta(days=1)).date()
-    while d <= last:
-        yield d
-        d += timedelta(days=1)
-
 # ---- Wochen-Helper fürs Tagebuch --------------------------------------------
 def _monday_of(d: date) -> date:
     return d - timedelta(days=d.weekday())
@@ -216,6 +802,30 @@ def dashboard():
         return redirect(url_for("admin_only"))
     return redirect(url_for("user_only"))
 
+# ---- Admin: Ticket-Queue ------------------------------------------------------
+# Keyset-Paginierung über (created_at, id) der offenen Tickets, neueste zuerst.
+# Jeder Filter hat seinen partiellen Index (WHERE closed_at IS NULL):
+#   ohne/Zeitraum -> idx_tickets_open, User -> idx_tickets_user_open,
+#   Wunsch-Aktion -> idx_tickets_open_action.
+TICKETS_PAGE_SIZE = int(os.getenv("TICKETS_PAGE_SIZE", "25"))
+TICKET_KINDS = {
+    "aendern":  ("ändern",   "t.action = 'aendern'"),
+    "loeschen": ("löschen",  "t.action = 'loeschen'"),
+    "pruefen":  ("prüfen",   "t.action IS NULL AND t.booking_id IS NOT NULL"),
+    "blank":    ("Blanko",   "t.action IS NULL AND t.booking_id IS NULL"),
+}
+_TICKET_FILTER_KEYS = ("uid", "kind", "from", "to", "before")
+
+def _ticket_filter_args(args):
+    """Filter/Seite aus request.args (für Links und Redirects nach admin_resolve)."""
+    return {k: args[k] for k in _TICKET_FILTER_KEYS if args.get(k)}
+
+def _parse_day(raw):
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d").date() if raw else None
+    except ValueError:
+        return None
+
 @app.route("/admin")
 def admin_only():
     if "user_id" not in session:
@@ -223,30 +833,75 @@ def admin_only():
     if session.get("role") != "admin":
         return redirect(url_for("unauthorized"))
 
+    uid = request.args.get("uid", type=int)
+    kind = request.args.get("kind") if request.args.get("kind") in TICKET_KINDS else None
+    day_from = _parse_day(request.args.get("from"))
+    day_to = _parse_day(request.args.get("to"))
+    before = (request.args.get("before") or "").split("|")        # Cursor "created_at|id"
+
+    where, params = ["t.closed_at IS NULL"], []
+    if uid:
+        where.append("t.user_id = ?"); params.append(uid)
+    if kind:
+        where.append(TICKET_KINDS[kind][1])
+    # Zeitraum in lokalen Tagen (Eingang des Tickets), Vergleich in UTC
+    if day_from:
+        where.append("t.created_at >= datetime(?, 'utc')"); params.append(f"{day_from.isoformat()} 00:00:00")
+    if day_to:
+        where.append("t.created_at < datetime(?, 'utc')"); params.append(f"{(day_to + timedelta(days=1)).isoformat()} 00:00:00")
+    if len(before) == 2 and before[1].isdigit():
+        where.append("(t.created_at, t.id) < (?, ?)"); params += [before[0], int(before[1])]
+
     conn = get_db()
-    rows = conn.execute("""
+    rows = conn.execute(f"""
         SELECT
-          b.id,
-          CASE
-            WHEN b.needs_review=1 AND IFNULL(b.ticket_action,'')='blank' THEN 'ticket'
-            ELSE b.action
-          END AS action,
-          b.created_at, b.note, b.needs_review,
-          b.ticket_action, b.ticket_message,
+          t.id,
+          COALESCE(b.action, 'ticket') AS action,
+          COALESCE(b.created_at, t.created_at) AS created_at,
+          b.note, 1 AS needs_review,
+          t.action AS ticket_action, t.message AS ticket_message,
+          t.created_at AS ticket_created_at,
           u.username,
-          datetime(b.created_at,'localtime') AS local_created_at
-        FROM bookings b
-        JOIN users u ON u.id = b.user_id
-        WHERE b.needs_review = 1
-        ORDER BY b.created_at DESC, b.id DESC
+          datetime(COALESCE(b.created_at, t.created_at),'localtime') AS local_created_at
+        FROM tickets t
+        JOIN users u ON u.id = t.user_id
+        LEFT JOIN bookings b ON b.id = t.booking_id
+        WHERE {" AND ".join(where)}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT ?
+    """, params + [TICKETS_PAGE_SIZE + 1]).fetchall()
+    # User mit offenen Tickets für den Filter (aus ticket_counts, nicht aus tickets)
+    ticket_users = conn.execute("""
+        SELECT u.id, u.username, c.open_count
+        FROM ticket_counts c JOIN users u ON u.id = c.user_id
+        WHERE c.open_count > 0
+        ORDER BY u.username
     """).fetchall()
     conn.close()
 
+    filters = _ticket_filter_args(request.args)
+    filters.pop("before", None)
+    next_url = None
+    if len(rows) > TICKETS_PAGE_SIZE:
+        rows = rows[:TICKETS_PAGE_SIZE]
+        last = rows[-1]
+        next_url = url_for("admin_only", **filters, before=f"{last['ticket_created_at']}|{last['id']}")
+
     return render_template(
         "admin.html",
         title="Admin-Dashboard",
         tickets=rows,
-        actions=ACTIONS
+        actions=ACTIONS,
+        ticket_users=ticket_users,
+        ticket_kinds=[(k, label) for k, (label, _) in TICKET_KINDS.items()],
+        filters=filters,
+        sel_uid=uid, sel_kind=kind,
+        day_from=day_from.isoformat() if day_from else "",
+        day_to=day_to.isoformat() if day_to else "",
+        paged=len(before) == 2,
+        first_url=url_for("admin_only", **filters),
+        next_url=next_url,
+        resolve_args=_ticket_filter_args(request.args),
     )
 
 @app.route("/admin/reports")
@@ -309,57 +964,18 @@ def admin_reports():
     _MONATE = ["Januar","Februar","März","April","Mai","Juni","Juli","August","September","Oktober","November","Dezember"]
     month_name = _MONATE[month-1]
 
-    start = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-    end   = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-
-    conn2 = get_db()
-    row_user = conn2.execute(
+    row_user = conn.execute(
         "SELECT username, COALESCE(weekly_minutes, 2400) AS wm FROM users WHERE id = ?",
         (uid,)
     ).fetchone()
     username        = row_user["username"]
     weekly_minutes  = int(row_user["wm"])
-    conn2.close()
 
-    # Buchungen (Blanko-Tickets ausschließen!)
-    conn = get_db()
-    rows = conn.execute("""
-        SELECT
-          action,
-          datetime(created_at,'localtime') AS ts_local,
-          date(datetime(created_at,'localtime')) AS d_local
-        FROM bookings
-        WHERE user_id = ?
-          AND datetime(created_at) >= ?
-          AND datetime(created_at) <  ?
-          AND NOT (needs_review=1 AND IFNULL(ticket_action,'')='blank')
-        ORDER BY created_at ASC, id ASC
-    """, (uid, start, end)).fetchall()
+    # Tageszeilen + Summen (Report-Cache, sonst aus daily_minutes)
+    result, sums = _report_days(conn, uid, start_dt, end_dt)
     conn.close()
 
-    by_day = {}
-    for r in rows:
-        d = r["d_local"]
-        by_day.setdefault(d, []).append((r["ts_local"], r["action"]))
-
-    result = []
-    sums = {"work":0,"breaks":0,"afk":0,"net":0}
-    for d in _iter_days_in_range(start_dt, end_dt):
-        dstr = d.strftime("%Y-%m-%d")
-        evts = by_day.get(dstr, [])
-        metrics = compute_day_minutes(evts)
-        for k in ("work","breaks","afk","net"):
-            sums[k] += metrics[k]
-        result.append({
-            "date": dstr,
-            "work": metrics["work"],
-            "breaks": metrics["breaks"],
-            "afk": metrics["afk"],
-            "net": metrics["net"],
-            "flags": metrics["flags"],
-        })
-
-    workdays = sum(1 for d in _iter_days_in_range(start_dt, end_dt) if d.weekday() < 5)
+    workdays = sum(1 for d in iter_days_in_range(start_dt, end_dt) if d.weekday() < 5)
     daily_target = weekly_minutes / 5.0
     soll_minutes = int(round(daily_target * workdays))
     delta_minutes = sums["net"] - soll_minutes
@@ -378,12 +994,33 @@ def admin_reports():
     )
 
 # ---------- CSV-Export ----------
-def _fmt_hhmm(mins: int) -> str:
-    s = "-" if mins < 0 else ""
-    m = abs(int(mins))
-    h = m // 60
-    mm = m % 60
-    return f"{s}{h}:{mm:02d}"
+app.add_template_filter(fmt_hhmm, "hhmm")
+
+# CSV wird gestreamt (report_engine.encode_csv_chunks: ~8 KB-Chunks), der
+# Speicher bleibt auch bei Mehrjahres-Exporten konstant.
+def _iter_csv_chunks(rows_fn, args):
+    """Chunks von rows_fn(conn, *args).
+
+    Der Request-Kontext (und damit g._db) ist beim Streamen schon abgebaut,
+    daher holt sich der Generator eine eigene Pool-Verbindung.
+    """
+    conn = _db_pool.acquire()
+    try:
+        yield from encode_csv_chunks(rows_fn(conn, *args))
+    finally:
+        conn.close()
+
+def _csv_response(filename, rows_fn, *args):
+    """Streamende CSV-Antwort; die Zeilen entstehen erst beim Senden."""
+    resp = Response(_iter_csv_chunks(rows_fn, args))
+    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
+    resp.headers["Content-Disposition"] = f'attachment; filename=\"{filename}\"'
+    return resp
+
+def _report_csv_rows(conn, uid, username, weekly_minutes, start_dt, end_dt, chronik="all"):
+    """CSV-Zeilen eines User-Reports (Tageszeilen + SUMME) aus _report_days."""
+    days, _ = _report_days(conn, uid, start_dt, end_dt)
+    return report_csv_rows(days, username, weekly_minutes, start_dt, end_dt, chronik)
 
 @app.get("/admin/reports/export")
 def admin_reports_export():
@@ -397,7 +1034,7 @@ def admin_reports_export():
 
     today = date.today()
     raw_period = (request.args.get("period") or "month").lower()
-    effective_period = raw_period if raw_period in {"day","week","month","year"} else "month"
+    effective_period = raw_period if raw_period in {"day","week","month","year","all"} else "month"
 
     try:
         year = int(request.args.get("y", today.year))
@@ -421,170 +1058,269 @@ def admin_reports_export():
     if chronik not in {"all", "over", "under", "afk"}:
         chronik = "all"
 
-    date_arg = request.args.get("date")
-    try:
-        anchor_raw = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else date(year, month, 1)
-    except ValueError:
-        anchor_raw = date(year, month, 1)
-
-    anchor_norm = _normalize_anchor(effective_period, anchor_raw)
-    start_dt, end_dt = _period_range_safe(effective_period, anchor_norm)
-
     row_user = conn.execute(
         "SELECT username, COALESCE(weekly_minutes, 2400) AS wm FROM users WHERE id = ?",
         (uid,)
     ).fetchone()
+    if not row_user:
+        conn.close()
+        return ("User nicht gefunden", 404)
     username        = row_user["username"]
     weekly_minutes  = int(row_user["wm"])
 
-    start = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-    end   = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-    rows = conn.execute("""
-        SELECT
-          action,
-          datetime(created_at,'localtime') AS ts_local,
-          date(datetime(created_at,'localtime')) AS d_local
-        FROM bookings
-        WHERE user_id = ?
-          AND datetime(created_at) >= ?
-          AND datetime(created_at) <  ?
-          AND NOT (needs_review=1 AND IFNULL(ticket_action,'')='blank')
-        ORDER BY created_at ASC, id ASC
-    """, (uid, start, end)).fetchall()
+    if effective_period == "all":
+        start_dt, end_dt = history_range(conn, uid)
+    else:
+        date_arg = request.args.get("date")
+        try:
+            anchor_raw = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else date(year, month, 1)
+        except ValueError:
+            anchor_raw = date(year, month, 1)
+
+        anchor_norm = _normalize_anchor(effective_period, anchor_raw)
+        start_dt, end_dt = _period_range_safe(effective_period, anchor_norm)
+
     conn.close()
 
-    by_day = {}
-    for r in rows:
-        d = r["d_local"]
-        by_day.setdefault(d, []).append((r["ts_local"], r["action"]))
+    suffix = "" if chronik == "all" else f"_{chronik}"
+    filename = f"report_{username}_{effective_period}_{start_dt.date()}_{end_dt.date()}{suffix}.csv"
+    return _csv_response(filename, _report_csv_rows,
+                         uid, username, weekly_minutes, start_dt, end_dt, chronik)
+
+# ---------- Sammel-Export: ZIP mit allen Usern (Lohnbuchhaltung) ----------
+# Die Reports entstehen in einem Prozess-Pool (report_engine.report_csv_job,
+# Nur-Lese-Verbindungen, nicht an einen Kern gebunden); fertige CSVs landen
+# sofort im gestreamten ZIP. forkserver statt fork: der Web-Prozess hat
+# Threads (gthread, SSE-Hub). Der Forkserver lädt nur report_engine statt
+# __main__ – die Kinder importieren app nicht (kein init_db, kein Pool).
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(os.cpu_count() or 1)))
+
+_export_pool = None
+_export_pool_pid = None
+_export_pool_lock = threading.Lock()
+
+def _get_export_pool():
+    global _export_pool, _export_pool_pid
+    with _export_pool_lock:
+        if _export_pool is None or _export_pool_pid != os.getpid():
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(["report_engine"])
+            _export_pool = ProcessPoolExecutor(max_workers=max(1, EXPORT_WORKERS), mp_context=ctx)
+            _export_pool_pid = os.getpid()
+        return _export_pool
+
+def _drop_export_pool(pool):
+    """Kaputten Pool (abgestürzter Worker) verwerfen; der nächste Export baut neu."""
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is pool:
+            _export_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+class _ZipStream(io.RawIOBase):
+    """Nicht-seekbares Ziel für zipfile; take() liefert das bisher Geschriebene.
+
+    zipfile erkennt das fehlende seek() und schreibt Data-Descriptors, das
+    Archiv lässt sich daher vorne-nach-hinten streamen.
+    """
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+def _iter_export_zip(users, period, start_dt, end_dt, with_summary):
+    stream = _ZipStream()
+    zf = zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED)
+    summary = []
+    pool = _get_export_pool()
+    futures = {pool.submit(report_engine.report_csv_job, DB_PATH, u["id"], u["username"], u["wm"], period, start_dt, end_dt): u
+               for u in users}
+    try:
+        for fut in as_completed(futures):
+            u = futures[fut]
+            try:
+                filename, data, total = fut.result()
+            except BrokenProcessPool as e:
+                _drop_export_pool(pool)
+                zf.writestr(f"FEHLER_{u['username']}.txt", f"Report fehlgeschlagen: {e!r}\n")
+            except Exception as e:
+                zf.writestr(f"FEHLER_{u['username']}.txt", f"Report fehlgeschlagen: {e!r}\n")
+            else:
+                zf.writestr(filename, data)
+                summary.append((u["username"], total))
+            yield stream.take()
+
+        if with_summary:
+            summary.sort(key=lambda x: x[0].lower())
+            rows = [["User", "Arbeit_min", "Pausen_min", "AFK_min", "Netto_min", "Soll_min", "Delta_min", "Delta_hhmm"]]
+            for name, t in summary:
+                # t = SUMME-Zeile aus report_csv_rows
+                rows.append([name, t[1], t[3], t[5], t[7], t[9], t[11], t[12]])
+            zf.writestr("summary.csv", b"".join(encode_csv_chunks(rows)))
+        zf.close()
+        yield stream.take()
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+@app.get("/admin/reports/export_all")
+def admin_reports_export_all():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
 
-    daily_target = weekly_minutes / 5.0
+    raw_period = (request.args.get("period") or "month").lower()
+    effective_period = raw_period if raw_period in {"day","week","month","year","all"} else "month"
+    with_summary = (request.args.get("summary") or "1") != "0"
 
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';')
-
-    writer.writerow(["User", username])
-    writer.writerow(["Zeitraum", f"{start_dt.date()} bis {end_dt.date()}"])
-    if chronik == "over":
-        writer.writerow(["Filter", "Überstunden (Δ > 0)"])
-    elif chronik == "under":
-        writer.writerow(["Filter", "Fehlstunden (Δ < 0)"])
-    elif chronik == "afk":
-        writer.writerow(["Filter", "AFK-Tage (AFK > 0)"])
+    if effective_period == "all":
+        start_dt = end_dt = datetime.combine(date.today(), datetime.min.time())
+        label = f"gesamt_{date.today()}"
     else:
-        writer.writerow(["Filter", "Alle Tage"])
-    writer.writerow([])
-
-    writer.writerow([
-        "Datum",
-        "Arbeit_min","Arbeit_hhmm",
-        "Pausen_min","Pausen_hhmm",
-        "AFK_min","AFK_hhmm",
-        "Netto_min","Netto_hhmm",
-        "Soll_min","Soll_hhmm",
-        "Delta_min","Delta_hhmm"
-    ])
-    sum_work = sum_breaks = sum_afk = sum_net = sum_soll = sum_delta = 0
-
-    for d in _iter_days_in_range(start_dt, end_dt):
-        dstr = d.strftime("%Y-%m-%d")
-        evts = by_day.get(dstr, [])
-        m = compute_day_minutes(evts)
-
-        is_weekday = d.weekday() < 5
-        soll = int(round(daily_target)) if is_weekday else 0
-        delta = m["net"] - soll
-
-        include_row = True
-        if chronik == "over" and delta <= 0:
-            include_row = False
-        elif chronik == "under" and delta >= 0:
-            include_row = False
-        elif chronik == "afk" and m["afk"] <= 0:
-            include_row = False
-        if not include_row:
-            continue
+        date_arg = request.args.get("date")
+        try:
+            anchor_raw = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else date.today()
+        except ValueError:
+            anchor_raw = date.today()
+        anchor_norm = _normalize_anchor(effective_period, anchor_raw)
+        start_dt, end_dt = _period_range_safe(effective_period, anchor_norm)
+        label = f"{effective_period}_{start_dt.date()}_{end_dt.date()}"
 
-        sum_work   += m["work"]
-        sum_breaks += m["breaks"]
-        sum_afk    += m["afk"]
-        sum_net    += m["net"]
-        sum_soll   += soll
-        sum_delta  += delta
-
-        writer.writerow([
-            dstr,
-            m["work"], _fmt_hhmm(m["work"]),
-            m["breaks"], _fmt_hhmm(m["breaks"]),
-            m["afk"], _fmt_hhmm(m["afk"]),
-            m["net"], _fmt_hhmm(m["net"]),
-            soll, _fmt_hhmm(soll),
-            delta, ("+" if delta>=0 else "") + _fmt_hhmm(delta)
-        ])
-
-    writer.writerow([
-        "SUMME",
-        sum_work,   _fmt_hhmm(sum_work),
-        sum_breaks, _fmt_hhmm(sum_breaks),
-        sum_afk,    _fmt_hhmm(sum_afk),
-        sum_net,    _fmt_hhmm(sum_net),
-        sum_soll,   _fmt_hhmm(sum_soll),
-        sum_delta,  ("+" if sum_delta>=0 else "") + _fmt_hhmm(sum_delta)
-    ])
-
-    csv_data = output.getvalue().encode("utf-8-sig")
-    suffix = "" if chronik == "all" else f"_{chronik}"
-    filename = f"report_{username}_{effective_period}_{start_dt.date()}_{end_dt.date()}{suffix}.csv"
-    resp = make_response(csv_data)
-    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
-    resp.headers["Content-Disposition"] = f'attachment; filename=\"{filename}\"'
+    conn = get_db()
+    users = [dict(r) for r in conn.execute(
+        "SELECT id, username, COALESCE(weekly_minutes, 2400) AS wm FROM users ORDER BY username"
+    ).fetchall()]
+    conn.close()
+    if not users:
+        return ("Keine Benutzer vorhanden", 400)
+
+    resp = Response(_iter_export_zip(users, effective_period, start_dt, end_dt, with_summary))
+    resp.headers["Content-Type"] = "application/zip"
+    resp.headers["Content-Disposition"] = f'attachment; filename=\"reports_{label}.zip\"'
     return resp
 # ---------- Ende: CSV-Export ----------
 
-# ========== Präsenz-Seite ==========
-@app.route("/presence")
-def presence():
+# ---------- Team-Report: alle User eines Zeitraums ----------
+@app.get("/admin/reports/team")
+def admin_reports_team():
     if "user_id" not in session:
         return redirect(url_for("login"))
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
 
+    raw_period = (request.args.get("period") or "month").lower()
+    effective_period = raw_period if raw_period in {"day","week","month","year"} else "month"
+
+    date_arg = request.args.get("date")
+    try:
+        anchor_raw = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else date.today()
+    except ValueError:
+        anchor_raw = date.today()
+
+    anchor_norm = _normalize_anchor(effective_period, anchor_raw)
+    start_dt, end_dt = _period_range_safe(effective_period, anchor_norm)
+    workdays = sum(1 for d in iter_days_in_range(start_dt, end_dt) if d.weekday() < 5)
+
+    # Eine Query für alle User: je User ein PK-Range-Scan auf daily_minutes
     conn = get_db()
     rows = conn.execute("""
         SELECT
-          u.id AS user_id,
-          u.username,
-          (SELECT created_at FROM bookings WHERE user_id=u.id AND action IN ('bin da','kommt') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_start,
-          (SELECT created_at FROM bookings WHERE user_id=u.id AND action IN ('gehe','geht') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_end,
-          (SELECT action FROM bookings
-             WHERE user_id=u.id
-               AND NOT (needs_review=1 AND IFNULL(ticket_action,'')='blank')
-             ORDER BY created_at DESC, id DESC LIMIT 1) AS last_action,
-          (SELECT datetime(created_at,'localtime') FROM bookings
-             WHERE user_id=u.id
-               AND NOT (needs_review=1 AND IFNULL(ticket_action,'')='blank')
-             ORDER BY created_at DESC, id DESC LIMIT 1) AS last_action_local,
-          (SELECT datetime(created_at,'localtime') FROM bookings WHERE user_id=u.id AND action IN ('bin da','kommt') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_start_local
+          u.id, u.username,
+          COALESCE(u.weekly_minutes, 2400) AS wm,
+          COALESCE(SUM(d.work), 0)   AS work,
+          COALESCE(SUM(d.breaks), 0) AS breaks,
+          COALESCE(SUM(d.afk), 0)    AS afk,
+          COALESCE(SUM(d.net), 0)    AS net,
+          COUNT(d.flags)             AS flagged_days
         FROM users u
+        LEFT JOIN daily_minutes d
+               ON d.user_id = u.id AND d.day >= ? AND d.day < ?
+        GROUP BY u.id
         ORDER BY u.username
-    """).fetchall()
+    """, (start_dt.strftime("%Y-%m-%d"), end_dt.strftime("%Y-%m-%d"))).fetchall()
     conn.close()
 
-    present = []
+    team = []
+    sums = {"work": 0, "breaks": 0, "afk": 0, "net": 0, "soll": 0, "delta": 0}
     for r in rows:
-        last_start = r["last_start"]
-        last_end   = r["last_end"]
-        is_present = bool(last_start) and (not last_end or last_start > last_end)
-        if not is_present:
-            continue
-        action_key = r["last_action"] or ""
-        status_label = ACTION_LABELS.get(action_key, action_key or "—")
-        present.append({
-            "username": r["username"],
-            "since_local": r["last_start_local"],
-            "last_action_label": status_label,
-            "last_action_local": r["last_action_local"],
-        })
+        soll = int(round(int(r["wm"]) / 5.0 * workdays))
+        entry = {
+            "uid": r["id"], "username": r["username"], "weekly_minutes": int(r["wm"]),
+            "work": r["work"], "breaks": r["breaks"], "afk": r["afk"], "net": r["net"],
+            "soll": soll, "delta": r["net"] - soll, "flagged_days": r["flagged_days"],
+        }
+        for k in sums:
+            sums[k] += entry[k]
+        team.append(entry)
+
+    return render_template(
+        "reports_team.html",
+        title="Team-Report",
+        team=team, sums=sums,
+        period=effective_period,
+        anchor_norm_iso=anchor_norm.isoformat(),
+        range_label=f"{start_dt.date()} bis {(end_dt - timedelta(days=1)).date()}",
+        workdays=workdays,
+    )
+# ---------- Ende: Team-Report ----------
 
-    present.sort(key=lambda x: x["since_local"] or "", reverse=True)
+# ========== Präsenz-Seite ==========
+_PRESENT_SQL = """
+    SELECT
+      u.username,
+      s.state,
+      s.last_action,
+      datetime(s.since_at,'localtime')       AS since_local,
+      datetime(s.last_action_at,'localtime') AS last_action_local
+    FROM user_status s
+    JOIN users u ON u.id = s.user_id
+    WHERE {where}
+    ORDER BY s.since_at DESC
+"""
+
+def _present_entry(r):
+    action_key = r["last_action"] or ""
+    return {
+        "username": r["username"],
+        "since_local": r["since_local"],
+        "last_action_label": ACTION_LABELS.get(action_key, action_key or "—"),
+        "last_action_local": r["last_action_local"],
+    }
+
+def _load_present(conn):
+    """Anwesende aus der user_status-Projektion (ein indizierter Read)."""
+    rows = conn.execute(_PRESENT_SQL.format(where="s.state = 'da'")).fetchall()
+    return [_present_entry(r) for r in rows]
+
+def _load_present_delta(conn, since):
+    """Seit Version `since` geänderte Zeilen: Anwesende als upsert, alle anderen als remove."""
+    upsert, remove = [], []
+    for r in conn.execute(_PRESENT_SQL.format(where="s.pv > ?"), (since,)):
+        if r["state"] == "da":
+            upsert.append(_present_entry(r))
+        else:
+            remove.append(r["username"])
+    return upsert, remove
+
+@app.route("/presence")
+def presence():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+
+    conn = get_db()
+    present = _load_present(conn)
+    conn.close()
 
     return render_template(
         "presence.html",
@@ -594,59 +1330,212 @@ def presence():
     )
 
 # --- JSON für sanften Auto-Refresh ---
+# ETag = Präsenz-Version: ohne Änderung nur ein Read auf presence_meta und 304.
+# ?since=<pv> liefert nur die seitdem geänderten Einträge (upsert/remove).
+# poll_ms ist das empfohlene Intervall; die Seite streckt es, solange der Tab
+# im Hintergrund ist.
+PRESENCE_POLL_MS = int(os.getenv("PRESENCE_POLL_MS", "15000"))
+
 @app.get("/presence.json")
 def presence_json():
     if "user_id" not in session:
         return redirect(url_for("login"))
 
     conn = get_db()
-    rows = conn.execute("""
-        SELECT
-          u.id AS user_id,
-          u.username,
-          (SELECT created_at FROM bookings WHERE user_id=u.id AND action IN ('bin da','kommt') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_start,
-          (SELECT created_at FROM bookings WHERE user_id=u.id AND action IN ('gehe','geht') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_end,
-          (SELECT action FROM bookings
-             WHERE user_id=u.id
-               AND NOT (needs_review=1 AND IFNULL(ticket_action,'')='blank')
-             ORDER BY created_at DESC, id DESC LIMIT 1) AS last_action,
-          (SELECT datetime(created_at,'localtime') FROM bookings
-             WHERE user_id=u.id
-               AND NOT (needs_review=1 AND IFNULL(ticket_action,'')='blank')
-             ORDER BY created_at DESC, id DESC LIMIT 1) AS last_action_local,
-          (SELECT datetime(created_at,'localtime') FROM bookings WHERE user_id=u.id AND action IN ('bin da','kommt') ORDER BY created_at DESC, id DESC LIMIT 1) AS last_start_local
-        FROM users u
-        ORDER BY u.username
-    """).fetchall()
+    pv, reset_pv = _presence_version(conn)
+    etag = f"p{pv}"
+    if etag in request.if_none_match:
+        conn.close()
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Poll-Interval"] = str(PRESENCE_POLL_MS)
+        return resp
+
+    since = request.args.get("since", type=int)
+    payload = {"pv": pv, "poll_ms": PRESENCE_POLL_MS,
+               "server_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    if since is not None and reset_pv <= since <= pv:
+        upsert, remove = _load_present_delta(conn, since)
+        payload.update(delta=True, upsert=upsert, remove=remove)
+    else:
+        present = _load_present(conn)
+        payload.update(delta=False, count=len(present), present=present)
     conn.close()
 
-    present = []
-    for r in rows:
-        last_start = r["last_start"]
-        last_end   = r["last_end"]
-        is_present = bool(last_start) and (not last_end or last_start > last_end)
-        if not is_present:
-            continue
-        action_key = r["last_action"] or ""
-        status_label = ACTION_LABELS.get(action_key, action_key or "—")
-        present.append({
-            "username": r["username"],
-            "since_local": r["last_start_local"],
-            "last_action_label": status_label,
-            "last_action_local": r["last_action_local"],
-        })
-
-    present.sort(key=lambda x: x["since_local"] or "", reverse=True)
-    return jsonify({
-        "count": len(present),
-        "present": present,
-        "server_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
+    resp = jsonify(payload)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# --- Server-Sent Events: Diffs statt Polling ---
+# Jeder offene Stream belegt einen gthread-Thread -> pro Worker begrenzen.
+# Ist das Limit erreicht, antwortet der Stream mit 503 und die Seite pollt weiter.
+# Standard: Threads des Workers minus PRESENCE_STREAM_RESERVE (gunicorn.conf.py
+# setzt das beim Worker-Start aus --threads); PRESENCE_STREAM_MAX überschreibt.
+PRESENCE_STREAM_RESERVE = int(os.getenv("PRESENCE_STREAM_RESERVE", "2"))   # Threads für normale Requests
+PRESENCE_STREAM_TTL = int(os.getenv("PRESENCE_STREAM_TTL", "300"))         # s; danach verbindet EventSource neu
+
+def _presence_stream_max(threads):
+    if os.getenv("PRESENCE_STREAM_MAX"):
+        return int(os.getenv("PRESENCE_STREAM_MAX"))
+    return max(1, threads - PRESENCE_STREAM_RESERVE)
+
+PRESENCE_STREAM_MAX = _presence_stream_max(int(os.getenv("WEB_THREADS", "8")))
+PRESENCE_CHECK_S    = 0.5      # Takt, in dem PRAGMA data_version geprüft wird
+
+class _PresenceBroadcaster:
+    """Ein Hintergrund-Thread pro Worker beobachtet die DB und verteilt Präsenz-Diffs.
+
+    Schreibende Requests im selben Prozess wecken ihn per notify(); Änderungen aus
+    anderen Workern erkennt er über PRAGMA data_version (kein Tabellen-Read).
+    Nur wenn sich etwas geändert hat, wird user_status einmal gelesen.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._snapshot = {}                             # username -> Eintrag
+        self._events = collections.deque(maxlen=64)     # (version, diff)
+        self._clients = 0
+        self._dirty = False
+        self._thread = None
+        self._pid = None
+
+    def notify(self):
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="presence-broadcaster", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        conn = None
+        last_dv = None
+        while True:
+            with self._cond:
+                while self._clients == 0 and not self._dirty:
+                    self._cond.wait()
+                if not self._dirty:
+                    self._cond.wait(PRESENCE_CHECK_S)
+                dirty, self._dirty = self._dirty, False
+                if self._clients == 0:
+                    continue
+            try:
+                if conn is None:
+                    conn = _open_connection()
+                    last_dv = None
+                dv = conn.execute("PRAGMA data_version").fetchone()[0]
+                if not dirty and dv == last_dv:
+                    continue
+                last_dv = dv
+                self._publish(_load_present(conn))
+            except sqlite3.Error as e:
+                print("presence broadcaster:", e)
+                if conn is not None:
+                    sqlite3.Connection.close(conn)
+                conn = None
+                time.sleep(PRESENCE_CHECK_S)
+
+    def _publish(self, present):
+        new = {p["username"]: p for p in present}
+        with self._cond:
+            old = self._snapshot
+            upsert = [p for k, p in new.items() if old.get(k) != p]
+            remove = [k for k in old if k not in new]
+            if not upsert and not remove:
+                return
+            self._version += 1
+            self._snapshot = new
+            self._events.append((self._version, {"upsert": upsert, "remove": remove}))
+            self._cond.notify_all()
+
+    def subscribe(self):
+        with self._cond:
+            if self._clients >= PRESENCE_STREAM_MAX:
+                return None
+            self._clients += 1
+            version = self._version
+            self._ensure_thread()
+            self._cond.notify_all()
+        return version
+
+    def unsubscribe(self):
+        with self._cond:
+            self._clients -= 1
+
+    def wait_events(self, version, timeout):
+        """Alle Diffs nach `version`; None, falls der Puffer die Lücke nicht mehr abdeckt."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > version, timeout)
+            if self._version == version:
+                return version, []
+            pending = [(v, d) for v, d in self._events if v > version]
+            if not pending or pending[0][0] != version + 1:
+                return self._version, None
+            return self._version, [d for _, d in pending]
+
+    def current(self):
+        with self._cond:
+            return self._version, list(self._snapshot.values())
+
+_presence_hub = _PresenceBroadcaster()
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/presence/stream")
+def presence_stream():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+
+    version = _presence_hub.subscribe()
+    if version is None:
+        return ("Zu viele Live-Verbindungen – bitte Polling nutzen", 503)
+
+    # Startzustand einmalig aus der DB; spätere Änderungen kommen als Diff
+    try:
+        conn = get_db()
+        present = _load_present(conn)
+        conn.close()
+    except Exception:
+        _presence_hub.unsubscribe()
+        raise
+
+    def generate():
+        v = version
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse("snapshot", {"present": present, "server_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+            deadline = time.monotonic() + PRESENCE_STREAM_TTL
+            while time.monotonic() < deadline:
+                v, diffs = _presence_hub.wait_events(v, timeout=15)
+                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                if diffs is None:
+                    _, snap = _presence_hub.current()
+                    yield _sse("snapshot", {"present": snap, "server_time": now})
+                elif not diffs:
+                    yield ": keepalive\n\n"
+                else:
+                    for d in diffs:
+                        yield _sse("diff", dict(d, server_time=now))
+        finally:
+            _presence_hub.unsubscribe()
+
+    resp = Response(generate(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 # ========== Ende Präsenz-Seite ==========
 
 # ----------------- ADMIN: Ticket lösen/ändern -----------------
-@app.post("/admin/resolve/<int:booking_id>", endpoint="admin_resolve")
-def admin_resolve(booking_id: int):
+@app.post("/admin/resolve/<int:ticket_id>", endpoint="admin_resolve")
+def admin_resolve(ticket_id: int):
     if "user_id" not in session:
         return redirect(url_for("login"))
     if session.get("role") != "admin":
@@ -663,37 +1552,61 @@ def admin_resolve(booking_id: int):
     conn = get_db()
     cur  = conn.cursor()
 
+    back = url_for("admin_only", **_ticket_filter_args(request.args))
+    ticket = cur.execute(
+        "SELECT id, user_id, booking_id, created_at FROM tickets WHERE id = ? AND closed_at IS NULL",
+        (ticket_id,)
+    ).fetchone()
+    if not ticket:
+        conn.close()
+        return redirect(back)      # schon erledigt (z. B. doppelt abgeschickt)
+    booking_id = ticket["booking_id"]
+    # Buchung zum Ticket; Blanko-Tickets haben keine
+    row = cur.execute(
+        "SELECT user_id, action, note, created_at, local_day FROM bookings WHERE id = ?", (booking_id,)
+    ).fetchone() if booking_id is not None else None
+
+    def close(resolution_final, booking=booking_id):
+        cur.execute("""
+            UPDATE tickets
+               SET closed_at = datetime('now'), resolution = ?, booking_id = ?
+             WHERE id = ?
+        """, (resolution_final, booking, ticket_id))
+        _after_ticket_write(conn, ticket["user_id"])
+
     if resolution == "loeschen":
-        cur.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+        if row:
+            cur.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+            _after_booking_write(conn, row["user_id"], (row["local_day"],))
+        close("loeschen")
         conn.commit()
         conn.close()
-        return redirect(url_for("admin_only"))
+        return redirect(back)
 
     elif resolution == "aendern":
-        row = cur.execute(
-            "SELECT action, note, created_at FROM bookings WHERE id = ?",
-            (booking_id,)
-        ).fetchone()
-        if not row:
+        if booking_id is not None and not row:
             conn.close()
             return ("Buchung nicht gefunden", 404)
 
-        action_final = row["action"]
+        # Blanko-Ticket: "ändern" trägt die fehlende Buchung nach (Zeit vorbelegt mit Ticket-Zeit)
+        action_final = row["action"] if row else None
         if new_action:
             valid_actions = {k for k, _ in ACTIONS}
             if new_action not in valid_actions:
                 conn.close()
                 return ("Ungültige Aktion", 400)
             action_final = new_action
+        if not action_final:
+            conn.close()
+            return ("Bitte eine Aktion wählen", 400)
 
-        note_final = new_note_raw if new_note_raw else (row["note"] or "")
+        note_final = new_note_raw if new_note_raw else ((row["note"] if row else None) or "")
 
-        created_at_final = row["created_at"]
+        created_at_final = row["created_at"] if row else ticket["created_at"]
         if new_date_raw or new_time_raw:
             try:
                 res = cur.execute(
-                    "SELECT strftime('%Y-%m-%d %H:%M:%S', created_at, 'localtime') FROM bookings WHERE id = ?",
-                    (booking_id,)
+                    "SELECT strftime('%Y-%m-%d %H:%M:%S', ?, 'localtime')", (created_at_final,)
                 ).fetchone()
                 old_local_str = res[0] if res else None
                 if not old_local_str:
@@ -735,38 +1648,46 @@ def admin_resolve(booking_id: int):
         if admin_comment:
             note_final = (note_final + " " if note_final else "") + f"[Admin: {admin_comment}]"
 
-        cur.execute("""
-            UPDATE bookings
-               SET action = ?,
-                   created_at = ?,
-                   note = ?,
-                   needs_review = 0,
-                   ticket_action = NULL,
-                   ticket_message = NULL
-             WHERE id = ?
-        """, (action_final, created_at_final, note_final, booking_id))
+        if row:
+            cur.execute("""
+                UPDATE bookings
+                   SET action = ?,
+                       created_at = ?,
+                       ts = CAST(strftime('%s', ?) AS INTEGER),
+                       local_day = date(?, 'localtime'),
+                       note = ?
+                 WHERE id = ?
+            """, (action_final, created_at_final, created_at_final, created_at_final, note_final, booking_id))
+            _after_booking_write(conn, row["user_id"], (row["local_day"], _booking_day(conn, booking_id)))
+        else:
+            booking_id = cur.execute(BOOKING_INSERT_AT_SQL, (ticket["user_id"], action_final, created_at_final,
+                                                             note_final, created_at_final, created_at_final)).lastrowid
+            _after_booking_write(conn, ticket["user_id"], (_booking_day(conn, booking_id),))
+        close("aendern", booking_id)
 
         conn.commit()
         conn.close()
-        return redirect(url_for("admin_only"))
+        return redirect(back)
 
     else:
-        row = cur.execute("SELECT ticket_action FROM bookings WHERE id = ?", (booking_id,)).fetchone()
-        if row and (row["ticket_action"] or "") == "blank":
-            cur.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
-        else:
-            cur.execute("""
-                UPDATE bookings
-                   SET needs_review = 0,
-                       ticket_action = NULL,
-                       ticket_message = NULL
-                 WHERE id = ?
-            """, (booking_id,))
+        close("schliessen")
         conn.commit()
         conn.close()
-        return redirect(url_for("admin_only"))
+        return redirect(back)
 
 # ----------------- USER: Startseite -----------------
+# Buchung + offenes Ticket bzw. offenes Blanko-Ticket als gleich aufgebaute Zeile
+_USER_BOOKING_COLS = """
+    b.id, b.action, b.note, t.id IS NOT NULL AS needs_review, t.id AS ticket_id,
+    t.action AS ticket_action, t.message AS ticket_message, b.ts,
+    datetime(b.created_at, 'localtime') AS local_created_at
+"""
+_USER_BLANK_COLS = """
+    NULL AS id, 'ticket' AS action, NULL AS note, 1 AS needs_review, t.id AS ticket_id,
+    NULL AS ticket_action, t.message AS ticket_message, CAST(strftime('%s', t.created_at) AS INTEGER) AS ts,
+    datetime(t.created_at, 'localtime') AS local_created_at
+"""
+
 @app.route("/user")
 def user_only():
     if "user_id" not in session:
@@ -804,54 +1725,51 @@ def user_only():
     if sel_day < 1: sel_day = 1
     if sel_day > 31: sel_day = 31
 
-    month_start = f"{year:04d}-{month:02d}-01 00:00:00"
-    month_end   = f"{next_y:04d}-{next_m:02d}-01 00:00:00"
+    month_start = f"{year:04d}-{month:02d}-01"
+    month_end   = f"{next_y:04d}-{next_m:02d}-01"
 
     selected_iso = f"{year:04d}-{month:02d}-{sel_day:02d}"
 
     conn = get_db()
 
-    # Letzte 5 — Blanko-Tickets als "ticket" labeln
-    last5 = conn.execute("""
-        SELECT
-          id,
-          CASE
-            WHEN needs_review=1 AND IFNULL(ticket_action,'')='blank' THEN 'ticket'
-            ELSE action
-          END AS action,
-          note, needs_review, ticket_action, ticket_message,
-          datetime(created_at, 'localtime') AS local_created_at
-        FROM bookings
-        WHERE user_id = ?
-        ORDER BY created_at DESC, id DESC
+    # Letzte 5 — offene Blanko-Tickets als "ticket" dazwischen
+    last5 = conn.execute(f"""
+        SELECT * FROM (
+          SELECT {_USER_BOOKING_COLS} FROM (
+            SELECT * FROM bookings WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT 5
+          ) AS b
+          LEFT JOIN tickets t ON t.booking_id = b.id AND t.closed_at IS NULL
+          UNION ALL
+          SELECT {_USER_BLANK_COLS} FROM tickets t
+          WHERE t.user_id = ? AND t.closed_at IS NULL AND t.booking_id IS NULL
+        )
+        ORDER BY ts DESC, id DESC
         LIMIT 5
-    """, (uid,)).fetchall()
+    """, (uid, uid)).fetchall()
 
     rows = conn.execute("""
-        SELECT date(datetime(created_at,'localtime')) AS d, COUNT(*) AS c
+        SELECT local_day AS d, COUNT(*) AS c
         FROM bookings
         WHERE user_id = ?
-          AND datetime(created_at) >= ?
-          AND datetime(created_at) <  ?
-        GROUP BY d
+          AND local_day >= ?
+          AND local_day <  ?
+        GROUP BY local_day
     """, (uid, month_start, month_end)).fetchall()
     counts_by_day = {r["d"]: r["c"] for r in rows}
 
-    # Tagesliste — Blanko-Tickets als "ticket" labeln
-    day_rows = conn.execute("""
-        SELECT
-          id,
-          CASE
-            WHEN needs_review=1 AND IFNULL(ticket_action,'')='blank' THEN 'ticket'
-            ELSE action
-          END AS action,
-          note, needs_review, ticket_action, ticket_message,
-          datetime(created_at,'localtime') AS local_created_at
-        FROM bookings
-        WHERE user_id = ?
-          AND date(datetime(created_at,'localtime')) = date(?, 'localtime')
-        ORDER BY created_at ASC, id ASC
-    """, (uid, selected_iso)).fetchall()
+    # Tagesliste — offene Blanko-Tickets des Tages als "ticket"
+    day_rows = conn.execute(f"""
+        SELECT {_USER_BOOKING_COLS}
+        FROM bookings b
+        LEFT JOIN tickets t ON t.booking_id = b.id AND t.closed_at IS NULL
+        WHERE b.user_id = ?
+          AND b.local_day = ?
+        UNION ALL
+        SELECT {_USER_BLANK_COLS} FROM tickets t
+        WHERE t.user_id = ? AND t.closed_at IS NULL AND t.booking_id IS NULL
+          AND date(t.created_at, 'localtime') = ?
+        ORDER BY ts ASC, id ASC
+    """, (uid, selected_iso, uid, selected_iso)).fetchall()
 
     conn.close()
 
@@ -901,6 +1819,252 @@ def logout():
     session.clear()
     return redirect(url_for("login"))
 
+# ---- Group-Commit für /book (optional, BOOKING_GROUP_COMMIT=1) --------------
+# Zu Schichtbeginn kommen viele Buchungen fast gleichzeitig. Statt dass jeder
+# Request eine eigene Schreib-Transaktion öffnet (und bei SQLITE_BUSY bis zu
+# DB_TIMEOUT wartet), sammelt ein Writer-Thread pro Worker die Inserts ein paar
+# ms und committet sie gemeinsam. Der Request kehrt erst nach dem commit zurück.
+# Ist die DB länger gesperrt, landen die Buchungen mit ihrer Originalzeit per
+# fsync im Spool (JSONL) und werden nachgetragen, sobald die DB wieder frei ist.
+try:
+    import fcntl
+except ImportError:     # Windows (Dev-Server, ein Prozess): kein Datei-Lock nötig
+    fcntl = None
+
+app.config["BOOKING_GROUP_COMMIT"] = os.getenv("BOOKING_GROUP_COMMIT", "0") == "1"
+BOOKING_GROUP_WINDOW_MS = float(os.getenv("BOOKING_GROUP_WINDOW_MS", "2"))
+BOOKING_GROUP_MAX = int(os.getenv("BOOKING_GROUP_MAX", "256"))
+BOOKING_WRITER_BUSY_MS = int(os.getenv("BOOKING_WRITER_BUSY_MS", "2000"))
+BOOKING_WRITER_LOCKED_BUSY_MS = 50      # solange der Spool Einträge hat
+BOOKING_SPOOL_PATH = os.getenv("BOOKING_SPOOL") or os.path.join(app.instance_path, "booking_spool.jsonl")
+BOOKING_SPOOL_RETRY_S = 5.0
+
+def _insert_booking_at(conn, uid, action, created_at, note):
+    """Eine Buchung mit fester UTC-Zeit einfügen; gibt die id zurück."""
+    try:
+        cur = conn.execute(BOOKING_INSERT_AT_SQL, (uid, action, created_at, note, created_at, created_at))
+    except sqlite3.IntegrityError:
+        # CHECK-Verletzung bricht nur dieses Statement ab, die Transaktion läuft weiter
+        mapped = MAP_NEW_TO_OLD.get(action)
+        if not mapped:
+            raise
+        cur = conn.execute(BOOKING_INSERT_AT_SQL, (uid, mapped, created_at, note, created_at, created_at))
+    return cur.lastrowid
+
+def _spool_open():
+    """Spool-Datei zum Anhängen/Lesen öffnen, exklusiv gegen andere Worker gesperrt."""
+    f = open(BOOKING_SPOOL_PATH, "a+", encoding="utf-8")
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    return f
+
+def _spool_pending():
+    try:
+        return os.path.getsize(BOOKING_SPOOL_PATH) > 0
+    except OSError:
+        return False
+
+class _BookingRequest:
+    __slots__ = ("uid", "action", "note", "created_at", "done", "booking_id", "spooled", "error")
+
+    def __init__(self, uid, action, note):
+        self.uid = uid
+        self.action = action
+        self.note = note
+        self.created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self.done = threading.Event()
+        self.booking_id = None
+        self.spooled = False
+        self.error = None
+
+class _BookingWriter:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._thread = None
+        self._pid = None
+        self.stats = {"batches": 0, "bookings": 0, "max_batch": 0, "commit_ms": 0.0,
+                      "spooled": 0, "replayed": 0, "rejected": 0}
+
+    def submit(self, uid, action, note):
+        """Buchung einreihen und warten, bis sie committet oder im Spool gesichert ist."""
+        req = _BookingRequest(uid, action, note)
+        with self._cond:
+            self._ensure_thread()
+            self._queue.append(req)
+            self._cond.notify_all()
+        if not req.done.wait(DB_TIMEOUT + BOOKING_WRITER_BUSY_MS / 1000.0):
+            raise sqlite3.OperationalError("Booking-Writer antwortet nicht")
+        if req.error is not None:
+            raise req.error
+        return req
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._queue = []    # nach fork: Requests des Masters gibt es hier nicht
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="booking-writer", daemon=True)
+        self._thread.start()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue:
+                if not self._cond.wait(BOOKING_SPOOL_RETRY_S) and _spool_pending():
+                    return []
+            # kurzes Sammelfenster: parallel eintreffende Buchungen mitnehmen
+            deadline = time.monotonic() + BOOKING_GROUP_WINDOW_MS / 1000.0
+            while len(self._queue) < BOOKING_GROUP_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:BOOKING_GROUP_MAX]
+            del self._queue[:BOOKING_GROUP_MAX]
+            return batch
+
+    def _run(self):
+        conn = None
+        busy_ms = None
+        while True:
+            batch = self._take_batch()
+            if conn is None:
+                try:
+                    conn = _open_connection()
+                    busy_ms = None
+                except sqlite3.Error as e:
+                    conn = None
+                    self._spool(batch, e)
+                    continue
+            # Solange der Spool nicht leer ist, war die DB zuletzt gesperrt: dann nicht
+            # jedes Batch erneut BOOKING_WRITER_BUSY_MS warten lassen, sondern schnell spoolen
+            want = BOOKING_WRITER_LOCKED_BUSY_MS if _spool_pending() else BOOKING_WRITER_BUSY_MS
+            if want != busy_ms:
+                conn.execute(f"PRAGMA busy_timeout = {want}")
+                busy_ms = want
+            # Spool nur nachtragen, wenn die DB gerade frei war (commit ok) oder im Leerlauf –
+            # sonst würde der Nachtrag die nächsten Buchungen noch einmal busy warten lassen
+            if (not batch or self._commit(conn, batch)) and _spool_pending():
+                self._replay(conn)
+
+    def _commit(self, conn, batch):
+        """Batch in einer Transaktion schreiben; True, wenn committet wurde."""
+        t0 = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            touched = {}
+            for req in batch:
+                try:
+                    req.booking_id = _insert_booking_at(conn, req.uid, req.action, req.created_at, req.note)
+                except sqlite3.IntegrityError as e:
+                    req.error = e
+                    self.stats["rejected"] += 1
+                    continue
+                touched.setdefault(req.uid, set()).add(_booking_day(conn, req.booking_id))
+            for uid, days in touched.items():
+                _after_booking_write(conn, uid, days)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            # gesperrt (busy_timeout abgelaufen) o. ä.: nichts committet -> Spool
+            if conn.in_transaction:
+                conn.rollback()
+            self._spool([r for r in batch if r.error is None], e)
+            return False
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for req in batch:
+                req.error = req.error or e
+            return False
+        else:
+            n = len(batch)
+            self.stats["batches"] += 1
+            self.stats["bookings"] += n
+            self.stats["max_batch"] = max(self.stats["max_batch"], n)
+            self.stats["commit_ms"] += (time.perf_counter() - t0) * 1000.0
+            _presence_hub.notify()
+            return True
+        finally:
+            for req in batch:
+                req.done.set()
+
+    def _spool(self, batch, cause):
+        if not batch:
+            return
+        try:
+            f = _spool_open()
+            try:
+                for req in batch:
+                    f.write(json.dumps({"token": uuid.uuid4().hex, "uid": req.uid, "action": req.action,
+                                        "note": req.note, "created_at": req.created_at},
+                                       ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+        except OSError:
+            for req in batch:
+                req.error = cause
+        else:
+            for req in batch:
+                req.booking_id = None
+                req.spooled = True
+            self.stats["spooled"] += len(batch)
+        finally:
+            for req in batch:
+                req.done.set()
+
+    def _replay(self, conn):
+        """Spool nachtragen. Jeder Eintrag hat ein Token, das in derselben Transaktion
+        in booking_spool_done landet – nach einem Absturz zwischen commit und Leeren
+        des Spools wird nichts doppelt gebucht."""
+        f = _spool_open()
+        try:
+            f.seek(0)
+            items = [json.loads(line) for line in f if line.strip()]
+            if not items:
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            touched = {}
+            n = 0
+            for it in items:
+                if not conn.execute("INSERT OR IGNORE INTO booking_spool_done (token) VALUES (?)",
+                                    (it["token"],)).rowcount:
+                    continue
+                try:
+                    bid = _insert_booking_at(conn, it["uid"], it["action"], it["created_at"], it["note"])
+                except sqlite3.IntegrityError:
+                    self.stats["rejected"] += 1
+                    continue
+                touched.setdefault(it["uid"], set()).add(_booking_day(conn, bid))
+                n += 1
+            for uid, days in touched.items():
+                _after_booking_write(conn, uid, days)
+            conn.execute("DELETE FROM booking_spool_done WHERE applied_at < datetime('now', '-30 days')")
+            conn.commit()
+            f.truncate(0)
+            f.flush()
+            os.fsync(f.fileno())
+            self.stats["replayed"] += n
+            _presence_hub.notify()
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.rollback()     # DB noch gesperrt -> später erneut
+        finally:
+            f.close()
+
+    def snapshot(self):
+        with self._cond:
+            queued = len(self._queue)
+        s = dict(self.stats, enabled=bool(app.config.get("BOOKING_GROUP_COMMIT")), queued=queued,
+                 spool_bytes=os.path.getsize(BOOKING_SPOOL_PATH) if os.path.exists(BOOKING_SPOOL_PATH) else 0)
+        s["commit_ms"] = round(s["commit_ms"], 1)
+        s["avg_batch"] = round(s["bookings"] / s["batches"], 1) if s["batches"] else None
+        return s
+
+_booking_writer = _BookingWriter()
+
 # --- Minimal-Route: /book ---
 @app.post("/book", endpoint="book")
 def book():
@@ -913,31 +2077,32 @@ def book():
     if not action:
         return ("Aktion fehlt", 400)
 
-    MAP_NEW_TO_OLD = {
-        "bin da": "kommt",
-        "gehe": "geht",
-        "afk": "abwesend",
-        "wieder da": "wieder_da",
-        "päuschen": "pause",
-        "mache weiter": "pausenende",
-    }
+    if app.config.get("BOOKING_GROUP_COMMIT"):
+        # kehrt erst zurück, wenn die Buchung committet (oder im Spool gesichert) ist
+        try:
+            _booking_writer.submit(session["user_id"], action, note)
+        except sqlite3.IntegrityError:
+            return ("Ungültige Aktion", 400)
+        return redirect(url_for("user_only"))
 
     conn = get_db()
     try:
-        conn.execute(
-            "INSERT INTO bookings (user_id, action, created_at, note) VALUES (?,?,datetime('now'),?)",
+        cur = conn.execute(
+            BOOKING_INSERT_NOW_SQL,
             (session["user_id"], action, note),
         )
+        _after_booking_write(conn, session["user_id"], (_booking_day(conn, cur.lastrowid),))
         conn.commit()
     except sqlite3.IntegrityError:
         mapped = MAP_NEW_TO_OLD.get(action)
         if not mapped:
             conn.close()
             return ("Ungültige Aktion", 400)
-        conn.execute(
-            "INSERT INTO bookings (user_id, action, created_at, note) VALUES (?,?,datetime('now'),?)",
+        cur = conn.execute(
+            BOOKING_INSERT_NOW_SQL,
             (session["user_id"], mapped, note),
         )
+        _after_booking_write(conn, session["user_id"], (_booking_day(conn, cur.lastrowid),))
         conn.commit()
         conn.close()
         return redirect(url_for("user_only"))
@@ -963,38 +2128,38 @@ def ticket_open_simple():
     ticket_message = (request.form.get("ticket_message") or "").strip()
 
     conn = get_db()
+    # höchstens ein offenes Ticket je Buchung – erneutes Eröffnen überschreibt den Wunsch
     conn.execute(
         """
-        UPDATE bookings
-           SET needs_review  = 1,
-               ticket_action  = NULLIF(?, '' ),
-               ticket_message = NULLIF(?, '' )
+        INSERT INTO tickets (user_id, booking_id, action, message)
+        SELECT user_id, id, NULLIF(?, ''), NULLIF(?, '')
+          FROM bookings
          WHERE id = ? AND user_id = ?
+        ON CONFLICT(booking_id) WHERE closed_at IS NULL AND booking_id IS NOT NULL
+        DO UPDATE SET action = excluded.action, message = excluded.message
         """,
         (ticket_action, ticket_message, booking_id, session["user_id"]),
     )
+    _after_ticket_write(conn, session["user_id"])
     conn.commit()
     conn.close()
     return redirect(url_for("user_only"))
 
-# Ticket schließen (vom User)
-@app.post("/ticket/close/<int:booking_id>", endpoint="ticket_close")
-def ticket_close(booking_id: int):
+# Ticket schließen (vom User) – Buchungen bleiben unverändert
+@app.post("/ticket/close/<int:ticket_id>", endpoint="ticket_close")
+def ticket_close(ticket_id: int):
     if "user_id" not in session:
         return redirect(url_for("login"))
 
     conn = get_db()
-    row = conn.execute(
-        "SELECT ticket_action FROM bookings WHERE id = ? AND user_id = ?",
-        (booking_id, session["user_id"])
-    ).fetchone()
-    if row and (row["ticket_action"] or "") == "blank":
-        conn.execute("DELETE FROM bookings WHERE id = ? AND user_id = ?", (booking_id, session["user_id"]))
-    else:
-        conn.execute(
-            "UPDATE bookings SET needs_review = 0, ticket_action=NULL, ticket_message=NULL WHERE id = ? AND user_id = ?",
-            (booking_id, session["user_id"]),
-        )
+    conn.execute(
+        """
+        UPDATE tickets SET closed_at = datetime('now'), resolution = 'zurueckgezogen'
+         WHERE id = ? AND user_id = ? AND closed_at IS NULL
+        """,
+        (ticket_id, session["user_id"]),
+    )
+    _after_ticket_write(conn, session["user_id"])
     conn.commit()
     conn.close()
     return redirect(url_for("user_only"))
@@ -1020,10 +2185,8 @@ def ticket_open_blank():
     ticket_msg = message + ((" | " + " · ".join(parts)) if parts else "")
 
     conn = get_db()
-    conn.execute("""
-        INSERT INTO bookings (user_id, action, created_at, note, needs_review, ticket_action, ticket_message)
-        VALUES (?, 'mache weiter', datetime('now'), '', 1, 'blank', ?)
-    """, (session["user_id"], ticket_msg))
+    conn.execute("INSERT INTO tickets (user_id, message) VALUES (?, ?)", (session["user_id"], ticket_msg))
+    _after_ticket_write(conn, session["user_id"])
     conn.commit()
     conn.close()
     return redirect(url_for("user_only"))
@@ -1196,7 +2359,7 @@ def admin_journal():
 
 @app.get("/admin/journal/export")
 def admin_journal_export():
-    """CSV-Export der sichtbaren Woche für einen User."""
+    """CSV-Export der sichtbaren Woche für einen User (period=all: gesamtes Tagebuch)."""
     if "user_id" not in session:
         return redirect(url_for("login"))
     if session.get("role") != "admin":
@@ -1211,50 +2374,52 @@ def admin_journal_export():
         conn.close()
         return ("uid fehlt/ungültig", 400)
 
-    date_arg = request.args.get("date")
-    try:
-        anchor = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else date.today()
-    except ValueError:
-        anchor = date.today()
-
-    days = _week_days_mon_fri(anchor)
-    mon = days[0]
-    fri = days[-1]
-
     username_row = conn.execute("SELECT username FROM users WHERE id=?", (uid,)).fetchone()
     if not username_row:
         conn.close()
         return ("User nicht gefunden", 404)
     username = username_row["username"]
 
-    rows = conn.execute("""
-        SELECT entry_date,
-               datetime(created_at,'localtime') AS created_local,
-               content
-        FROM journal_entries
-        WHERE user_id = ?
-          AND entry_date >= ?
-          AND entry_date <= ?
-        ORDER BY entry_date ASC, created_at ASC, id ASC
-    """, (uid, mon.isoformat(), fri.isoformat())).fetchall()
-    conn.close()
+    if (request.args.get("period") or "").lower() == "all":
+        first_row = conn.execute(
+            "SELECT MIN(entry_date) FROM journal_entries WHERE user_id = ?", (uid,)
+        ).fetchone()
+        date_from = first_row[0] or date.today().isoformat()
+        date_to = date.today().isoformat()
+        filename = f"journal_{username}_gesamt_{date_to}.csv"
+    else:
+        date_arg = request.args.get("date")
+        try:
+            anchor = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else date.today()
+        except ValueError:
+            anchor = date.today()
 
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';')
-    writer.writerow(["User", username])
-    writer.writerow(["Zeitraum", f"{mon.isoformat()} bis {fri.isoformat()}"])
-    writer.writerow([])
+        days = _week_days_mon_fri(anchor)
+        date_from = days[0].isoformat()
+        date_to = days[-1].isoformat()
+        filename = f"journal_{username}_{date_from}_{date_to}.csv"
 
-    writer.writerow(["Datum", "Erstellt (lokal)", "Inhalt"])
-    for r in rows:
-        writer.writerow([r["entry_date"], r["created_local"], r["content"]])
+    conn.close()
 
-    csv_data = output.getvalue().encode("utf-8-sig")
-    filename = f"journal_{username}_{mon.isoformat()}_{fri.isoformat()}.csv"
-    resp = make_response(csv_data)
-    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
-    resp.headers["Content-Disposition"] = f'attachment; filename=\"{filename}\"'
-    return resp
+    def rows(conn):
+        yield ["User", username]
+        yield ["Zeitraum", f"{date_from} bis {date_to}"]
+        yield []
+
+        yield ["Datum", "Erstellt (lokal)", "Inhalt"]
+        for r in conn.execute("""
+            SELECT entry_date,
+                   datetime(created_at,'localtime') AS created_local,
+                   content
+            FROM journal_entries
+            WHERE user_id = ?
+              AND entry_date >= ?
+              AND entry_date <= ?
+            ORDER BY entry_date ASC, created_at ASC, id ASC
+        """, (uid, date_from, date_to)):
+            yield [r["entry_date"], r["created_local"], r["content"]]
+
+    return _csv_response(filename, rows)
 # ------------------- Ende Admin: Tagebuch ------------------------------------
 
 # ------------------- ADMIN: Benutzerverwaltung -------------------------------
@@ -1358,78 +2523,792 @@ def admin_users_update(user_id: int):
     return redirect(url_for("admin_users"))
 # ------------------- Ende Admin: Benutzer -----------------------------------
 
-# --- Report-Helfer ---
-WORK_START = {"bin da", "kommt"}
-WORK_END   = {"gehe", "geht"}
-BRK_START  = {"päuschen", "pause"}
-BRK_END    = {"mache weiter", "pausenende"}
-AFK_START  = {"afk", "abwesend"}
-AFK_END    = {"wieder da", "wieder_da"}
+# --- Tages-Aggregate (daily_minutes) ---
+def _booking_day(conn, booking_id):
+    row = conn.execute("SELECT local_day FROM bookings WHERE id = ?", (booking_id,)).fetchone()
+    return row[0] if row else None
 
-def _parse_ts(ts: str) -> datetime:
-    return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+def _day_events(conn, uid, day_from, day_to):
+    """Buchungen für local_day in [day_from, day_to), sortiert.
 
-def compute_day_minutes(events):
-    work = breaks = afk = 0
-    on = brk_on = afk_on = None
-    flags = []
+    Zeit als lokale Sekunden (wie die lokale Uhrzeit, die report_engine.compute_day_minutes parst).
+    """
+    cur = conn.cursor()
+    cur.row_factory = None   # Tupel statt sqlite3.Row – die Engine entpackt direkt
+    return cur.execute("""
+        SELECT local_day, CAST(strftime('%s', created_at, 'localtime') AS INTEGER) AS lts, action
+        FROM bookings
+        WHERE user_id = ?
+          AND local_day >= ?
+          AND local_day <  ?
+        ORDER BY local_day ASC, ts ASC, id ASC
+    """, (uid, day_from, day_to))
+
+def _daily_rows_from_events(events):
+    """(local_day, lokale Sekunden, action) -> Zeilen (day, work, breaks, afk, net, flags_json)."""
+    days, work, breaks, afk, net, flags = compute_period_minutes(events)
+    return list(zip(days, work, breaks, afk, net,
+                    [json.dumps(f, ensure_ascii=False) if f else None for f in flags]))
+
+def _daily_rows_for_user(conn, uid):
+    return _daily_rows_from_events(_day_events(conn, uid, "0000-00-00", "9999-99-99"))
+
+def _store_daily_rows(conn, uid, rows):
+    conn.executemany("""
+        INSERT OR REPLACE INTO daily_minutes (user_id, day, work, breaks, afk, net, flags)
+        VALUES (?,?,?,?,?,?,?)
+    """, [(uid,) + tuple(r) for r in rows])
+
+def _refresh_daily_minutes(conn, uid, days):
+    """Nur die betroffenen Tage eines Users neu rechnen (Teil der laufenden Transaktion)."""
+    for day in {d for d in days if d}:
+        nxt = (datetime.strptime(day, "%Y-%m-%d").date() + timedelta(days=1)).isoformat()
+        rows = _daily_rows_from_events(_day_events(conn, uid, day, nxt))
+        conn.execute("DELETE FROM daily_minutes WHERE user_id = ? AND day = ?", (uid, day))
+        _store_daily_rows(conn, uid, rows)
+
+# --- Report-Cache: fertige Tageszeilen je (uid, Zeitraum) ---
+# Gültig, solange report_versions.version des Users gleich ist; jede
+# Buchungsänderung zählt die Version hoch (_after_booking_write). Begrenzt
+# über Anzahl Einträge und Summe der Tageszeilen, LRU-Verdrängung.
+REPORT_CACHE_ENTRIES = int(os.getenv("REPORT_CACHE_ENTRIES", "256"))
+REPORT_CACHE_ROWS = int(os.getenv("REPORT_CACHE_ROWS", "100000"))
+
+class _ReportCache:
+    def __init__(self, max_entries, max_rows):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._data = collections.OrderedDict()   # key -> (version, value, rows)
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                self.stale += 1
+                self._rows -= entry[2]
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, value, rows):
+        if rows > self.max_rows:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._rows -= old[2]
+            self._data[key] = (version, value, rows)
+            self._rows += rows
+            while len(self._data) > self.max_entries or self._rows > self.max_rows:
+                _, (_, _, n) = self._data.popitem(last=False)
+                self._rows -= n
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._rows = 0
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses + self.stale
+            return {"entries": len(self._data), "rows": self._rows,
+                    "max_entries": self.max_entries, "max_rows": self.max_rows,
+                    "hits": self.hits, "misses": self.misses, "stale": self.stale,
+                    "evictions": self.evictions,
+                    "hit_ratio": round(self.hits / total, 3) if total else None}
+
+_report_cache = _ReportCache(REPORT_CACHE_ENTRIES, REPORT_CACHE_ROWS)
+
+def _bump_report_version(conn, uid):
+    conn.execute("""
+        INSERT INTO report_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+    """, (uid,))
+
+def _report_version(conn, uid):
+    row = conn.execute("SELECT version FROM report_versions WHERE user_id = ?", (uid,)).fetchone()
+    return row[0] if row else 0
+
+def _report_days(conn, uid, start_dt, end_dt):
+    """(Tageszeilen, Summen) für [start_dt, end_dt); Ergebnis nicht verändern (geteilt)."""
+    # Version vor den Daten lesen: eine Buchung dazwischen macht den Eintrag nur stale
+    version = _report_version(conn, uid)
+    key = (uid, start_dt.date(), end_dt.date())
+    cached = _report_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    value = report_days(conn, uid, start_dt, end_dt)
+    _report_cache.put(key, version, value, len(value[0]))
+    return value
+
+def _rebuild_projections(conn):
+    """user_status, ticket_counts + daily_minutes komplett neu (nach Migrationen, die bookings ändern).
+
+    Eine kurze Transaktion pro User, Buchungen laufen währenddessen weiter.
+    """
+    _rebuild_user_status(conn)
+    _rebuild_ticket_counts(conn)
+    conn.commit()
+    for (uid,) in conn.execute("SELECT id FROM users").fetchall():
+        conn.execute("DELETE FROM daily_minutes WHERE user_id = ?", (uid,))
+        _store_daily_rows(conn, uid, _daily_rows_for_user(conn, uid))
+        _bump_report_version(conn, uid)
+        conn.commit()
 
-    for ts_str, action in events:
-        t = _parse_ts(ts_str)
+def _rebuild_user_days_job(uid):
+    """Prozess-Pool-Job: eigene Verbindung, liefert alle Tageszeilen eines Users."""
+    conn = _open_connection()
+    try:
+        return uid, _daily_rows_for_user(conn, uid)
+    finally:
+        sqlite3.Connection.close(conn)
+
+# --- CLI: Projektionen neu aufbauen (flask --app app rebuild-status) ---
+@app.cli.command("rebuild-status")
+def rebuild_status_command():
+    """user_status komplett aus bookings neu aufbauen."""
+    conn = get_db()
+    _rebuild_user_status(conn)
+    conn.commit()
+    n = conn.execute("SELECT COUNT(*) FROM user_status WHERE state = 'da'").fetchone()[0]
+    conn.close()
+    click.echo(f"OK: user_status neu aufgebaut ({n} anwesend).")
 
-        if action in WORK_START:
-            if on is None:
-                on = t
-            else:
-                work += max(0, int((t - on).total_seconds() // 60))
-                if brk_on:
-                    breaks += max(0, int((t - brk_on).total_seconds() // 60))
-                    brk_on = None
-                if afk_on:
-                    afk += max(0, int((t - afk_on).total_seconds() // 60))
-                    afk_on = None
-                on = t
-
-        elif action in WORK_END:
-            if on is not None:
-                work += max(0, int((t - on).total_seconds() // 60))
-                on = None
-                if brk_on:
-                    breaks += max(0, int((t - brk_on).total_seconds() // 60))
-                    brk_on = None
-                if afk_on:
-                    afk += max(0, int((t - afk_on).total_seconds() // 60))
-                    afk_on = None
-            else:
-                flags.append("Ende ohne Start")
+@app.cli.command("rebuild-daily")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, help="Prozesse für die Neuberechnung")
+def rebuild_daily_command(workers):
+    """daily_minutes für alle User parallel aus bookings neu berechnen."""
+    conn = get_db()
+    uids = [r[0] for r in conn.execute("SELECT id FROM users ORDER BY id").fetchall()]
+    done = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as ex:
+        futures = [ex.submit(_rebuild_user_days_job, uid) for uid in uids]
+        for fut in as_completed(futures):
+            uid, rows = fut.result()
+            # pro User eine kurze Schreib-Transaktion
+            conn.execute("DELETE FROM daily_minutes WHERE user_id = ?", (uid,))
+            _store_daily_rows(conn, uid, rows)
+            _bump_report_version(conn, uid)
+            conn.commit()
+            done += 1
+            click.echo(f"  [{done}/{len(uids)}] user {uid}: {len(rows)} Tage")
+    conn.close()
+    click.echo("OK: daily_minutes neu aufgebaut.")
+
+# ---- DB-Wartung im Hintergrund -----------------------------------------------
+# Ein Thread pro Worker prüft alle MAINT_TICK_S lesend, welche Jobs fällig sind. Über
+# eine Lease in maintenance_log läuft jeder Job nur in einem Worker; Ergebnis
+# und Dauer landen ebenfalls dort (Anzeige in /admin/diag).
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE", "1") != "0"
+MAINT_TICK_S = float(os.getenv("MAINT_TICK_S", "15"))
+MAINT_VACUUM_PAGES = int(os.getenv("MAINT_VACUUM_PAGES", "2000"))
+MAINT_TRUNCATE_BUSY_MS = 1000       # TRUNCATE wartet auf Leser; nicht lange blockieren
+MAINT_LEASE = "+10 minutes"
+
+def _maint_checkpoint_passive(conn):
+    busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return {"busy": busy, "wal_pages": log, "checkpointed": done}
+
+def _maint_checkpoint_truncate(conn):
+    conn.execute(f"PRAGMA busy_timeout = {MAINT_TRUNCATE_BUSY_MS}")
+    try:
+        busy, log, done = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {SQLITE_PROFILE['busy_timeout']}")
+    wal = DB_PATH + "-wal"
+    return {"busy": busy, "wal_pages": log, "checkpointed": done,
+            "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0}
+
+def _maint_optimize(conn):
+    conn.execute("PRAGMA analysis_limit = 1000")
+    # ohne Statistik (nie analysiert) hilft optimize auf einer frischen Verbindung nicht
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        conn.execute("ANALYZE")
+        return {"analyze": True}
+    conn.execute("PRAGMA optimize = 0x10002")
+    return {"optimize": True}
+
+def _maint_incremental_vacuum(conn):
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if mode != 2:
+        return {"skipped": "auto_vacuum != INCREMENTAL", "freelist_pages": free}
+    conn.execute(f"PRAGMA incremental_vacuum({MAINT_VACUUM_PAGES})").fetchall()
+    left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"freed_pages": free - left, "freelist_pages": left}
+
+def _maint_space_stats(conn):
+    # Bytes pro Tabelle/Index über dbstat (liest alle Seiten, daher nur im Hintergrund)
+    try:
+        rows = conn.execute("""
+            SELECT name, SUM(pgsize) AS bytes, SUM(unused) AS unused
+              FROM dbstat GROUP BY name ORDER BY bytes DESC
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return {"dbstat": False}
+    return {"dbstat": True,
+            "objects": {r["name"]: {"bytes": r["bytes"], "unused": r["unused"]} for r in rows}}
+
+def _maint_quick_check(conn):
+    rows = [r[0] for r in conn.execute("PRAGMA quick_check(20)").fetchall()]
+    return {"ok": rows == ["ok"], "messages": rows[:20]}
+
+# task -> (Intervall in s, Funktion)
+MAINTENANCE_TASKS = {
+    "wal_checkpoint_passive":  (int(os.getenv("MAINT_CHECKPOINT_S", "60")),     _maint_checkpoint_passive),
+    "wal_checkpoint_truncate": (int(os.getenv("MAINT_TRUNCATE_S", "3600")),     _maint_checkpoint_truncate),
+    "optimize":                (int(os.getenv("MAINT_OPTIMIZE_S", "3600")),     _maint_optimize),
+    "incremental_vacuum":      (int(os.getenv("MAINT_VACUUM_S", "21600")),      _maint_incremental_vacuum),
+    "quick_check":             (int(os.getenv("MAINT_QUICK_CHECK_S", "86400")), _maint_quick_check),
+    "space_stats":             (int(os.getenv("MAINT_SPACE_STATS_S", "3600")),  _maint_space_stats),
+}
 
-        elif action in BRK_START:
-            if on is not None and brk_on is None:
-                brk_on = t
+def _due_maintenance_tasks(conn):
+    """Fällige Jobs mit freier Lease – reiner Lesezugriff.
+
+    Der Thread fragt alle MAINT_TICK_S; geschrieben wird nur, wenn wirklich
+    ein Job läuft (sonst Schreib-Lock gegen /book und data_version-Bump, der
+    den Presence-Broadcaster weckt).
+    """
+    rows = {r["task"]: r for r in conn.execute("""
+        SELECT task, last_run_at,
+               IFNULL(lease_until >= datetime('now'), 0) AS leased,
+               CAST(strftime('%s', 'now') - strftime('%s', last_run_at) AS INTEGER) AS age_s
+          FROM maintenance_log
+    """)}
+    due = []
+    for task, (interval, _) in MAINTENANCE_TASKS.items():
+        r = rows.get(task)
+        if r is None or (not r["leased"] and (r["last_run_at"] is None or r["age_s"] >= interval)):
+            due.append(task)
+    return due
+
+def _claim_maintenance_task(conn, task, owner, interval, force):
+    """Lease mit einem bedingten UPDATE holen; nur der Worker mit rowcount 1 führt aus."""
+    lease = f"datetime('now', '{MAINT_LEASE}')"
+    claimed = conn.execute(f"""
+        UPDATE maintenance_log
+           SET lease_owner = ?, lease_until = {lease}
+         WHERE task = ?
+           AND (lease_until IS NULL OR lease_until < datetime('now'))
+           AND (? OR last_run_at IS NULL OR last_run_at <= datetime('now', ?))
+    """, (owner, task, 1 if force else 0, f"-{interval} seconds")).rowcount
+    if not claimed and not conn.execute("SELECT 1 FROM maintenance_log WHERE task = ?", (task,)).fetchone():
+        # erster Lauf überhaupt: Zeile gleich mit Lease anlegen
+        claimed = conn.execute(
+            f"INSERT OR IGNORE INTO maintenance_log (task, lease_owner, lease_until) VALUES (?, ?, {lease})",
+            (task, owner)
+        ).rowcount
+    if claimed:
+        conn.commit()
+    else:
+        conn.rollback()
+    return bool(claimed)
 
-        elif action in BRK_END:
-            if brk_on is not None:
-                breaks += max(0, int((t - brk_on).total_seconds() // 60))
-                brk_on = None
+def _run_maintenance_task(conn, task, owner, force=False):
+    """Job ausführen, falls fällig und Lease frei. Gibt das Ergebnis zurück oder None."""
+    interval, fn = MAINTENANCE_TASKS[task]
+    if not _claim_maintenance_task(conn, task, owner, interval, force):
+        return None
 
-        elif action in AFK_START:
-            if on is not None and afk_on is None:
-                afk_on = t
+    t0 = time.perf_counter()
+    try:
+        result, ok = fn(conn), 1
+    except sqlite3.Error as e:
+        result, ok = {"error": str(e)}, 0
+    if conn.in_transaction:
+        conn.rollback()
+    if task == "quick_check" and not result.get("ok", True):
+        ok = 0
+    conn.execute("""
+        UPDATE maintenance_log
+           SET last_run_at = datetime('now'), duration_ms = ?, ok = ?, result = ?,
+               lease_owner = NULL, lease_until = NULL
+         WHERE task = ?
+    """, (int((time.perf_counter() - t0) * 1000), ok, json.dumps(result), task))
+    conn.commit()
+    return result
+
+class _MaintenanceThread:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        if not MAINTENANCE_ENABLED:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+            self._thread.start()
+
+    def alive(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _run(self):
+        owner = f"{os.uname().nodename}:{os.getpid()}"
+        conn = None
+        while True:
+            try:
+                if conn is None:
+                    conn = _open_connection()
+                for task in _due_maintenance_tasks(conn):
+                    _run_maintenance_task(conn, task, owner)
+            except sqlite3.Error as e:
+                print("maintenance:", e)
+                try:
+                    sqlite3.Connection.close(conn)
+                except Exception:
+                    pass
+                conn = None
+            time.sleep(MAINT_TICK_S)
+
+_maintenance = _MaintenanceThread()
+
+@app.before_request
+def _start_maintenance():
+    # im Worker starten (nicht im --preload-Master, der keine Requests bedient)
+    _maintenance.ensure_started()
+
+@app.cli.command("maintenance")
+@click.option("--task", type=click.Choice(sorted(MAINTENANCE_TASKS)), multiple=True, help="nur diese Jobs")
+def maintenance_command(task):
+    """Wartungsjobs sofort ausführen (unabhängig vom Zeitplan)."""
+    conn = _open_connection()
+    owner = f"cli:{os.getpid()}"
+    for name in (task or MAINTENANCE_TASKS):
+        result = _run_maintenance_task(conn, name, owner, force=True)
+        click.echo(f"  {name}: {json.dumps(result) if result is not None else 'läuft gerade woanders'}")
+    sqlite3.Connection.close(conn)
+
+@app.cli.command("enable-auto-vacuum")
+def enable_auto_vacuum_command():
+    """Bestehende DB auf auto_vacuum=INCREMENTAL umstellen (VACUUM, App vorher stoppen)."""
+    conn = _open_connection()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    sqlite3.Connection.close(conn)
+    click.echo(f"OK: auto_vacuum = {mode} (2 = INCREMENTAL)")
+
+def _sqlite_settings(conn):
+    names = ["journal_mode", "synchronous", "auto_vacuum", *SQLITE_PROFILE]
+    return {n: conn.execute(f"PRAGMA {n}").fetchone()[0] for n in names}
+
+def _approx_row_counts(conn):
+    """Zeilenzahlen aus sqlite_stat1 (Stand letztes ANALYZE/optimize) – ohne Tabellenscan."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        return {}
+    counts = {}
+    for r in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+        n = int(r["stat"].split()[0]) if r["stat"] else 0
+        counts[r["tbl"]] = max(counts.get(r["tbl"], 0), n)
+    return counts
+
+def _storage_info(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    files = {}
+    for suffix in ("", "-wal", "-shm"):
+        p = DB_PATH + suffix
+        files["db" + (suffix or "")] = os.path.getsize(p) if os.path.exists(p) else 0
+    return {"page_size": page_size, "page_count": page_count, "freelist_count": freelist,
+            "freelist_bytes": freelist * page_size, "files": files}
+
+def _maintenance_status(conn):
+    out = {"enabled": MAINTENANCE_ENABLED, "thread_alive": _maintenance.alive(), "tasks": {}}
+    for r in conn.execute("SELECT * FROM maintenance_log ORDER BY task"):
+        out["tasks"][r["task"]] = {
+            "interval_s": MAINTENANCE_TASKS.get(r["task"], (None,))[0],
+            "last_run_at": r["last_run_at"], "duration_ms": r["duration_ms"], "ok": r["ok"],
+            "result": json.loads(r["result"]) if r["result"] else None,
+            "running_on": r["lease_owner"],
+        }
+    return out
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")    # optional: Scraper per "Authorization: Bearer <token>"
+
+@app.get("/admin/metrics")
+def admin_metrics():
+    bearer = request.headers.get("Authorization", "")
+    if not (METRICS_TOKEN and bearer == f"Bearer {METRICS_TOKEN}"):
+        if "user_id" not in session:
+            return redirect(url_for("login"))
+        if session.get("role") != "admin":
+            return redirect(url_for("unauthorized"))
+    return Response(_metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
 
-        elif action in AFK_END:
-            if afk_on is not None:
-                afk += max(0, int((t - afk_on).total_seconds() // 60))
-                afk_on = None
+@app.get("/admin/slow-queries")
+@session_required
+def admin_slow_queries():
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
+    return render_template(
+        "admin_slow_queries.html",
+        title="Langsame Queries",
+        rows=_slow_query_summary(),
+        threshold_ms=SLOW_QUERY_MS,
+        log_path=SLOW_QUERY_LOG,
+    )
 
-    if on is not None:
-        flags.append("Offener Arbeitstag (kein Ende)")
-    if brk_on is not None:
-        flags.append("Offene Pause (kein Ende)")
-    if afk_on is not None:
-        flags.append("Offenes AFK (kein Ende)")
+# ---- Profiler auf Abruf ------------------------------------------------------
+# Admin hängt "?_profile=1" (cProfile) bzw. "?_profile=sample" an oder schickt den
+# Header "X-Profile: 1|sample". Der Request läuft dann unter dem Profiler (View
+# + Template; Streaming-Bodys nicht). Ergebnis landet als Datei in PROFILE_DIR
+# (Ringpuffer der letzten PROFILE_KEEP, für alle Worker sichtbar) und ist unter
+# /admin/profiles abrufbar. Andere Requests zahlen nur den Blick auf args/Header.
+# Pro Prozess läuft höchstens ein Profil: cProfile hängt ab Python 3.12 prozessweit
+# an sys.monitoring (ein zweites enable() wirft ValueError) und zählt dabei auch
+# Frames paralleler Requests mit – das Profil vermerkt, wie viele es waren.
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_MIN_INTERVAL_S = float(os.getenv("PROFILE_MIN_INTERVAL_S", "10"))   # pro Worker
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "1"))
+_PROFILE_ID = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+
+_profile_lock = threading.Lock()        # schützt _profile_state
+_profile_active = threading.Lock()      # gehalten, solange ein Profil läuft (nie blockierend holen)
+_profile_state = {"last": 0.0, "overlap": 0}
+
+class _StackSampler:
+    """Sampling-Profiler für einen Thread: Stack alle PROFILE_SAMPLE_MS, Ausgabe als collapsed stacks."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        interval = PROFILE_SAMPLE_MS / 1000.0
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+def _profile_requested():
+    if b"_profile" not in request.query_string and "X-Profile" not in request.headers:
+        return None
+    mode = request.args.get("_profile") or request.headers.get("X-Profile")
+    if not mode or session.get("role") != "admin":
+        return None
+    return "sample" if mode == "sample" else "cprofile"
+
+def _redacted_args():
+    return {k: ("<redacted>" if any(w in k.lower() for w in ("pass", "token", "secret")) else v)
+            for k, v in request.args.items() if k != "_profile"}
+
+@app.before_request
+def _profile_start():
+    mode = _profile_requested()
+    if mode is None:
+        if _profile_active.locked():          # läuft gerade ein Profil mit?
+            with _profile_lock:
+                _profile_state["overlap"] += 1
+        return
+    if not _profile_active.acquire(blocking=False):
+        g._profile_skipped = "busy"
+        return
+    now = time.monotonic()
+    with _profile_lock:
+        if now - _profile_state["last"] < PROFILE_MIN_INTERVAL_S:
+            _profile_active.release()
+            g._profile_skipped = "rate-limited"
+            return
+        _profile_state["last"] = now
+        _profile_state["overlap"] = 0
+    try:
+        if mode == "sample":
+            prof = _StackSampler(threading.get_ident())
+            prof.start()
+        else:
+            prof = cProfile.Profile()
+            prof.enable()
+    except ValueError:                        # anderes Profiling-Tool belegt sys.monitoring
+        _profile_active.release()
+        g._profile_skipped = "busy"
+        return
+    g._profile = (mode, prof, time.perf_counter())
+
+@app.after_request
+def _profile_header(resp):
+    if g.get("_profile_skipped"):
+        resp.headers["X-Profile-Skipped"] = g._profile_skipped
+    elif g.get("_profile") is not None:
+        g._profile_status = resp.status_code
+        g._profile_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        resp.headers["X-Profile-Id"] = g._profile_id
+    return resp
 
-    net = max(0, work - breaks - afk)
-    return {"work": work, "breaks": breaks, "afk": afk, "net": net, "flags": flags}
+@app.teardown_request
+def _profile_finish(exc):
+    entry = g.pop("_profile", None)
+    if entry is None:
+        return
+    mode, prof, t0 = entry
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    try:
+        if mode == "sample":
+            prof.stop()
+        else:
+            prof.disable()
+        pid = g.get("_profile_id") or datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        meta = {"id": pid, "mode": mode, "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "endpoint": request.endpoint, "method": request.method, "path": request.path,
+                "args": _redacted_args(), "status": g.get("_profile_status", 500),
+                "wall_ms": round(wall_ms, 1), "worker": os.getpid()}
+        with _profile_lock:
+            meta["concurrent"] = _profile_state["overlap"]
+        _save_profile(meta, prof)
+    except Exception as e:          # Profil verlieren ist ok, Request nicht
+        print("profiler:", e)
+    finally:
+        _profile_active.release()
+
+def _save_profile(meta, prof):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, meta["id"])
+    if meta["mode"] == "sample":
+        meta["samples"] = prof.samples
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(prof.collapsed())
+        top = collections.Counter()
+        for stack, n in prof.counts.items():
+            top[stack.rsplit(";", 1)[-1]] += n
+        meta["summary"] = "\n".join(f"{n:6d}  {frame}" for frame, n in top.most_common(30))
+    else:
+        prof.create_stats()
+        with open(base + ".prof", "wb") as f:
+            marshal.dump(prof.stats, f)                     # Format von pstats.dump_stats
+        out = io.StringIO()
+        if sys.version_info >= (3, 12):
+            out.write("Hinweis: cProfile misst prozessweit (sys.monitoring) – Frames von "
+                      f"{meta['concurrent']} parallel gestarteten Request(s) dieses Workers sind enthalten.\n")
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(30)
+        meta["summary"] = out.getvalue()
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Ringpuffer: nur die neuesten PROFILE_KEEP behalten
+    ids = sorted({n.split(".", 1)[0] for n in os.listdir(PROFILE_DIR) if _PROFILE_ID.match(n.split(".", 1)[0])})
+    for old in ids[:-PROFILE_KEEP]:
+        for ext in (".json", ".prof", ".collapsed"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except FileNotFoundError:
+                pass
+
+def _list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json") and _PROFILE_ID.match(name[:-5]):
+            try:
+                with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return out
+
+@app.get("/admin/profiles")
+@session_required
+def admin_profiles():
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
+    profiles = _list_profiles()
+    selected = request.args.get("id")
+    current = next((p for p in profiles if p["id"] == selected), profiles[0] if profiles else None)
+    return render_template(
+        "admin_profiles.html",
+        title="Profile",
+        profiles=profiles,
+        current=current,
+        keep=PROFILE_KEEP,
+        min_interval=PROFILE_MIN_INTERVAL_S,
+    )
+
+@app.get("/admin/profiles/<profile_id>.<fmt>")
+@session_required
+def admin_profile_download(profile_id, fmt):
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
+    ext = {"prof": ".prof", "collapsed": ".collapsed"}.get(fmt)
+    if not ext or not _PROFILE_ID.match(profile_id):
+        return ("Unbekanntes Profil/Format", 404)
+    path = os.path.join(PROFILE_DIR, profile_id + ext)
+    if not os.path.exists(path):
+        return ("Profil nicht (mehr) vorhanden", 404)
+    with open(path, "rb") as f:
+        data = f.read()
+    mimetype = "application/octet-stream" if fmt == "prof" else "text/plain; charset=utf-8"
+    resp = Response(data, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{profile_id}{ext}"'
+    return resp
+
+# ---- Speicher (tracemalloc) ---------------------------------------------------
+# Pro Worker: tracemalloc an/aus (MEMTRACE=1 startet es schon beim Import),
+# Snapshots vergleichen und Peak/Nettozuwachs pro Endpoint. Der Peak wird zu
+# Requestbeginn zurückgesetzt und ist bei parallelen Requests eine Näherung
+# (tracemalloc kennt keine Threads). RSS-Zuwachs pro Request als Grundlage
+# für gunicorn max_requests. Ohne laufendes tracemalloc kostet der Hook nichts.
+MEMTRACE_FRAMES = int(os.getenv("MEMTRACE_FRAMES", "10"))
+MEMTRACE_FRAMES_MAX = 50                          # Obergrenze für das Formular (Traces werden sonst sehr groß)
+MEM_TOP = 25
+_mem_lock = threading.Lock()
+_mem_routes = {}                                  # endpoint -> Zähler
+_mem_snapshots = collections.deque(maxlen=2)      # (Zeit, Snapshot) zum Vergleichen
+_mem_base = {"pid": None, "rss": None, "requests": 0, "at": None}
+_MEM_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")]
+
+if os.getenv("MEMTRACE") == "1":
+    tracemalloc.start(MEMTRACE_FRAMES)
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _maxrss_bytes():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024     # Linux: KiB
+    except ImportError:
+        return None
+
+def _requests_served():
+    with _metrics._lock:
+        return sum(_metrics.requests.values())
+
+@app.before_request
+def _mem_start():
+    if _mem_base["pid"] != os.getpid():
+        _mem_base.update(pid=os.getpid(), rss=_rss_bytes(), requests=_requests_served(),
+                         at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        g._mem0 = tracemalloc.get_traced_memory()[0]
+
+@app.teardown_request
+def _mem_finish(exc):
+    mem0 = g.pop("_mem0", None)
+    if mem0 is None or not tracemalloc.is_tracing():
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    endpoint = request.url_rule.endpoint if request.url_rule else "(unbekannt)"
+    with _mem_lock:
+        r = _mem_routes.setdefault(endpoint, {"n": 0, "peak_max": 0, "peak_sum": 0, "net_sum": 0})
+        r["n"] += 1
+        r["peak_max"] = max(r["peak_max"], peak - mem0)
+        r["peak_sum"] += peak - mem0
+        r["net_sum"] += current - mem0
+
+def _top_stats(stats):
+    out = []
+    for st in stats[:MEM_TOP]:
+        frame = st.traceback[0]
+        out.append({"where": f"{frame.filename}:{frame.lineno}",
+                    "size": st.size, "count": st.count,
+                    "size_diff": getattr(st, "size_diff", None), "count_diff": getattr(st, "count_diff", None)})
+    return out
+
+@app.get("/admin/memory")
+@session_required
+def admin_memory():
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
+
+    tracing = tracemalloc.is_tracing()
+    top, diff = [], []
+    traced = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    if tracing:
+        snap = tracemalloc.take_snapshot().filter_traces(_MEM_FILTERS)
+        top = _top_stats(snap.statistics("lineno"))
+    if len(_mem_snapshots) == 2:
+        (at_old, old), (at_new, new) = _mem_snapshots
+        diff = _top_stats(new.compare_to(old, "lineno"))
+    with _mem_lock:
+        routes = sorted(({"endpoint": ep, **r, "peak_avg": r["peak_sum"] / r["n"], "net_avg": r["net_sum"] / r["n"]}
+                         for ep, r in _mem_routes.items()), key=lambda x: x["peak_max"], reverse=True)
+
+    rss = _rss_bytes()
+    served = _requests_served() - _mem_base["requests"]
+    growth = (rss - _mem_base["rss"]) if rss is not None and _mem_base["rss"] is not None else None
+    per_req = growth / served if growth and growth > 0 and served else None
+    budget_mb = request.args.get("budget_mb", default=256, type=int)
+    suggest = int(budget_mb * 1024 * 1024 / per_req) if per_req else None
+
+    return render_template(
+        "admin_memory.html",
+        title="Speicher",
+        worker=os.getpid(), tracing=tracing, frames=tracemalloc.get_traceback_limit() if tracing else MEMTRACE_FRAMES,
+        frames_max=MEMTRACE_FRAMES_MAX,
+        traced_current=traced[0], traced_peak=traced[1],
+        rss=rss, maxrss=_maxrss_bytes(), base=_mem_base, served=served, growth=growth,
+        per_req=per_req, budget_mb=budget_mb, suggest=suggest,
+        routes=routes, top=top, diff=diff,
+        snapshots=[at for at, _ in _mem_snapshots],
+    )
+
+@app.post("/admin/memory/<action>")
+@session_required
+def admin_memory_action(action):
+    if session.get("role") != "admin":
+        return redirect(url_for("unauthorized"))
+    if action == "start" and not tracemalloc.is_tracing():
+        frames = request.form.get("frames", default=MEMTRACE_FRAMES, type=int)
+        if not 1 <= frames <= MEMTRACE_FRAMES_MAX:
+            return (f"Frames: 1 bis {MEMTRACE_FRAMES_MAX}", 400)
+        tracemalloc.start(frames)
+    elif action == "stop":
+        tracemalloc.stop()                 # gibt auch den Speicher der Traces frei
+        _mem_snapshots.clear()
+    elif action == "snapshot" and tracemalloc.is_tracing():
+        _mem_snapshots.append((datetime.now().strftime("%H:%M:%S"),
+                               tracemalloc.take_snapshot().filter_traces(_MEM_FILTERS)))
+    elif action == "reset":
+        with _mem_lock:
+            _mem_routes.clear()
+    else:
+        return ("Unbekannte Aktion", 400)
+    return redirect(url_for("admin_memory"))
 
 # --- Admin-Diagnose (read-only, ohne flask_login) ---
 @app.route("/admin/diag")
@@ -1442,19 +3321,45 @@ def admin_diag():
     if not db_path or not os.path.exists(db_path):
         return jsonify({"db_path": db_path or "(keine gefunden)", "tables": [], "note": "Keine DB gefunden"}), 200
 
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-    tables = [r[0] for r in cur.fetchall()]
-    sample_counts = {}
-    for t in tables[:10]:
-        try:
-            cur.execute(f"SELECT COUNT(1) FROM {t};")
-            sample_counts[t] = cur.fetchone()[0]
-        except Exception:
-            sample_counts[t] = "n/a"
-    conn.close()
-    return jsonify({"db_path": db_path, "tables": tables, "counts": sample_counts}), 200
+    # nur Metadaten und gepflegte Statistik lesen – kein COUNT(*), Laufzeit
+    # unabhängig von der Tabellengröße. Zählungen sind Näherungen (Stand
+    # des letzten optimize-Laufs), Bytes pro Objekt aus dem space_stats-Job.
+    conn = get_db()
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+    approx = _approx_row_counts(conn)
+    # ANALYZE schreibt für leere Tabellen keine Zeile
+    counts = {t: approx.get(t, 0 if approx else None) for t in tables if not t.startswith("sqlite_")}
+    maintenance = _maintenance_status(conn) if "maintenance_log" in tables else None
+    storage = _storage_info(conn)
+    space = ((maintenance or {}).get("tasks", {}).get("space_stats") or {})
+    storage["objects"] = (space.get("result") or {}).get("objects")
+    storage["objects_at"] = space.get("last_run_at")
+    stats_at = ((maintenance or {}).get("tasks", {}).get("optimize") or {}).get("last_run_at")
+    return jsonify({"db_path": db_path, "tables": tables,
+                    "counts": counts, "counts_source": "sqlite_stat1", "counts_at": stats_at,
+                    "storage": storage, "sqlite": _sqlite_settings(conn),
+                    "pool": _db_pool.snapshot(),
+                    "report_cache": _report_cache.snapshot(),
+                    "booking_writer": _booking_writer.snapshot(),
+                    "maintenance": maintenance,
+                    "boot": dict(_BOOT, worker_pid=os.getpid())}), 200
+
+# auch beim Import ausführen (WSGI) – am Dateiende, damit alle Helfer definiert sind.
+# Mit gunicorn --preload passiert das einmal im Master; die Worker erben das
+# fertige Modul. worker_boot_ms setzt gunicorn.conf.py (post_worker_init).
+# Nicht als __mp_main__: "python app.py" lädt sich sonst in jedem Export-Kind
+# (multiprocessing bereitet dort das Hauptmodul vor) und migriert erneut.
+_BOOT = {"pid": os.getpid(), "schema": None, "schema_version": SCHEMA_VERSION,
+         "init_db_ms": None, "import_ms": None, "worker_boot_ms": None, "preloaded": None}
+if __name__ != "__mp_main__":
+    try:
+        _t0 = time.perf_counter()
+        _BOOT["schema"] = init_db()
+        _BOOT["init_db_ms"] = round((time.perf_counter() - _t0) * 1000.0, 1)
+    except Exception as e:
+        print("init_db() failed:", e)
+_db_pool.close_idle()   # keine offenen SQLite-Handles über fork() vererben
+_BOOT["import_ms"] = round((time.perf_counter() - _IMPORT_T0) * 1000.0, 1)
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,131 @@
+# bench_booking_burst.py – Schichtbeginn simulieren: N Buchungen fast gleichzeitig auf /book
+#
+#   python bench_booking_burst.py --bookings 200 --threads 16
+#   python bench_booking_burst.py --lock-ms 3000      # DB während des Bursts sperren -> Spool
+#
+# Läuft gegen eine Temp-DB (app.test_client, Threads wie gthread). Misst die
+# Latenz pro Request einmal mit direkter Transaktion pro Request und einmal mit
+# Group-Commit-Writer (BOOKING_GROUP_COMMIT) und gibt p50/p95/p99/max aus.
+import os, sys, time, json, sqlite3, argparse, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# app importieren, ohne die echte DB anzufassen
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DB_PATH", os.path.join(_tmp, "bench.db"))
+os.environ.setdefault("BOOKING_SPOOL", os.path.join(_tmp, "booking_spool.jsonl"))
+import app as A
+
+def make_users(n):
+    conn = sqlite3.connect(A.DB_PATH)
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (username, password_hash, role, weekly_minutes) VALUES (?, 'x', 'user', 2400)",
+        [(f"bench{i:04d}",) for i in range(n)],
+    )
+    conn.commit()
+    uids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'bench%' ORDER BY id")]
+    conn.close()
+    return uids
+
+def pct(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    k = min(len(sorted_ms) - 1, int(round(p / 100.0 * (len(sorted_ms) - 1))))
+    return round(sorted_ms[k], 1)
+
+def hold_lock(ms, started):
+    """Fremde Schreibsperre (z. B. Backup/Migration) für ms Millisekunden."""
+    conn = sqlite3.connect(A.DB_PATH, timeout=30)
+    conn.execute("BEGIN IMMEDIATE")
+    started.set()
+    time.sleep(ms / 1000.0)
+    conn.rollback()
+    conn.close()
+
+def burst(uids, n, threads, action, lock_ms=0):
+    clients = []
+    for uid in uids:
+        c = A.app.test_client()
+        with c.session_transaction() as s:
+            s["user_id"] = uid
+            s["role"] = "user"
+        clients.append(c)
+
+    gate = threading.Barrier(min(threads, n))
+    lat = []
+    errors = []
+
+    def one(i):
+        c = clients[i % len(clients)]
+        if i < threads:
+            gate.wait()
+        t0 = time.perf_counter()
+        r = c.post("/book", data={"action": action})
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        if r.status_code != 302:
+            errors.append(r.status_code)
+
+    locker = None
+    if lock_ms:
+        started = threading.Event()
+        locker = threading.Thread(target=hold_lock, args=(lock_ms, started))
+        locker.start()
+        started.wait()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    if locker:
+        locker.join()
+
+    lat.sort()
+    return {"bookings": n, "threads": threads, "errors": len(errors),
+            "wall_s": round(wall, 3), "per_s": round(n / wall, 1),
+            "p50_ms": pct(lat, 50), "p95_ms": pct(lat, 95), "p99_ms": pct(lat, 99), "max_ms": round(lat[-1], 1)}
+
+def count_bookings():
+    conn = sqlite3.connect(A.DB_PATH)
+    n = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+    conn.close()
+    return n
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bookings", type=int, default=200)
+    ap.add_argument("--threads", type=int, default=16, help="parallele Requests (gthread: Worker × Threads)")
+    ap.add_argument("--lock-ms", type=int, default=0, help="DB während des Bursts so lange fremd sperren")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    uids = make_users(args.bookings)
+    results = {}
+    for mode, group in (("direkt", False), ("group-commit", True)):
+        A.app.config["BOOKING_GROUP_COMMIT"] = group
+        before = count_bookings()
+        # abwechselnd kommen/gehen, damit die Projektionen echte Arbeit haben
+        r = burst(uids, args.bookings, args.threads, "bin da", args.lock_ms)
+        if group and A._spool_pending():
+            t0 = time.perf_counter()
+            while A._spool_pending() and time.perf_counter() - t0 < 30:
+                time.sleep(0.2)
+            r["spool_drained_s"] = round(time.perf_counter() - t0, 2)
+        r["committed"] = count_bookings() - before
+        if group:
+            r["writer"] = A._booking_writer.snapshot()
+        results[mode] = r
+        burst(uids, args.bookings, args.threads, "gehe")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, r in results.items():
+        print(f"{mode:13s} n={r['bookings']} threads={r['threads']}  p50={r['p50_ms']} ms  p95={r['p95_ms']} ms  "
+              f"p99={r['p99_ms']} ms  max={r['max_ms']} ms  {r['per_s']}/s  Fehler={r['errors']}  committet={r['committed']}")
+        if "writer" in r:
+            w = r["writer"]
+            print(f"{'':13s} Batches={w['batches']}  Ø Batch={w['avg_batch']}  max Batch={w['max_batch']}  "
+                  f"Spool={w['spooled']}  nachgetragen={w['replayed']}"
+                  + (f"  Spool leer nach {r['spool_drained_s']} s" if "spool_drained_s" in r else ""))
+
+if __name__ == "__main__":
+    main()
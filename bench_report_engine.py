@@ -0,0 +1,112 @@
+# bench_report_engine.py – compute_day_minutes (pro Tag) vs. compute_period_minutes (ein Durchlauf)
+#
+#   python bench_report_engine.py --users 20 --years 1
+#
+# Erzeugt synthetische Buchungen im Speicher (keine DB nötig), prüft, dass beide
+# Wege identische Tageswerte liefern, und misst die Laufzeit.
+import os, time, random, argparse, tempfile, calendar
+from datetime import date, datetime, timedelta
+
+# app importieren, ohne die echte DB anzufassen
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+import app as A
+import report_engine as E
+
+ACTION_KEYS = [k for k, _ in A.ACTIONS]
+
+def synth_day(rng, day):
+    """Ein Arbeitstag als Liste (lokale Sekunden, action) – inkl. gelegentlicher Fehlbuchungen.
+
+    "Lokale Sekunden" = lokale Uhrzeit als naive Epoch, wie strftime('%s', created_at, 'localtime').
+    """
+    base = calendar.timegm(day.timetuple())
+    t = base + 7 * 3600 + rng.randint(0, 7200)
+    evts = [(t, "bin da")]
+    for _ in range(rng.randint(0, 3)):
+        t += rng.randint(1800, 7200)
+        kind = rng.random()
+        if kind < 0.6:
+            evts.append((t, "päuschen")); t += rng.randint(300, 2400); evts.append((t, "mache weiter"))
+        else:
+            evts.append((t, "afk")); t += rng.randint(120, 1800); evts.append((t, "wieder da"))
+    if rng.random() < 0.05:                      # Zufallsbuchung (Fehlbedienung)
+        t += rng.randint(0, 600); evts.append((t, rng.choice(ACTION_KEYS)))
+    if rng.random() > 0.03:                      # 3 %: Feierabend vergessen
+        t += rng.randint(1800, 5 * 3600); evts.append((t, "gehe"))
+    if rng.random() < 0.02:                      # doppeltes "gehe"
+        evts.append((t + 60, "gehe"))
+    return evts
+
+def synth(users, years, seed=42):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    n_days = 365 * years
+    data = []
+    for _ in range(users):
+        evts = []
+        for i in range(n_days):
+            d = start + timedelta(days=i)
+            if d.weekday() < 5 or rng.random() < 0.05:
+                evts.extend((d.isoformat(), t, a) for t, a in synth_day(rng, d))
+        data.append(evts)
+    return data, start, start + timedelta(days=n_days)
+
+def as_old_rows(events):
+    """Zeilen, wie sie die alte Report-Query lieferte: (d_local, ts_local-String, action)."""
+    return [(day, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t)), action) for day, t, action in events]
+
+def old_path(rows, start, end):
+    """Wie admin_reports vor der Umstellung: nach Tag gruppieren, strptime, Tag für Tag."""
+    by_day = {}
+    for day, ts_local, action in rows:
+        by_day.setdefault(day, []).append((ts_local, action))
+    out = {}
+    for d in E.iter_days_in_range(datetime.combine(start, datetime.min.time()),
+                                   datetime.combine(end, datetime.min.time())):
+        dstr = d.strftime("%Y-%m-%d")
+        evts = by_day.get(dstr)
+        if evts:
+            out[dstr] = E.compute_day_minutes(evts)
+    return out
+
+def new_path(events):
+    days, work, breaks, afk, net, flags = E.compute_period_minutes(events)
+    return {d: {"work": w, "breaks": b, "afk": a, "net": n, "flags": f or []}
+            for d, w, b, a, n, f in zip(days, work, breaks, afk, net, flags)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Report-Engine Benchmark")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--years", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    data, start, end = synth(args.users, args.years)
+    n_events = sum(len(e) for e in data)
+    print(f"{args.users} User × {args.years} Jahr(e): {n_events} Buchungen")
+
+    # Eingaben vorab in das jeweilige Zeilenformat bringen (das erledigte vorher SQLite)
+    old_rows = [as_old_rows(evts) for evts in data]
+    for rows, evts in zip(old_rows, data):
+        if old_path(rows, start, end) != new_path(evts):
+            raise SystemExit("❌ Ergebnisse unterscheiden sich!")
+    print("✅ Ergebnisse identisch")
+
+    def bench(fn, inputs):
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for x in inputs:
+                fn(x)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        return best
+
+    t_old = bench(lambda r: old_path(r, start, end), old_rows)
+    t_new = bench(new_path, data)
+    print(f"compute_day_minutes (pro Tag):   {t_old*1000:8.1f} ms")
+    print(f"compute_period_minutes (1 Pass): {t_new*1000:8.1f} ms")
+    print(f"Speedup: {t_old / t_new:.1f}×")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# bench_routes.py – Latenz, Queries und Speicher pro Route mit synthetischen Daten
+#
+#   python bench_routes.py --users 50 --years 2 --out bench_main.json
+#   python bench_routes.py --users 50 --years 2 --compare bench_main.json --max-regress 20
+#   python bench_routes.py --db instance/synth.db --only reports_year,export_year
+#
+# Erzeugt (oder nutzt mit --db) eine DB aus synth_data.py und ruft jede Route über
+# den Flask-Testclient auf: p50/p95/p99, SQL-Statements und Zeilen pro Request
+# (aus der Metrik-Registry, Streaming-Exports inkl. Body) und Python-Peak-Speicher
+# pro Route (tracemalloc, eigener Durchlauf ohne Zeitmessung). Ergebnis als JSON;
+# mit --compare werden zwei Läufe verglichen (Exit-Code 1 bei Regression).
+import os, sys, json, time, argparse, tempfile, platform, resource, subprocess, tracemalloc
+from datetime import date
+
+def pct(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    k = min(len(sorted_ms) - 1, int(round(p / 100.0 * (len(sorted_ms) - 1))))
+    return round(sorted_ms[k], 2)
+
+def route_table(uid, today):
+    """(Name, Rolle, Methode, Pfad, Formdaten, schwer) – schwere Routen laufen seltener."""
+    d = today.isoformat()
+    r = [
+        ("user",             "user",  "GET",  "/user", None, False),
+        ("book",             "user",  "POST", "/book", "toggle", False),
+        ("presence_json",    "user",  "GET",  "/presence.json", None, False),
+        ("presence_json_304", "user", "GET",  "/presence.json", "etag", False),
+        ("journal",          "user",  "GET",  "/journal", None, False),
+        ("admin",            "admin", "GET",  "/admin", None, False),
+        ("presence",         "admin", "GET",  "/presence", None, False),
+        ("admin_users",      "admin", "GET",  "/admin/users", None, False),
+        ("admin_journal",    "admin", "GET",  f"/admin/journal?uid={uid}&date={d}", None, False),
+        ("team_month",       "admin", "GET",  f"/admin/reports/team?period=month&date={d}", None, False),
+        ("team_year",        "admin", "GET",  f"/admin/reports/team?period=year&date={d}", None, True),
+        ("export_month",     "admin", "GET",  f"/admin/reports/export?uid={uid}&period=month&date={d}", None, False),
+        ("export_year",      "admin", "GET",  f"/admin/reports/export?uid={uid}&period=year&date={d}", None, False),
+        ("export_all_hist",  "admin", "GET",  f"/admin/reports/export?uid={uid}&period=all", None, True),
+        ("journal_export",   "admin", "GET",  f"/admin/journal/export?uid={uid}&period=all", None, True),
+        ("export_all_zip",   "admin", "GET",  f"/admin/reports/export_all?period=month&date={d}", None, True),
+        ("diag",             "admin", "GET",  "/admin/diag", None, False),
+    ]
+    for period in ("day", "week", "month", "year"):
+        r.append((f"reports_{period}", "admin", "GET",
+                  f"/admin/reports?uid={uid}&period={period}&date={d}", None, period == "year"))
+    return r
+
+def _counters(A):
+    """Summe Statements/Zeilen über alle Endpoints (Metrik-Registry des Prozesses)."""
+    with A._metrics._lock:
+        q = sum(h.sum for h in A._metrics.queries.values())
+        rows = sum(A._metrics.rows.values())
+    return q, rows
+
+class _StreamCount:
+    """Statements/Zeilen zählen, die erst beim Lesen eines Streaming-Bodys laufen."""
+    def __init__(self, A):
+        self.A = A
+
+    def __enter__(self):
+        self.m = {"t0": time.perf_counter(), "sql_s": 0.0, "tpl_s": 0.0, "queries": 0, "rows": 0, "status": 200}
+        self.A._req_metrics.m = self.m
+        return self.m
+
+    def __exit__(self, *exc):
+        self.A._req_metrics.m = None
+
+def one_request(A, client, method, path, extra, state):
+    headers = {}
+    if extra == "etag" and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if method == "POST":
+        state["in"] = not state.get("in")
+        resp = client.post(path, data={"action": "bin da" if state["in"] else "gehe"})
+    else:
+        resp = client.get(path, headers=headers)
+    with _StreamCount(A) as m:
+        body = resp.get_data()
+    resp.close()
+    if path == "/presence.json" and resp.status_code == 200:
+        state["etag"] = resp.headers.get("ETag")
+    return resp.status_code, len(body), m["queries"], m["rows"]
+
+def make_clients(A, admin_id, user_id):
+    clients = {}
+    for role, uid in (("admin", admin_id), ("user", user_id)):
+        c = A.app.test_client()
+        with c.session_transaction() as s:
+            s["user_id"] = uid
+            s["role"] = role
+        clients[role] = c
+    return clients
+
+def run(A, info, iterations, warmup, only=None, memory=True):
+    conn = A._open_connection()
+    admin_id = conn.execute("SELECT id FROM users WHERE username = ?", (info["admin"],)).fetchone()[0]
+    A.sqlite3.Connection.close(conn)
+    user_id = info["user_ids"][0]
+    clients = make_clients(A, admin_id, user_id)
+    state = {}
+    results = {}
+
+    for name, role, method, path, extra, heavy in route_table(user_id, date.today()):
+        if only and name not in only:
+            continue
+        n = max(1, iterations // 5) if heavy else iterations
+        c = clients[role]
+        for _ in range(warmup):
+            one_request(A, c, method, path, extra, state)
+
+        lat, statuses, sizes = [], set(), []
+        q0, r0 = _counters(A)
+        sq = sr = 0
+        for _ in range(n):
+            t0 = time.perf_counter()
+            status, size, stream_q, stream_rows = one_request(A, c, method, path, extra, state)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            statuses.add(status)
+            sizes.append(size)
+            sq += stream_q
+            sr += stream_rows
+        q1, r1 = _counters(A)
+
+        peak_kb = None
+        if memory:
+            tracemalloc.start()
+            one_request(A, c, method, path, extra, state)
+            peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+            tracemalloc.stop()
+
+        lat.sort()
+        results[name] = {
+            "path": path, "method": method, "n": n, "status": sorted(statuses),
+            "p50_ms": pct(lat, 50), "p95_ms": pct(lat, 95), "p99_ms": pct(lat, 99),
+            "mean_ms": round(sum(lat) / n, 2), "max_ms": round(lat[-1], 2),
+            "queries_per_req": round((q1 - q0 + sq) / n, 1),
+            "rows_per_req": round((r1 - r0 + sr) / n, 1),
+            "bytes": int(sum(sizes) / n),
+            "py_peak_kb": peak_kb,
+        }
+        print(f"  {name:18s} p50={results[name]['p50_ms']:8.2f} ms  p95={results[name]['p95_ms']:8.2f} ms  "
+              f"q/req={results[name]['queries_per_req']:6.1f}  peak={peak_kb} KiB", file=sys.stderr)
+    return results
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(old, new, max_regress):
+    """Tabelle alt/neu; gibt die Routen zurück, deren p95 um mehr als max_regress % schlechter ist."""
+    worse = []
+    print(f"{'Route':18s} {'p50 alt':>9s} {'p50 neu':>9s} {'p95 alt':>9s} {'p95 neu':>9s} {'Δp95':>7s} {'q alt':>6s} {'q neu':>6s}")
+    for name, n in new["routes"].items():
+        o = old["routes"].get(name)
+        if not o:
+            print(f"{name:18s} (neu)")
+            continue
+        delta = (n["p95_ms"] - o["p95_ms"]) / o["p95_ms"] * 100.0 if o["p95_ms"] else 0.0
+        mark = ""
+        if max_regress is not None and delta > max_regress:
+            worse.append(name)
+            mark = "  <-- langsamer"
+        print(f"{name:18s} {o['p50_ms']:9.2f} {n['p50_ms']:9.2f} {o['p95_ms']:9.2f} {n['p95_ms']:9.2f} "
+              f"{delta:+6.1f}% {o['queries_per_req']:6.1f} {n['queries_per_req']:6.1f}{mark}")
+    return worse
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--years", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", help="vorhandene synth-DB nutzen (sonst Temp-DB erzeugen)")
+    ap.add_argument("--iterations", type=int, default=30)
+    ap.add_argument("--warmup", type=int, default=2)
+    ap.add_argument("--only", help="nur diese Routen (Komma-Liste)")
+    ap.add_argument("--no-memory", action="store_true", help="tracemalloc-Durchlauf auslassen")
+    ap.add_argument("--out", help="Ergebnis-JSON hierhin schreiben (sonst stdout)")
+    ap.add_argument("--compare", help="früheres Ergebnis-JSON zum Vergleich")
+    ap.add_argument("--max-regress", type=float, help="Exit 1, wenn p95 einer Route um mehr als x %% steigt")
+    args = ap.parse_args()
+
+    os.environ.setdefault("MAINTENANCE", "0")          # keine Wartungsjobs während der Messung
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+    os.environ["METRICS"] = "1"
+    os.environ.setdefault("BOOKING_SPOOL", os.path.join(tempfile.mkdtemp(), "booking_spool.jsonl"))
+    import synth_data
+
+    t0 = time.perf_counter()
+    if args.db:
+        os.environ["DB_PATH"] = os.path.abspath(args.db)
+        import app as A
+        conn = A._open_connection()
+        uids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'synth0%' ORDER BY id")]
+        bookings = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+        A.sqlite3.Connection.close(conn)
+        if not uids:
+            sys.exit("Keine synth-User in der DB – zuerst synth_data.py ausführen")
+        info = {"db_path": A.DB_PATH, "users": len(uids), "years": None, "bookings": bookings,
+                "admin": synth_data.ADMIN, "user_ids": uids}
+    else:
+        db = os.path.join(tempfile.mkdtemp(), "bench_routes.db")
+        info = synth_data.generate(db, args.users, args.years, args.seed, progress=lambda m: print(m, file=sys.stderr))
+        import app as A
+    gen_s = time.perf_counter() - t0
+
+    only = set(args.only.split(",")) if args.only else None
+    routes = run(A, info, args.iterations, args.warmup, only, memory=not args.no_memory)
+    result = {
+        "meta": {
+            "git": _git_rev(), "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(), "sqlite": A.sqlite3.sqlite_version,
+            "users": info["users"], "years": info["years"], "bookings": info["bookings"],
+            "iterations": args.iterations, "setup_s": round(gen_s, 2),
+        },
+        "process": {"maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss},
+        "routes": routes,
+    }
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        worse = compare(old, result, args.max_regress)
+        if worse:
+            print("Regression:", ", ".join(worse))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# check_query_plans.py – EXPLAIN QUERY PLAN für jedes SQL-Statement der Routen
+#
+#   python check_query_plans.py --users 50 --years 2
+#   python check_query_plans.py --db instance/synth.db --verbose
+#
+# Erzeugt (oder nutzt mit --db) eine große synth-DB, ruft alle Routen aus
+# bench_routes.py plus die schreibenden Ticket-/Journal-Routen auf und sammelt
+# dabei jedes ausgeführte Statement mit echten Parametern. Für jedes davon läuft
+# EXPLAIN QUERY PLAN; der Bericht zeigt Plan und aufrufende Endpoints.
+#
+# Fehler (Exit-Code 1), wenn ein Statement auf bookings/journal_entries
+#   - einen SCAN (Volltabelle oder komplettes Index-Scan) macht oder
+#   - einen TEMP B-TREE zum Sortieren/Gruppieren braucht,
+# außer es steht mit Begründung in ALLOW. SQL-Literale aus app.py, die im Lauf
+# nicht vorkamen, werden als "nicht abgedeckt" gelistet (nur Hinweis); Vorlagen
+# mit {platzhalter} (_PRESENT_SQL.format(...)) gelten als abgedeckt, wenn eine
+# ihrer Ausprägungen lief. Statements aus gestreamten Bodys (CSV-Export,
+# Journal-Export) laufen nach dem Request und werden ebenfalls erfasst, ebenso
+# Spool-Nachtrag, Wartungsjobs und die CLI-Befehle rebuild-status/rebuild-daily.
+#
+# tests/test_query_plans.py fährt denselben Check auf einer kleinen synth-DB.
+import os, re, sys, ast, json, argparse, tempfile, collections
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOT_TABLES = ("bookings", "journal_entries")
+
+# Regex auf das normalisierte Statement -> Begründung, warum der Plan so bleiben darf
+ALLOW = {
+    r"UNION ALL SELECT NULL AS id, 'ticket' AS action": "User-Start: sortiert nur letzte 5 Buchungen/Tagesliste "
+                                                      "plus offene Blanko-Tickets des Users",
+    r"FROM journal_entries WHERE user_id = \? AND entry_date >= \? AND entry_date <= \? ORDER BY entry_date ASC, created_at ASC":
+        "Index liefert entry_date sortiert; created_at nur innerhalb eines Tages nachsortiert",
+}
+
+_SCAN = re.compile(r"^SCAN (\w+)(?: AS (\w+))?")
+_FROM = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.I)
+
+def normalize(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+def _aliases(sql):
+    """Alias -> Tabelle (SQLite zeigt im Plan den Alias, z. B. "SCAN b")."""
+    out = {}
+    for table, alias in _FROM.findall(sql):
+        out[table] = table
+        if alias and alias.upper() not in ("WHERE", "ON", "SET", "USING", "JOIN", "LEFT", "INNER",
+                                          "GROUP", "ORDER", "LIMIT", "VALUES", "SELECT"):
+            out[alias] = table
+    return out
+
+def explain(conn, sql, params):
+    """Plan als Liste (Tiefe, Detail). Ohne Parameter (executemany) werden NULLs gebunden."""
+    if params is None:
+        try:
+            conn.execute("EXPLAIN QUERY PLAN " + sql)
+            params = ()
+        except Exception as e:
+            n = re.search(r"uses (\d+)", str(e))
+            params = (None,) * int(n.group(1)) if n else ()
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    depth, out = {0: -1}, []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        out.append((depth[node_id], detail))
+    return out
+
+def problems(sql, plan):
+    aliases = _aliases(sql)
+    touches_hot = any(t in HOT_TABLES for t in aliases.values())
+    found = []
+    for _, detail in plan:
+        m = _SCAN.match(detail)
+        if m:
+            table = aliases.get(m.group(2) or m.group(1), m.group(1))
+            if table in HOT_TABLES:
+                found.append(detail)
+        elif "USE TEMP B-TREE" in detail and touches_hot:
+            found.append(detail)
+    return found
+
+def allowed(sql):
+    for pattern, reason in ALLOW.items():
+        if re.search(pattern, sql):
+            return reason
+    return None
+
+_PLACEHOLDER = re.compile(r"\\\{\w+\\\}")
+
+def covered_by(literal, executed):
+    """Literal lief (exakt oder als .format()-Vorlage mit {platzhalter})."""
+    if literal in executed:
+        return True
+    if "{" not in literal:
+        return False
+    pattern = re.compile(_PLACEHOLDER.sub(".+?", re.escape(literal)) + "$")
+    return any(pattern.match(sql) for sql in executed)
+
+def sql_literals(path):
+    """Alle String-Literale in app.py, die wie ein Statement beginnen (f-Strings ausgenommen)."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    fstring_parts = {id(v) for n in ast.walk(tree) if isinstance(n, ast.JoinedStr) for v in n.values}
+    out = {}
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in fstring_parts
+                and _SQL_START.match(node.value) and " " in node.value.strip()):
+            out.setdefault(normalize(node.value), node.lineno)
+    return out
+
+# ---- Statements sammeln -----------------------------------------------------------
+def collect(A, info, synth_password):
+    """Alle Routen aufrufen; gibt {normalisiertes SQL: {sql, params, endpoints}} zurück."""
+    import bench_routes
+    from flask import request, has_request_context
+    seen = {}
+    orig_start = A._TimedCursor._start
+    orig_conn = {n: A._PooledConnection.__dict__[n] for n in ("execute", "executemany", "cursor")}
+
+    def record(self, sql, params):
+        key = normalize(sql)
+        e = seen.setdefault(key, {"sql": sql, "params": params, "endpoints": collections.Counter()})
+        e["endpoints"][request.endpoint if has_request_context() and request.endpoint else "(ohne Request)"] += 1
+        return orig_start(self, sql, params)
+
+    # _TimedCursor auch außerhalb des Requests: gestreamte Bodys (_iter_csv_chunks,
+    # Journal-Export) führen ihre Statements erst nach dem Request-Teardown aus
+    def cursor(self, factory=None):
+        return orig_conn["cursor"](self, factory or A._TimedCursor)
+
+    A._TimedCursor._start = record
+    A._PooledConnection.cursor = cursor
+    A._PooledConnection.execute = lambda self, sql, params=(): self.cursor().execute(sql, params)
+    A._PooledConnection.executemany = lambda self, sql, seq: self.cursor().executemany(sql, seq)
+    try:
+        conn = A._open_connection()
+        admin_id = conn.execute("SELECT id FROM users WHERE username = ?", (info["admin"],)).fetchone()[0]
+        uid = info["user_ids"][0]
+        entry = conn.execute("SELECT id FROM journal_entries WHERE user_id = ? LIMIT 1", (uid,)).fetchone()
+        A.sqlite3.Connection.close(conn)
+        clients = bench_routes.make_clients(A, admin_id, uid)
+        state = {}
+        for _name, role, method, path, extra, _heavy in bench_routes.route_table(uid, date.today()):
+            for _ in range(2):                           # zweiter Aufruf: ETag/304-Zweig, Toggle
+                bench_routes.one_request(A, clients[role], method, path, extra, state)
+
+        u, a = clients["user"], clients["admin"]
+        u.post("/", data={"username": "synth0000", "password": synth_password})
+        u.post("/ticket/open_blank", data={"message": "Plan-Check", "wish_date": date.today().isoformat()})
+        u.post("/journal/add", data={"entry_date": date.today().isoformat(), "content": "Plan-Check"})
+        if entry:
+            u.post(f"/journal/delete/{entry[0]}")
+
+        def last_bookings(n):
+            conn = A._open_connection()
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM bookings WHERE user_id = ? ORDER BY ts DESC LIMIT ?", (uid, n))]
+            A.sqlite3.Connection.close(conn)
+            return ids
+
+        # Tickets: öffnen, selbst schließen, vom Admin ändern/löschen/schließen lassen
+        for bid, action in zip(last_bookings(4), ("aendern", "loeschen", "", "")):
+            u.post("/ticket/open", data={"booking_id": bid, "ticket_action": action, "ticket_message": "Plan-Check"})
+        bench_routes.one_request(A, u, "GET", "/user", None, state)
+        bench_routes.one_request(A, a, "GET", "/admin", None, state)
+        conn = A._open_connection()
+        t1, t2, t3, t4, blank = [r[0] for r in conn.execute(
+            "SELECT id FROM tickets WHERE user_id = ? AND closed_at IS NULL ORDER BY id DESC LIMIT 5", (uid,))]
+        A.sqlite3.Connection.close(conn)
+        u.post(f"/ticket/close/{t1}")
+        a.post(f"/admin/resolve/{t2}", data={"resolution": "aendern", "new_action": "afk",
+                                             "new_date": date.today().isoformat(), "new_time": "00:30"})
+        a.post(f"/admin/resolve/{t3}", data={"resolution": "loeschen"})
+        a.post(f"/admin/resolve/{t4}", data={"resolution": "schliessen"})
+        a.post(f"/admin/resolve/{blank}", data={"resolution": "aendern", "new_action": "bin da",
+                                                "new_date": date.today().isoformat(), "new_time": "00:15"})
+        d = date.today().isoformat()
+        for path in ("/dashboard", "/admin/reports", f"/admin/reports?uid={uid}", "/presence.json?since=0",
+                     f"/admin?uid={uid}", "/admin?kind=blank", f"/admin?from={d}&to={d}",
+                     f"/admin?before={d} 00:00:00|999999999"):
+            bench_routes.one_request(A, clients["admin" if path.startswith("/admin") else "user"], "GET", path, None, state)
+        a.post("/admin/users/create", data={"username": "plancheck", "password": "plancheck", "weekly_minutes": "2400"})
+
+        # ohne Request: Spool-Nachtrag, Wartungsjobs, CLI-Neuaufbau der Projektionen
+        with open(A.BOOKING_SPOOL_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"token": "plan-check", "uid": uid, "action": "afk", "note": None,
+                                "created_at": f"{d} 00:05:00"}) + "\n")
+        conn = A._open_connection()
+        A._booking_writer._replay(conn)
+        A._due_maintenance_tasks(conn)
+        A._rebuild_projections(conn)                 # nach Migrationen, die bookings ändern
+        A.sqlite3.Connection.close(conn)
+        cli = A.app.test_cli_runner()
+        for args in (["maintenance"], ["rebuild-status"], ["rebuild-daily", "--workers", "1"]):
+            result = cli.invoke(args=args)
+            if result.exit_code:
+                raise RuntimeError(f"flask {' '.join(args)}: {result.output}") from result.exception
+    finally:
+        A._TimedCursor._start = orig_start
+        for name, fn in orig_conn.items():
+            setattr(A._PooledConnection, name, fn)
+    return seen
+
+def not_covered(seen):
+    executed = {normalize(e["sql"]) for e in seen.values()}
+    return {sql: line for sql, line in sql_literals(os.path.join(HERE, "app.py")).items()
+            if not covered_by(sql, executed)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--years", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", help="vorhandene synth-DB nutzen (sonst Temp-DB erzeugen)")
+    ap.add_argument("--verbose", action="store_true", help="auch Pläne unauffälliger Statements ausgeben")
+    ap.add_argument("--json", help="Bericht zusätzlich als JSON schreiben")
+    args = ap.parse_args()
+
+    os.environ.setdefault("MAINTENANCE", "0")
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+    os.environ["METRICS"] = "1"                      # _TimedCursor liefert die Statements
+    os.environ.setdefault("BOOKING_GROUP_COMMIT", "0")
+    os.environ.setdefault("BOOKING_SPOOL", os.path.join(tempfile.mkdtemp(), "booking_spool.jsonl"))
+    sys.path.insert(0, HERE)
+    import synth_data
+
+    if args.db:
+        os.environ["DB_PATH"] = os.path.abspath(args.db)
+        import app as A
+        conn = A._open_connection()
+        uids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'synth0%' ORDER BY id")]
+        A.sqlite3.Connection.close(conn)
+        if not uids:
+            sys.exit("Keine synth-User in der DB – zuerst synth_data.py ausführen")
+        info = {"admin": synth_data.ADMIN, "user_ids": uids}
+    else:
+        db = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+        info = synth_data.generate(db, args.users, args.years, args.seed, progress=lambda m: print(m, file=sys.stderr))
+        import app as A
+
+    seen = collect(A, info, synth_data.PASSWORD)
+    conn = A._open_connection()
+    report, failed = [], []
+    for key, e in sorted(seen.items()):
+        if key.upper().startswith(("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "EXPLAIN", "SAVEPOINT", "RELEASE")):
+            continue
+        try:
+            plan = explain(conn, e["sql"], e["params"])
+        except A.sqlite3.Error as err:
+            plan = [(0, f"(kein Plan: {err})")]
+        bad = problems(key, plan)
+        reason = allowed(key) if bad else None
+        item = {"sql": key, "endpoints": dict(e["endpoints"]), "plan": [d for _, d in plan],
+                "problems": bad, "allowed": reason}
+        report.append(item)
+        if bad and not reason:
+            failed.append(item)
+        if bad or args.verbose:
+            mark = "FEHLER" if bad and not reason else ("erlaubt: " + reason if reason else "ok")
+            print(f"\n[{mark}] {key[:200]}")
+            print("  Endpoints: " + ", ".join(f"{k} ({v})" for k, v in e["endpoints"].most_common()))
+            for depth, detail in plan:
+                print("    " + "  " * depth + detail)
+    A.sqlite3.Connection.close(conn)
+
+    missing = not_covered(seen)
+    print(f"\n{len(report)} Statements geprüft, {len(failed)} unerlaubt mit SCAN/TEMP B-TREE auf {'/'.join(HOT_TABLES)}, "
+          f"{sum(1 for r in report if r['allowed'])} erlaubt.")
+    if missing:
+        print(f"{len(missing)} SQL-Literale aus app.py nicht abgedeckt (Wartung, Migration, seltene Zweige):")
+        for sql, line in sorted(missing.items(), key=lambda x: x[1]):
+            print(f"  app.py:{line}: {sql[:100]}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"statements": report, "not_covered": missing}, f, indent=2, ensure_ascii=False)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# gunicorn-Hooks (wird automatisch aus dem Arbeitsverzeichnis geladen).
+# Misst die Boot-Zeit je Worker: fork im Master -> Worker bereit.
+# Mit --preload (Procfile) läuft init_db() nur einmal im Master.
+import time
+
+
+def pre_fork(server, worker):
+    worker._boot_t0 = time.monotonic()
+
+
+def post_worker_init(worker):
+    ms = (time.monotonic() - worker._boot_t0) * 1000.0
+    import app as app_module
+    app_module._BOOT["worker_boot_ms"] = round(ms, 1)
+    app_module._BOOT["preloaded"] = bool(worker.cfg.preload_app)
+    # SSE-Limit an die echten Threads des Workers anpassen; async-Worker: Verbindungslimit
+    async_worker = any(k in worker.cfg.worker_class_str for k in ("gevent", "eventlet"))
+    slots = worker.cfg.worker_connections if async_worker else worker.cfg.threads
+    app_module.PRESENCE_STREAM_MAX = app_module._presence_stream_max(slots)
+    worker.log.info("Worker %s bereit nach %.1f ms (init_db: %s, %s ms)",
+                    worker.pid, ms, app_module._BOOT["schema"], app_module._BOOT["init_db_ms"])
@@ -0,0 +1,366 @@
+# loadtest.py – Lasttest unter echter Nebenläufigkeit: Schichtbeginn, Präsenz-Tabs, Jahres-Reports
+#
+#   python loadtest.py --users 200 --duration 60 --tabs 100 --admins 3
+#   python loadtest.py --server gunicorn --workers 2 --threads 8 \
+#       --variant direkt:BOOKING_GROUP_COMMIT=0 --variant group:BOOKING_GROUP_COMMIT=1
+#   python loadtest.py --server gunicorn --out lt_neu.json --compare lt_alt.json
+#
+# Erzeugt einmal eine synth-DB (synth_data.py) und startet pro Variante eine frische
+# Kopie davon hinter einem echten HTTP-Server: "inproc" = Werkzeug-Threadserver im
+# selben Prozess (nur eine Variante), "gunicorn" = lokaler gunicorn (gthread) mit
+# den Env-Werten der Variante. Gleichzeitig laufen
+#   - Wellen von Buchungen auf /book (alle User buchen innerhalb von --wave-ramp s),
+#   - --tabs offene Präsenz-Seiten, die /presence.json mit ETag/?since= pollen,
+#   - --admins Admins, die Jahres-Reports und Jahres-CSVs abrufen.
+# Gemessen: Durchsatz, p50/p95/p99/max, Fehler, 503 (SQLite-Lock/Pool erschöpft)
+# und serverseitig Pool-Wartezeiten und Busy-Zähler aus /admin/metrics.
+import os, sys, json, time, random, shutil, signal, socket, argparse, tempfile, threading, subprocess, collections
+import http.client, sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SECRET = "loadtest-secret"
+
+def pct(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    k = min(len(sorted_ms) - 1, int(round(p / 100.0 * (len(sorted_ms) - 1))))
+    return round(sorted_ms[k], 1)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def session_cookie(uid, role):
+    """Signiertes Flask-Session-Cookie (spart den teuren Passwort-Login pro User)."""
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+    dummy = Flask("loadtest")
+    dummy.secret_key = SECRET
+    value = SecureCookieSessionInterface().get_signing_serializer(dummy).dumps({"user_id": uid, "role": role})
+    return f"session={value}"
+
+# ---- Server ---------------------------------------------------------------------
+class InprocServer:
+    """Werkzeug-Threadserver im eigenen Prozess (ein Thread pro Request)."""
+    def __init__(self, db, env):
+        os.environ.update(env, DB_PATH=db, SECRET_KEY=SECRET,
+                          BOOKING_SPOOL=os.path.join(os.path.dirname(db), "booking_spool.jsonl"),
+                          SLOW_QUERY_LOG=os.path.join(os.path.dirname(db), "slow_queries.log"))
+        os.environ.setdefault("MAINTENANCE", "0")
+        sys.path.insert(0, HERE)
+        import app as A
+        from werkzeug.serving import make_server
+        import logging
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)     # kein Zugriffslog pro Request
+        self.port = free_port()
+        self._srv = make_server("127.0.0.1", self.port, A.app, threaded=True)
+        self._thread = threading.Thread(target=self._srv.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._srv.shutdown()
+
+class GunicornServer:
+    def __init__(self, db, env, workers, threads):
+        self.port = free_port()
+        full_env = dict(os.environ, **env, DB_PATH=db, SECRET_KEY=SECRET,
+                        BOOKING_SPOOL=os.path.join(os.path.dirname(db), "booking_spool.jsonl"),
+                        SLOW_QUERY_LOG=os.path.join(os.path.dirname(db), "slow_queries.log"))
+        full_env.setdefault("MAINTENANCE", "0")
+        cmd = ["gunicorn", "--preload", "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+               "-t", "60", "-b", f"127.0.0.1:{self.port}", "--log-level", "warning", "wsgi:application"]
+        self._proc = subprocess.Popen(cmd, cwd=HERE, env=full_env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"gunicorn beendet (Exit {self._proc.returncode})")
+            try:
+                c = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                c.request("GET", "/")
+                c.getresponse().read()
+                c.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("gunicorn nicht erreichbar")
+
+    def stop(self):
+        self._proc.send_signal(signal.SIGTERM)
+        try:
+            self._proc.wait(15)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+
+# ---- Clients ----------------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}            # Szenario -> [(ms, status)]
+
+    def add(self, scenario, ms, status):
+        with self._lock:
+            self.samples.setdefault(scenario, []).append((ms, status))
+
+class Client:
+    """Eine Keep-Alive-Verbindung pro simuliertem Browser (Thread)."""
+    def __init__(self, port, cookie, rec):
+        self.port, self.cookie, self.rec = port, cookie, rec
+        self.conn = None
+
+    def request(self, scenario, method, path, body=None, headers=None):
+        h = {"Cookie": self.cookie}
+        if headers:
+            h.update(headers)
+        if body is not None:
+            body = urlencode(body)
+            h["Content-Type"] = "application/x-www-form-urlencoded"
+        t0 = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=h)
+            resp = self.conn.getresponse()
+            data = resp.read()
+            status = resp.status
+            if resp.getheader("Connection", "").lower() == "close":
+                self.conn.close()
+                self.conn = None
+        except (OSError, http.client.HTTPException):
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            resp, data, status = None, b"", 0          # 0 = Verbindungsfehler
+        self.rec.add(scenario, (time.perf_counter() - t0) * 1000.0, status)
+        return resp, data
+
+def booking_waves(port, users, waves, ramp, duration, concurrency, rec, stop):
+    """Alle User buchen je Welle einmal, verteilt über `ramp` Sekunden (abwechselnd kommen/gehen)."""
+    cookies = {uid: session_cookie(uid, "user") for uid in users}
+    t_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for w in range(waves):
+            at = t_start + 1.0 + w * (duration / max(1, waves))
+            action = "bin da" if w % 2 == 0 else "gehe"
+            offsets = sorted(random.uniform(0, ramp) for _ in users)
+
+            def one(uid, offset):
+                delay = at + offset - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if not stop.is_set():
+                    Client(port, cookies[uid], rec).request("book", "POST", "/book", {"action": action})
+
+            futures = [ex.submit(one, uid, off) for uid, off in zip(users, offsets)]
+            for f in futures:
+                f.result()
+
+def presence_tab(port, uid, poll_s, rec, stop):
+    c = Client(port, session_cookie(uid, "user"), rec)
+    pv = None
+    stop.wait(random.uniform(0, poll_s))
+    while not stop.is_set():
+        path, headers = "/presence.json", {}
+        if pv is not None:
+            path += f"?since={pv}"
+            headers["If-None-Match"] = f'"p{pv}"'
+        resp, data = c.request("presence", "GET", path, headers=headers)
+        if resp is not None and resp.status == 200:
+            try:
+                pv = json.loads(data)["pv"]
+            except (ValueError, KeyError):
+                pass
+        stop.wait(poll_s)
+
+def admin_reports(port, admin_id, users, think_s, rec, stop):
+    c = Client(port, session_cookie(admin_id, "admin"), rec)
+    today = date.today().isoformat()
+    while not stop.is_set():
+        uid = random.choice(users)
+        c.request("report_year", "GET", f"/admin/reports?uid={uid}&period=year&date={today}")
+        c.request("export_year", "GET", f"/admin/reports/export?uid={uid}&period=year&date={today}")
+        stop.wait(think_s)
+
+def scrape_metrics(port, admin_id, tries):
+    """/admin/metrics mehrfach abrufen (jeder gunicorn-Worker hat eigene Zähler), pro Worker den letzten Stand."""
+    cookie = session_cookie(admin_id, "admin")
+    per_worker = {}
+    for _ in range(tries):
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            c.request("GET", "/admin/metrics", headers={"Cookie": cookie, "Connection": "close"})
+            text = c.getresponse().read().decode()
+            c.close()
+        except OSError:
+            continue
+        vals = collections.Counter()
+        worker = None
+        for line in text.splitlines():
+            if line.startswith("#") or " " not in line:
+                continue
+            name_labels, value = line.rsplit(" ", 1)
+            name = name_labels.split("{", 1)[0]
+            if worker is None and 'worker="' in name_labels:
+                worker = name_labels.split('worker="', 1)[1].split('"', 1)[0]
+            if name in ("app_sqlite_busy_total", "app_db_pool_waits_total", "app_db_pool_wait_seconds_total"):
+                vals[name] += float(value)
+        if worker:
+            per_worker[worker] = vals
+    total = collections.Counter()
+    for vals in per_worker.values():
+        total.update(vals)
+    return {"workers_seen": len(per_worker),
+            "sqlite_busy": int(total["app_sqlite_busy_total"]),
+            "pool_waits": int(total["app_db_pool_waits_total"]),
+            "pool_wait_s": round(total["app_db_pool_wait_seconds_total"], 3)}
+
+def summarize(samples, duration):
+    out = {}
+    for scenario, rows in sorted(samples.items()):
+        lat = sorted(ms for ms, _ in rows)
+        statuses = [st for _, st in rows]
+        n = len(rows)
+        errors = sum(1 for st in statuses if st == 0 or (st >= 500 and st != 503))
+        busy = sum(1 for st in statuses if st == 503)
+        out[scenario] = {
+            "requests": n, "per_s": round(n / duration, 1),
+            "p50_ms": pct(lat, 50), "p95_ms": pct(lat, 95), "p99_ms": pct(lat, 99),
+            "max_ms": round(lat[-1], 1) if lat else None,
+            "errors": errors, "busy_503": busy,
+            "error_rate": round((errors + busy) / n, 4) if n else 0.0,
+            "not_modified": sum(1 for st in statuses if st == 304),
+        }
+    return out
+
+def run_variant(label, env, template, args, users, admin_id):
+    work = tempfile.mkdtemp(prefix=f"loadtest_{label}_")
+    db = os.path.join(work, "loadtest.db")
+    shutil.copy(template, db)
+    print(f"[{label}] Server starten ({args.server}) …", file=sys.stderr)
+    if args.server == "inproc":
+        server = InprocServer(db, env)
+    else:
+        server = GunicornServer(db, env, args.workers, args.threads)
+
+    rec = Recorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=booking_waves, daemon=True,
+                                args=(server.port, users, args.waves, args.wave_ramp, args.duration,
+                                      args.wave_concurrency, rec, stop))]
+    tab_users = [users[i % len(users)] for i in range(args.tabs)]
+    threads += [threading.Thread(target=presence_tab, daemon=True, args=(server.port, uid, args.poll_ms / 1000.0, rec, stop))
+                for uid in tab_users]
+    threads += [threading.Thread(target=admin_reports, daemon=True,
+                                 args=(server.port, admin_id, users, args.admin_think, rec, stop))
+                for _ in range(args.admins)]
+
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    stop.wait(args.duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=60)
+    elapsed = time.monotonic() - t0
+
+    server_stats = scrape_metrics(server.port, admin_id, tries=4 * (args.workers if args.server == "gunicorn" else 1))
+    server.stop()
+    conn = sqlite3.connect(db)
+    server_stats["bookings_committed"] = conn.execute(
+        "SELECT COUNT(*) FROM bookings WHERE created_at >= datetime('now', ?)", (f"-{int(elapsed) + 5} seconds",)
+    ).fetchone()[0]
+    conn.close()
+    shutil.rmtree(work, ignore_errors=True)
+    return {"env": env, "duration_s": round(elapsed, 1),
+            "scenarios": summarize(rec.samples, elapsed), "server": server_stats}
+
+def print_report(variants):
+    labels = list(variants)
+    scenarios = sorted({s for v in variants.values() for s in v["scenarios"]})
+    w = max(12, *(len(l) for l in labels))
+    print(f"{'':24s}" + "".join(f"{l:>{w + 2}s}" for l in labels))
+    for s in scenarios:
+        for key in ("per_s", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors", "busy_503"):
+            vals = [variants[l]["scenarios"].get(s, {}).get(key) for l in labels]
+            print(f"{s + ' ' + key:24s}" + "".join(f"{('—' if v is None else v)!s:>{w + 2}s}" for v in vals))
+    for key in ("sqlite_busy", "pool_waits", "pool_wait_s", "bookings_committed"):
+        vals = [variants[l]["server"].get(key) for l in labels]
+        print(f"{'server ' + key:24s}" + "".join(f"{('—' if v is None else v)!s:>{w + 2}s}" for v in vals))
+
+def parse_variant(text):
+    label, _, assigns = text.partition(":")
+    env = {}
+    for part in filter(None, assigns.split(",")):
+        k, _, v = part.partition("=")
+        env[k.strip()] = v.strip()
+    return label or "default", env
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--server", choices=["inproc", "gunicorn"], default="inproc")
+    ap.add_argument("--workers", type=int, default=2, help="gunicorn -w")
+    ap.add_argument("--threads", type=int, default=8, help="gunicorn --threads")
+    ap.add_argument("--variant", action="append", default=[], help="label:KEY=VAL,KEY=VAL (mehrfach; nur gunicorn)")
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--years", type=int, default=1)
+    ap.add_argument("--db", help="vorhandene synth-DB als Vorlage (wird kopiert, nicht verändert)")
+    ap.add_argument("--duration", type=float, default=30, help="Sekunden pro Variante")
+    ap.add_argument("--waves", type=int, default=2, help="Buchungswellen (abwechselnd bin da / gehe)")
+    ap.add_argument("--wave-ramp", type=float, default=3.0, help="Sekunden, über die sich eine Welle verteilt")
+    ap.add_argument("--wave-concurrency", type=int, default=64)
+    ap.add_argument("--tabs", type=int, default=50, help="offene Präsenz-Tabs")
+    ap.add_argument("--poll-ms", type=int, default=2000, help="Poll-Intervall der Tabs (Seite: 15000)")
+    ap.add_argument("--admins", type=int, default=2)
+    ap.add_argument("--admin-think", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="Ergebnis-JSON hierhin schreiben")
+    ap.add_argument("--compare", help="früheres Ergebnis-JSON mit in den Vergleich nehmen")
+    args = ap.parse_args()
+
+    variants = [parse_variant(v) for v in args.variant] or [("default", {})]
+    if args.server == "inproc" and len(variants) > 1:
+        sys.exit("Mehrere Varianten brauchen --server gunicorn (Env wirkt beim Import)")
+    random.seed(args.seed)
+
+    if args.db:
+        template = os.path.abspath(args.db)
+    else:
+        template = os.path.join(tempfile.mkdtemp(prefix="loadtest_tmpl_"), "template.db")
+        print(f"Vorlage erzeugen: {args.users} User × {args.years} Jahr(e) …", file=sys.stderr)
+        subprocess.run([sys.executable, os.path.join(HERE, "synth_data.py"), template,
+                        "--users", str(args.users), "--years", str(args.years), "--seed", str(args.seed)],
+                       check=True, stdout=subprocess.DEVNULL, env=dict(os.environ, MAINTENANCE="0"))
+    conn = sqlite3.connect(template)
+    users = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'synth0%' ORDER BY id")]
+    admin = conn.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1").fetchone()
+    conn.close()
+    if not users or not admin:
+        sys.exit("Vorlage ohne synth-User/Admin – synth_data.py verwenden")
+
+    results = {}
+    for label, env in variants:
+        results[label] = run_variant(label, env, template, args, users, admin[0])
+
+    report = {"meta": {"at": time.strftime("%Y-%m-%d %H:%M:%S"), "server": args.server,
+                       "workers": args.workers if args.server == "gunicorn" else None,
+                       "threads": args.threads if args.server == "gunicorn" else None,
+                       "users": len(users), "tabs": args.tabs, "poll_ms": args.poll_ms,
+                       "admins": args.admins, "waves": args.waves, "wave_ramp_s": args.wave_ramp},
+              "variants": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    shown = dict(results)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        shown = {f"alt:{k}": v for k, v in old["variants"].items()} | shown
+    print_report(shown)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,575 @@
+# migrate.py – versionierte Schema-Migrationen (ersetzt die alten migrate_*/repair_schema-Skripte)
+#
+# Jede Migration läuft genau einmal und wird in schema_migrations protokolliert.
+# Datenänderungen auf großen Tabellen laufen in id-Batches mit kurzen
+# Transaktionen (Buchungen kommen dazwischen durch). Der Fortschritt steht in
+# migration_progress: nach einem Absturz geht es beim letzten Batch weiter.
+#
+# Normalerweise ruft app.init_db() den Runner beim Start auf. Manuell:
+#   python migrate.py [pfad/zur/users.db]            Migrationen + Projektionen
+#   python migrate.py [pfad/zur/users.db] --status   nur anzeigen (liest nur, schreibt nichts)
+#
+# Mehrere Prozesse (gunicorn ohne --preload, migrate.py neben der laufenden App)
+# migrieren nie gleichzeitig: ein Lauf hält die Datei-Sperre <db>.migrate.lock
+# und prüft erst darin, was noch aussteht.
+import os, re, sys, time, sqlite3
+from urllib.request import pathname2url
+try:
+    import fcntl
+except ImportError:          # Windows
+    fcntl = None
+    import msvcrt
+
+BATCH_SIZE = int(os.getenv("MIGRATE_BATCH", "5000"))
+BATCH_PAUSE_S = float(os.getenv("MIGRATE_PAUSE_MS", "5")) / 1000.0
+
+# Alte Aktions-Keys -> heutige (aus migrate_actions_rebuild / migrate_rename_action)
+LEGACY_ACTIONS = {
+    "kommt":      "bin da",
+    "aktiv":      "bin da",
+    "geht":       "gehe",
+    "abwesend":   "afk",
+    "wieder_da":  "wieder da",
+    "pause":      "päuschen",
+    "pausenende": "mache weiter",
+}
+CANONICAL_ACTIONS = ["bin da", "gehe", "afk", "wieder da", "päuschen", "mache weiter"]
+
+MIGRATIONS = []   # [(id, fn)] in Ausführungsreihenfolge
+
+def migration(mid):
+    def deco(fn):
+        MIGRATIONS.append((mid, fn))
+        return fn
+    return deco
+
+def _q(v):
+    return "'" + v.replace("'", "''") + "'"
+
+def _action_case(col):
+    whens = " ".join(f"WHEN {_q(old)} THEN {_q(new)}" for old, new in LEGACY_ACTIONS.items())
+    return f"CASE {col} {whens} ELSE {col} END"
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+def print_progress(mid, done, total):
+    print(f"  {mid}: {done}/{total} ({(100 * done // total) if total else 100}%)", flush=True)
+
+
+class MigrationLock:
+    """Exklusive Datei-Sperre neben der DB für einen ganzen Migrationslauf.
+
+    Die Migrationen selbst laufen in kurzen Transaktionen (Buchungen kommen
+    dazwischen durch) – ein SQLite-Lock über den ganzen Lauf würde die App
+    blockieren. Die Sperre gilt nur unter Migratoren. In-Memory-DBs: keine Sperre.
+    """
+
+    def __init__(self, conn):
+        row = conn.execute("SELECT file FROM pragma_database_list WHERE name = 'main'").fetchone()
+        self.path = (row[0] + ".migrate.lock") if row and row[0] else None
+        self._f = None
+
+    def __enter__(self):
+        if self.path is None:
+            return self
+        self._f = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._f.seek(0)
+                    msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:          # LK_LOCK gibt nach ~10 s auf -> weiter warten
+                    pass
+        return self
+
+    def __exit__(self, *exc):
+        if self._f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._f.close()
+            self._f = None
+
+
+class Runner:
+    """Führt ausstehende Migrationen auf einer offenen Verbindung aus."""
+
+    def __init__(self, conn, progress=print_progress, batch=BATCH_SIZE, pause=BATCH_PAUSE_S):
+        self.conn = conn
+        self.progress = progress
+        self.batch = max(1, batch)
+        self.pause = pause
+        self._last_report = 0.0
+
+    # -- Protokoll-Tabellen ---------------------------------------------------
+    def ensure_tables(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                id          TEXT PRIMARY KEY,
+                applied_at  TEXT NOT NULL DEFAULT (datetime('now')),
+                duration_ms INTEGER,
+                baseline    INTEGER NOT NULL DEFAULT 0   -- 1 = nur übernommen, nicht ausgeführt
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS migration_progress (
+                id     TEXT PRIMARY KEY,                  -- Migration (+ Schritt)
+                cursor INTEGER NOT NULL,                  -- letzte erledigte id
+                total  INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    def applied(self):
+        return {r[0] for r in self.conn.execute("SELECT id FROM schema_migrations").fetchall()}
+
+    def pending(self):
+        done = self.applied()
+        return [mid for mid, _ in MIGRATIONS if mid not in done]
+
+    def _baseline(self):
+        # DBs aus dem alten init_db() (PRAGMA user_version = 1) haben 0001–0007 schon
+        if self.applied():
+            return
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != 1:
+            return
+        ids = [mid for mid, _ in MIGRATIONS if mid[:4] <= "0007"]
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO schema_migrations (id, baseline) VALUES (?, 1)", [(m,) for m in ids]
+        )
+        self.conn.commit()
+
+    # -- Ausführen ------------------------------------------------------------
+    def run(self, after=None):
+        """Ausstehende Migrationen ausführen. Rückgabe: [(id, projektionen_neu_bauen)].
+
+        Alles unter MigrationLock; after(results) läuft noch unter der Sperre
+        (App: Projektionen neu bauen, Seed), aber nur, wenn dieser Lauf etwas
+        angewandt hat. Wer gewartet hat, findet alles erledigt vor.
+        """
+        with MigrationLock(self.conn):
+            self.ensure_tables()
+            self._baseline()
+            results = self._run_pending()
+            if results and after is not None:
+                after(results)
+        return results
+
+    def _run_pending(self):
+        results = []
+        for mid, fn in MIGRATIONS:
+            if mid in self.applied():        # pro Migration neu lesen (unter der Sperre)
+                continue
+            t0 = time.perf_counter()
+            rebuild = bool(fn(self))
+            ms = int((time.perf_counter() - t0) * 1000)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO schema_migrations (id, duration_ms) VALUES (?, ?)", (mid, ms)
+            )
+            self.conn.execute("DELETE FROM migration_progress WHERE id = ? OR id LIKE ?", (mid, mid + ":%"))
+            self.conn.execute(f"PRAGMA user_version = {self.version()}")
+            self.conn.commit()
+            results.append((mid, rebuild))
+        return results
+
+    def version(self):
+        """user_version = Anzahl durchgehend angewandter Migrationen."""
+        done = self.applied()
+        n = 0
+        for mid, _ in MIGRATIONS:
+            if mid not in done:
+                break
+            n += 1
+        return n
+
+    def ddl(self, *statements):
+        """DDL in einer kurzen Schreib-Transaktion."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql in statements:
+                self.conn.execute(sql)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def add_column(self, table, column, decl):
+        if column not in _columns(self.conn, table):
+            self.ddl(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            return True
+        return False
+
+    def _report(self, step, done, total, force=False):
+        now = time.monotonic()
+        if force or now - self._last_report >= 1.0:
+            self._last_report = now
+            self.progress(step, done, total)
+
+    def batches(self, step, table, sql, params=()):
+        """sql (mit ? ? für id-Untergrenze/-Obergrenze + params) in id-Batches ausführen.
+
+        Jeder Batch ist eine eigene Transaktion zusammen mit dem Cursor-Update.
+        Zeilen, die nach dem Start dazukommen, schreibt die App schon im neuen
+        Format – die Obergrenze wird daher am Anfang einmal festgelegt.
+        """
+        row = self.conn.execute("SELECT cursor, total FROM migration_progress WHERE id = ?", (step,)).fetchone()
+        changed = 0
+        if row:
+            # Fortsetzung nach Abbruch: was vorher schon geändert wurde, ist unbekannt
+            cursor, hi = row[0], row[1]
+            changed = 1 if cursor > 0 else 0
+        else:
+            cursor = 0
+            hi = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        while cursor < hi:
+            nxt = min(cursor + self.batch, hi)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed += self.conn.execute(sql, (cursor, nxt) + tuple(params)).rowcount
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO migration_progress (id, cursor, total) VALUES (?, ?, ?)",
+                    (step, nxt, hi),
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            cursor = nxt
+            self._report(step, cursor, hi, force=cursor >= hi)
+            if self.pause:
+                time.sleep(self.pause)
+        return changed
+
+    def backfill(self, step, table, set_sql, where_sql="1"):
+        """UPDATE table SET set_sql WHERE where_sql – batchweise über id."""
+        return self.batches(step, table,
+                            f"UPDATE {table} SET {set_sql} WHERE id > ? AND id <= ? AND ({where_sql})")
+
+
+# ---- Migrationen ------------------------------------------------------------
+_BOOKINGS_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        created_at TEXT NOT NULL,           -- UTC 'YYYY-MM-DD HH:MM:SS'
+        note TEXT,
+        needs_review INTEGER NOT NULL DEFAULT 0,
+        ticket_action TEXT,                 -- 'aendern' | 'loeschen' | 'blank' | NULL
+        ticket_message TEXT,
+        ts INTEGER,                         -- created_at als Unix-Epoch (UTC)
+        local_day TEXT,                     -- date(created_at,'localtime') 'YYYY-MM-DD'
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+"""
+_BOOKINGS_COLS = "id, user_id, action, created_at, note, needs_review, ticket_action, ticket_message, ts, local_day"
+
+_BOOKINGS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings(user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_ts ON bookings(user_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_day ON bookings(user_id, local_day, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_review ON bookings(needs_review)",
+]
+
+@migration("0001_base_tables")
+def _m0001(r):
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('admin','user')),
+            weekly_minutes INTEGER DEFAULT 2400
+        )
+    """, """
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            entry_date TEXT NOT NULL,         -- YYYY-MM-DD
+            content   TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_journal_user_date ON journal_entries(user_id, entry_date)",
+        _BOOKINGS_DDL.format(name="bookings"),
+    )
+
+@migration("0002_users_weekly_minutes")
+def _m0002(r):
+    r.add_column("users", "weekly_minutes", "INTEGER DEFAULT 2400")
+    r.backfill("0002_users_weekly_minutes", "users", "weekly_minutes = 2400", "weekly_minutes IS NULL")
+
+@migration("0003_bookings_ts_local_day")
+def _m0003(r):
+    r.add_column("bookings", "ts", "INTEGER")
+    r.add_column("bookings", "local_day", "TEXT")
+    n = r.backfill("0003_bookings_ts_local_day", "bookings",
+                   "ts = CAST(strftime('%s', created_at) AS INTEGER), local_day = date(created_at, 'localtime')",
+                   "ts IS NULL OR local_day IS NULL")
+    return n > 0
+
+@migration("0004_bookings_indexes")
+def _m0004(r):
+    # CREATE INDEX ist in SQLite eine einzige Schreib-Transaktion (nicht batchbar)
+    for sql in _BOOKINGS_INDEXES:
+        r.ddl(sql)
+
+@migration("0005_user_status")
+def _m0005(r):
+    created = not _table_exists(r.conn, "user_status")
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS user_status (
+            user_id        INTEGER PRIMARY KEY,
+            state          TEXT NOT NULL DEFAULT 'weg',  -- 'da' | 'weg'
+            since_at       TEXT,                         -- UTC, letzte 'bin da'-Buchung
+            last_end_at    TEXT,                         -- UTC, letzte 'gehe'-Buchung
+            last_action    TEXT,
+            last_action_at TEXT,                         -- UTC
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """, "CREATE INDEX IF NOT EXISTS idx_user_status_state ON user_status(state, since_at)")
+    return created
+
+@migration("0006_daily_minutes")
+def _m0006(r):
+    created = not _table_exists(r.conn, "daily_minutes")
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS daily_minutes (
+            user_id INTEGER NOT NULL,
+            day     TEXT NOT NULL,              -- local_day 'YYYY-MM-DD'
+            work    INTEGER NOT NULL DEFAULT 0,
+            breaks  INTEGER NOT NULL DEFAULT 0,
+            afk     INTEGER NOT NULL DEFAULT 0,
+            net     INTEGER NOT NULL DEFAULT 0,
+            flags   TEXT,                       -- JSON-Liste, NULL = keine
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    """)
+    return created
+
+@migration("0007_report_versions")
+def _m0007(r):
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS report_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+@migration("0008_users_profile_fields")
+def _m0008(r):
+    # früher migrate_add_user_fields.py / manage_users.py
+    r.add_column("users", "join_date", "TEXT")
+    r.add_column("users", "is_active", "INTEGER DEFAULT 1")
+
+@migration("0009_bookings_actions_normalize")
+def _m0009(r):
+    sql = r.conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='bookings'").fetchone()[0]
+    check = re.search(r"CHECK\s*\(\s*action\s+IN\s*\(([^)]*)\)", sql, re.I)
+    if check and not all(_q(a) in check.group(1) for a in CANONICAL_ACTIONS):
+        # alter CHECK lässt die heutigen Keys nicht zu -> Tabelle online umkopieren
+        _copy_bookings_online(r, "0009_bookings_actions_normalize")
+        return True
+    legacy = ", ".join(_q(a) for a in LEGACY_ACTIONS)
+    n = r.backfill("0009_bookings_actions_normalize", "bookings",
+                   f"action = {_action_case('action')}", f"action IN ({legacy})")
+    return n > 0
+
+def _copy_bookings_online(r, step):
+    """bookings -> bookings_new (ohne CHECK, Aktionen gemappt), ohne lange Sperre.
+
+    Trigger spiegeln Schreibzugriffe während des Kopierens in die neue Tabelle;
+    der Batch-Kopierer nimmt INSERT OR IGNORE, damit gespiegelte (neuere) Zeilen
+    gewinnen. Zum Schluss ein kurzer Tausch in einer Transaktion.
+    """
+    case_new = _action_case("NEW.action")
+    new_vals = f"NEW.id, NEW.user_id, {case_new}, NEW.created_at, NEW.note, NEW.needs_review, " \
+               f"NEW.ticket_action, NEW.ticket_message, NEW.ts, NEW.local_day"
+    r.ddl(
+        _BOOKINGS_DDL.format(name="bookings_new"),
+        f"""CREATE TRIGGER IF NOT EXISTS trg_bookings_copy_ins AFTER INSERT ON bookings BEGIN
+              INSERT OR REPLACE INTO bookings_new ({_BOOKINGS_COLS}) VALUES ({new_vals});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_bookings_copy_upd AFTER UPDATE ON bookings BEGIN
+              DELETE FROM bookings_new WHERE id = OLD.id;
+              INSERT OR REPLACE INTO bookings_new ({_BOOKINGS_COLS}) VALUES ({new_vals});
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_bookings_copy_del AFTER DELETE ON bookings BEGIN
+              DELETE FROM bookings_new WHERE id = OLD.id;
+            END""",
+    )
+    select = f"id, user_id, {_action_case('action')}, created_at, note, needs_review, " \
+             f"ticket_action, ticket_message, ts, local_day"
+    copy_sql = f"INSERT OR IGNORE INTO bookings_new ({_BOOKINGS_COLS}) SELECT {select} FROM bookings"
+    r.batches(step + ":copy", "bookings", copy_sql + " WHERE id > ? AND id <= ?")
+    r.ddl(
+        copy_sql,   # Rest (neue Zeilen sind schon gespiegelt -> IGNORE)
+        "DROP TRIGGER IF EXISTS trg_bookings_copy_ins",
+        "DROP TRIGGER IF EXISTS trg_bookings_copy_upd",
+        "DROP TRIGGER IF EXISTS trg_bookings_copy_del",
+        "DROP TABLE bookings",
+        "ALTER TABLE bookings_new RENAME TO bookings",
+        *_BOOKINGS_INDEXES,
+    )
+
+@migration("0010_booking_spool_done")
+def _m0010(r):
+    # nachgetragene Spool-Einträge (Group-Commit-Writer), damit kein Eintrag doppelt landet
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS booking_spool_done (
+            token      TEXT PRIMARY KEY,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+        ) WITHOUT ROWID
+    """)
+
+@migration("0011_maintenance_log")
+def _m0011(r):
+    # Wartungsjobs: letzter Lauf + Lease, damit nur ein Worker einen Job ausführt
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            task        TEXT PRIMARY KEY,
+            last_run_at TEXT,                   -- UTC
+            duration_ms INTEGER,
+            ok          INTEGER,
+            result      TEXT,                   -- JSON
+            lease_owner TEXT,
+            lease_until TEXT                    -- UTC
+        )
+    """)
+
+@migration("0012_presence_version")
+def _m0012(r):
+    # pv: Präsenz-Version, bei der sich die Zeile zuletzt geändert hat (für ?since=)
+    r.add_column("user_status", "pv", "INTEGER NOT NULL DEFAULT 0")
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS presence_meta (
+            id       INTEGER PRIMARY KEY CHECK (id = 1),
+            pv       INTEGER NOT NULL,      -- steigt bei jeder Änderung an user_status
+            reset_pv INTEGER NOT NULL       -- ab hier kein Delta möglich (Neuaufbau)
+        )
+    """, "INSERT OR IGNORE INTO presence_meta (id, pv, reset_pv) VALUES (1, 1, 1)",
+         "CREATE INDEX IF NOT EXISTS idx_user_status_pv ON user_status(pv)")
+
+_TICKETS_DDL = """
+    CREATE TABLE IF NOT EXISTS tickets (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id    INTEGER NOT NULL,
+        booking_id INTEGER,                 -- NULL = Blanko-Ticket (Buchung fehlt)
+        action     TEXT,                    -- Wunsch: 'aendern' | 'loeschen' | NULL
+        message    TEXT,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),   -- UTC
+        closed_at  TEXT,                    -- NULL = offen
+        resolution TEXT,                    -- 'aendern' | 'loeschen' | 'schliessen' | 'zurueckgezogen'
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+"""
+_TICKETS_INDEXES = [
+    # nur offene Tickets: Admin-Queue, höchstens ein offenes Ticket je Buchung, offene je User
+    "CREATE INDEX IF NOT EXISTS idx_tickets_open ON tickets(created_at, id) WHERE closed_at IS NULL",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_open_booking ON tickets(booking_id) "
+    "WHERE closed_at IS NULL AND booking_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_user_open ON tickets(user_id, created_at) WHERE closed_at IS NULL",
+]
+
+@migration("0013_tickets")
+def _m0013(r):
+    # Ticket-Zustand aus bookings herauslösen; Blanko-Tickets waren Schein-Buchungen
+    # ('mache weiter') und verschwinden aus bookings.
+    r.ddl(_TICKETS_DDL, *_TICKETS_INDEXES)
+    cols = _columns(r.conn, "bookings")
+    if "needs_review" not in cols:
+        return False
+    r.batches("0013_tickets:copy", "bookings", """
+        INSERT OR IGNORE INTO tickets (user_id, booking_id, action, message, created_at)
+        SELECT user_id,
+               CASE WHEN IFNULL(ticket_action, '') = 'blank' THEN NULL ELSE id END,
+               CASE WHEN ticket_action IN ('aendern', 'loeschen') THEN ticket_action END,
+               ticket_message, created_at
+        FROM bookings
+        WHERE id > ? AND id <= ? AND needs_review = 1
+    """)
+    blanks = r.batches("0013_tickets:blank", "bookings", """
+        DELETE FROM bookings
+        WHERE id > ? AND id <= ? AND needs_review = 1 AND IFNULL(ticket_action, '') = 'blank'
+    """)
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        # DROP COLUMN schreibt die Tabelle einmal um (eine Transaktion, wie CREATE INDEX);
+        # ältere SQLite-Versionen behalten die Spalten ungenutzt
+        r.ddl("DROP INDEX IF EXISTS idx_bookings_review",
+              *(f"ALTER TABLE bookings DROP COLUMN {c}"
+                for c in ("needs_review", "ticket_action", "ticket_message") if c in cols))
+    return blanks > 0
+
+@migration("0014_ticket_counts")
+def _m0014(r):
+    # offene Tickets je User (Navigations-Badge) + Index für den Aktions-Filter der Queue
+    r.ddl("""
+        CREATE TABLE IF NOT EXISTS ticket_counts (
+            user_id    INTEGER PRIMARY KEY,
+            open_count INTEGER NOT NULL DEFAULT 0
+        )
+    """, """
+        INSERT OR REPLACE INTO ticket_counts (user_id, open_count)
+        SELECT user_id, COUNT(*) FROM tickets WHERE closed_at IS NULL GROUP BY user_id
+    """, "CREATE INDEX IF NOT EXISTS idx_tickets_open_action ON tickets(action, created_at) WHERE closed_at IS NULL")
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def run(conn, progress=print_progress, after=None):
+    return Runner(conn, progress=progress).run(after=after)
+
+
+def print_status(db_path):
+    """Stand der Migrationen ausgeben – nur lesend, legt auch keine Tabellen an."""
+    conn = sqlite3.connect(f"file:{pathname2url(db_path)}?mode=ro", uri=True)
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "schema_migrations" not in tables:
+            print(f"nicht initialisiert (keine schema_migrations, PRAGMA user_version = "
+                  f"{conn.execute('PRAGMA user_version').fetchone()[0]}) – {db_path}")
+            return
+        done = Runner(conn).applied()
+        for mid, _ in MIGRATIONS:
+            print(("✅ " if mid in done else "⏳ ") + mid)
+        if "migration_progress" in tables:
+            for step, cur, total in conn.execute("SELECT id, cursor, total FROM migration_progress"):
+                print(f"   angefangen: {step} {cur}/{total}")
+    finally:
+        conn.close()
+
+def main(argv):
+    args = [a for a in argv if not a.startswith("--")]
+    base = os.path.dirname(os.path.abspath(__file__))
+    db_path = os.path.abspath(args[0]) if args else (os.getenv("DB_PATH") or os.path.join(base, "instance", "users.db"))
+    if not os.path.exists(db_path):
+        raise SystemExit(f"DB nicht gefunden: {db_path}")
+
+    if "--status" in argv:
+        print_status(db_path)
+        return
+
+    # Über die App migrieren: init_db() baut danach auch die Projektionen neu
+    os.environ["DB_PATH"] = db_path
+    import app
+    print(f"Schema: {app._BOOT['schema']} ({app._BOOT['init_db_ms']} ms), Version {SCHEMA_VERSION} – {db_path}")
+    if app._BOOT["schema"] is None:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,372 @@
+# report_engine.py – Report-Berechnung ohne Flask und ohne Seiteneffekte
+#
+# Reine Rechen- und Lese-Funktionen für Tageswerte und CSV-Reports. app.py
+# importiert sie; der Prozess-Pool des Sammel-Exports lädt nur dieses Modul
+# (kein init_db, keine Migrationen, kein Verbindungs-Pool, keine Hooks) und
+# liest über eine Nur-Lese-Verbindung (mode=ro).
+# Zeitzone: kommt über TZ aus dem Elternprozess (app.py setzt Europe/Berlin).
+import os, csv, json, sqlite3
+from array import array
+from itertools import chain
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+# ---- Tagesberechnung aus Buchungen ----
+WORK_START = {"bin da", "kommt"}
+WORK_END   = {"gehe", "geht"}
+BRK_START  = {"päuschen", "pause"}
+BRK_END    = {"mache weiter", "pausenende"}
+AFK_START  = {"afk", "abwesend"}
+AFK_END    = {"wieder da", "wieder_da"}
+
+def _parse_ts(ts: str) -> datetime:
+    return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+
+def compute_day_minutes(events):
+    work = breaks = afk = 0
+    on = brk_on = afk_on = None
+    flags = []
+
+    for ts_str, action in events:
+        t = _parse_ts(ts_str)
+
+        if action in WORK_START:
+            if on is None:
+                on = t
+            else:
+                work += max(0, int((t - on).total_seconds() // 60))
+                if brk_on:
+                    breaks += max(0, int((t - brk_on).total_seconds() // 60))
+                    brk_on = None
+                if afk_on:
+                    afk += max(0, int((t - afk_on).total_seconds() // 60))
+                    afk_on = None
+                on = t
+
+        elif action in WORK_END:
+            if on is not None:
+                work += max(0, int((t - on).total_seconds() // 60))
+                on = None
+                if brk_on:
+                    breaks += max(0, int((t - brk_on).total_seconds() // 60))
+                    brk_on = None
+                if afk_on:
+                    afk += max(0, int((t - afk_on).total_seconds() // 60))
+                    afk_on = None
+            else:
+                flags.append("Ende ohne Start")
+
+        elif action in BRK_START:
+            if on is not None and brk_on is None:
+                brk_on = t
+
+        elif action in BRK_END:
+            if brk_on is not None:
+                breaks += max(0, int((t - brk_on).total_seconds() // 60))
+                brk_on = None
+
+        elif action in AFK_START:
+            if on is not None and afk_on is None:
+                afk_on = t
+
+        elif action in AFK_END:
+            if afk_on is not None:
+                afk += max(0, int((t - afk_on).total_seconds() // 60))
+                afk_on = None
+
+    if on is not None:
+        flags.append("Offener Arbeitstag (kein Ende)")
+    if brk_on is not None:
+        flags.append("Offene Pause (kein Ende)")
+    if afk_on is not None:
+        flags.append("Offenes AFK (kein Ende)")
+
+    net = max(0, work - breaks - afk)
+    return {"work": work, "breaks": breaks, "afk": afk, "net": net, "flags": flags}
+
+# --- Perioden-Engine: ein Durchlauf über alle Tage eines Zeitraums ---
+# Gleiche Regeln wie compute_day_minutes (Zustand wird pro Tag zurückgesetzt),
+# aber mit ganzzahligen lokalen Sekunden statt strptime und ohne Dict pro Tag.
+_W_START, _W_END, _B_START, _B_END, _A_START, _A_END = range(1, 7)
+_ACTION_CODE = {}
+for _code, _names in ((_W_START, WORK_START), (_W_END, WORK_END), (_B_START, BRK_START),
+                      (_B_END, BRK_END), (_A_START, AFK_START), (_A_END, AFK_END)):
+    for _n in _names:
+        _ACTION_CODE[_n] = _code
+
+def compute_period_minutes(events):
+    """events: (local_day, lokale Sekunden, action), sortiert nach Tag und Zeit.
+
+    Liefert Spalten (days, work, breaks, afk, net, flags); Zahlen als array('l'),
+    flags je Tag als Liste oder None. Nur Tage mit Buchungen erscheinen.
+    """
+    days = []
+    col_work, col_breaks, col_afk, col_net = array("l"), array("l"), array("l"), array("l")
+    col_flags = []
+    code_of = _ACTION_CODE.get
+
+    cur_day = None
+    work = breaks = afk = 0
+    on = brk_on = afk_on = None
+    flags = None
+
+    # Sentinel (Tag None) schließt den letzten Tag ab
+    for day, t, action in chain(events, ((None, 0, None),)):
+        if day != cur_day:
+            if cur_day is not None:
+                if on is not None or brk_on is not None or afk_on is not None:
+                    if flags is None:
+                        flags = []
+                    if on is not None:
+                        flags.append("Offener Arbeitstag (kein Ende)")
+                    if brk_on is not None:
+                        flags.append("Offene Pause (kein Ende)")
+                    if afk_on is not None:
+                        flags.append("Offenes AFK (kein Ende)")
+                days.append(cur_day)
+                col_work.append(work)
+                col_breaks.append(breaks)
+                col_afk.append(afk)
+                n = work - breaks - afk
+                col_net.append(n if n > 0 else 0)
+                col_flags.append(flags)
+            if day is None:
+                break
+            cur_day = day
+            work = breaks = afk = 0
+            on = brk_on = afk_on = None
+            flags = None
+
+        c = code_of(action, 0)
+        if c == _W_START:
+            if on is not None:
+                m = (t - on) // 60
+                if m > 0: work += m
+                if brk_on is not None:
+                    m = (t - brk_on) // 60
+                    if m > 0: breaks += m
+                    brk_on = None
+                if afk_on is not None:
+                    m = (t - afk_on) // 60
+                    if m > 0: afk += m
+                    afk_on = None
+            on = t
+        elif c == _W_END:
+            if on is not None:
+                m = (t - on) // 60
+                if m > 0: work += m
+                on = None
+                if brk_on is not None:
+                    m = (t - brk_on) // 60
+                    if m > 0: breaks += m
+                    brk_on = None
+                if afk_on is not None:
+                    m = (t - afk_on) // 60
+                    if m > 0: afk += m
+                    afk_on = None
+            else:
+                if flags is None:
+                    flags = []
+                flags.append("Ende ohne Start")
+        elif c == _B_START:
+            if on is not None and brk_on is None:
+                brk_on = t
+        elif c == _B_END:
+            if brk_on is not None:
+                m = (t - brk_on) // 60
+                if m > 0: breaks += m
+                brk_on = None
+        elif c == _A_START:
+            if on is not None and afk_on is None:
+                afk_on = t
+        elif c == _A_END:
+            if afk_on is not None:
+                m = (t - afk_on) // 60
+                if m > 0: afk += m
+                afk_on = None
+
+    return days, col_work, col_breaks, col_afk, col_net, col_flags
+
+# ---- Tageswerte aus daily_minutes ----
+def iter_days_in_range(start_dt, end_dt):
+    d = start_dt.date()
+    last = (end_dt - timedelta(days=1)).date()
+    while d <= last:
+        yield d
+        d += timedelta(days=1)
+
+_EMPTY_DAY = {"work": 0, "breaks": 0, "afk": 0, "net": 0, "flags": []}
+
+def iter_daily_minutes(conn, uid, start_dt, end_dt):
+    """(date, metrics) für jeden Kalendertag in [start_dt, end_dt); streamt per Cursor."""
+    cur = conn.execute("""
+        SELECT day, work, breaks, afk, net, flags
+        FROM daily_minutes
+        WHERE user_id = ? AND day >= ? AND day < ?
+        ORDER BY day
+    """, (uid, start_dt.strftime("%Y-%m-%d"), end_dt.strftime("%Y-%m-%d")))
+    r = cur.fetchone()
+    for d in iter_days_in_range(start_dt, end_dt):
+        dstr = d.strftime("%Y-%m-%d")
+        if r is not None and r["day"] == dstr:
+            yield d, {"work": r["work"], "breaks": r["breaks"], "afk": r["afk"], "net": r["net"],
+                      "flags": json.loads(r["flags"]) if r["flags"] else []}
+            r = cur.fetchone()
+        else:
+            yield d, _EMPTY_DAY
+    cur.close()
+
+def history_range(conn, uid):
+    """Gesamter Verlauf: erster Tag mit Buchungen bis einschließlich heute."""
+    first = conn.execute("SELECT MIN(day) FROM daily_minutes WHERE user_id = ?", (uid,)).fetchone()[0]
+    start = datetime.strptime(first, "%Y-%m-%d") if first else datetime.combine(date.today(), datetime.min.time())
+    end = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    return min(start, end - timedelta(days=1)), end
+
+def report_days(conn, uid, start_dt, end_dt):
+    """(Tageszeilen, Summen) für [start_dt, end_dt) – ungecacht (Cache: app._report_days)."""
+    days = []
+    sums = {"work":0,"breaks":0,"afk":0,"net":0}
+    for d, m in iter_daily_minutes(conn, uid, start_dt, end_dt):
+        for k in ("work","breaks","afk","net"):
+            sums[k] += m[k]
+        days.append({
+            "date": d.strftime("%Y-%m-%d"),
+            "weekday": d.weekday(),
+            "work": m["work"],
+            "breaks": m["breaks"],
+            "afk": m["afk"],
+            "net": m["net"],
+            "flags": m["flags"],
+        })
+    return days, sums
+
+# ---- CSV ----
+def fmt_hhmm(mins: int) -> str:
+    s = "-" if mins < 0 else ""
+    m = abs(int(mins))
+    h = m // 60
+    mm = m % 60
+    return f"{s}{h}:{mm:02d}"
+
+# CSV wird gestreamt: csv.writer schreibt in einen Puffer, der ab ~8 KB als
+# Chunk rausgeht. So bleibt der Speicher konstant, auch bei Mehrjahres-Exporten.
+CSV_CHUNK_CHARS = 8192
+
+class _CsvChunkBuffer:
+    """Minimaler File-Ersatz für csv.writer; sammelt Text bis zur Chunkgröße."""
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, s):
+        self.parts.append(s)
+        self.size += len(s)
+
+    def take(self):
+        data = "".join(self.parts).encode("utf-8")
+        self.parts.clear()
+        self.size = 0
+        return data
+
+def encode_csv_chunks(rows):
+    """Rows -> utf-8-Chunks mit BOM vorneweg (wie vorher utf-8-sig), Trenner ';'."""
+    buf = _CsvChunkBuffer()
+    writer = csv.writer(buf, delimiter=';')
+    buf.write("\ufeff")
+    for row in rows:
+        writer.writerow(row)
+        if buf.size >= CSV_CHUNK_CHARS:
+            yield buf.take()
+    if buf.size:
+        yield buf.take()
+
+def report_csv_rows(days, username, weekly_minutes, start_dt, end_dt, chronik="all"):
+    """CSV-Zeilen eines User-Reports (Tageszeilen aus report_days + SUMME)."""
+    daily_target = weekly_minutes / 5.0
+
+    yield ["User", username]
+    yield ["Zeitraum", f"{start_dt.date()} bis {end_dt.date()}"]
+    if chronik == "over":
+        yield ["Filter", "Überstunden (Δ > 0)"]
+    elif chronik == "under":
+        yield ["Filter", "Fehlstunden (Δ < 0)"]
+    elif chronik == "afk":
+        yield ["Filter", "AFK-Tage (AFK > 0)"]
+    else:
+        yield ["Filter", "Alle Tage"]
+    yield []
+
+    yield [
+        "Datum",
+        "Arbeit_min","Arbeit_hhmm",
+        "Pausen_min","Pausen_hhmm",
+        "AFK_min","AFK_hhmm",
+        "Netto_min","Netto_hhmm",
+        "Soll_min","Soll_hhmm",
+        "Delta_min","Delta_hhmm"
+    ]
+    sum_work = sum_breaks = sum_afk = sum_net = sum_soll = sum_delta = 0
+
+    for m in days:
+        is_weekday = m["weekday"] < 5
+        soll = int(round(daily_target)) if is_weekday else 0
+        delta = m["net"] - soll
+
+        include_row = True
+        if chronik == "over" and delta <= 0:
+            include_row = False
+        elif chronik == "under" and delta >= 0:
+            include_row = False
+        elif chronik == "afk" and m["afk"] <= 0:
+            include_row = False
+        if not include_row:
+            continue
+
+        sum_work   += m["work"]
+        sum_breaks += m["breaks"]
+        sum_afk    += m["afk"]
+        sum_net    += m["net"]
+        sum_soll   += soll
+        sum_delta  += delta
+
+        yield [
+            m["date"],
+            m["work"], fmt_hhmm(m["work"]),
+            m["breaks"], fmt_hhmm(m["breaks"]),
+            m["afk"], fmt_hhmm(m["afk"]),
+            m["net"], fmt_hhmm(m["net"]),
+            soll, fmt_hhmm(soll),
+            delta, ("+" if delta>=0 else "") + fmt_hhmm(delta)
+        ]
+
+    yield [
+        "SUMME",
+        sum_work,   fmt_hhmm(sum_work),
+        sum_breaks, fmt_hhmm(sum_breaks),
+        sum_afk,    fmt_hhmm(sum_afk),
+        sum_net,    fmt_hhmm(sum_net),
+        sum_soll,   fmt_hhmm(sum_soll),
+        sum_delta,  ("+" if sum_delta>=0 else "") + fmt_hhmm(sum_delta)
+    ]
+
+# ---- Sammel-Export (Prozess-Pool) ----
+def open_readonly(db_path, timeout=15.0):
+    """Nur-Lese-Verbindung (URI mode=ro): legt nichts an, schreibt nichts."""
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True, timeout=timeout)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def report_csv_job(db_path, uid, username, weekly_minutes, period, start_dt, end_dt):
+    """Prozess-Pool-Job: CSV-Bytes + SUMME-Zeile eines Users (eigene Nur-Lese-Verbindung)."""
+    conn = open_readonly(db_path)
+    try:
+        if period == "all":
+            start_dt, end_dt = history_range(conn, uid)
+        days, _ = report_days(conn, uid, start_dt, end_dt)
+        rows = list(report_csv_rows(days, username, weekly_minutes, start_dt, end_dt))
+    finally:
+        conn.close()
+    data = b"".join(encode_csv_chunks(rows))
+    filename = f"report_{username}_{period}_{start_dt.date()}_{end_dt.date()}.csv"
+    return filename, data, rows[-1]
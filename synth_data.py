@@ -0,0 +1,141 @@
+# synth_data.py – realistische Testdaten: N User × M Jahre Buchungen, Tickets, Tagebuch
+#
+#   python synth_data.py instance/synth.db --users 50 --years 2
+#
+# Buchungen folgen dem Ablauf der Buttons (bin da -> Päuschen/AFK -> gehe) mit
+# gelegentlichen Fehlbedienungen, vergessenem Feierabend und Tickets. Der
+# letzte Tag endet "jetzt", ein Teil der User ist also gerade anwesend.
+# Die Projektionen (user_status, daily_minutes) werden am Ende neu aufgebaut.
+#
+# Auch als Modul nutzbar (bench_routes.py, loadtest.py): generate(db_path, ...).
+import os, sys, random, argparse, calendar, sqlite3
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+BERLIN = ZoneInfo("Europe/Berlin")
+PASSWORD = "synth123"            # für alle erzeugten User
+ADMIN = "synthadmin"
+
+TICKET_MESSAGES = ["Vergessen zu buchen", "Falsche Uhrzeit", "Doppelt gebucht", "Bitte löschen", "War im Homeoffice"]
+JOURNAL_LINES = ["Kundentermin vorbereitet", "Lager aufgeräumt", "Glitzer nachbestellt",
+                 "Team-Meeting", "Rechnungen geprüft", "Schulung", "Ware ausgeliefert"]
+
+def synth_day(rng, day, keys):
+    """Ein Arbeitstag als Liste (lokale naive datetime, action)."""
+    t = datetime(day.year, day.month, day.day, 7) + timedelta(seconds=rng.randint(0, 7200))
+    evts = [(t, "bin da")]
+    for _ in range(rng.randint(0, 3)):
+        t += timedelta(seconds=rng.randint(1800, 7200))
+        if rng.random() < 0.6:
+            evts.append((t, "päuschen")); t += timedelta(seconds=rng.randint(300, 2400)); evts.append((t, "mache weiter"))
+        else:
+            evts.append((t, "afk")); t += timedelta(seconds=rng.randint(120, 1800)); evts.append((t, "wieder da"))
+    if rng.random() < 0.05:                      # Fehlbedienung
+        t += timedelta(seconds=rng.randint(0, 600)); evts.append((t, rng.choice(keys)))
+    if rng.random() > 0.03:                      # 3 %: Feierabend vergessen
+        t += timedelta(seconds=rng.randint(1800, 5 * 3600)); evts.append((t, "gehe"))
+    if rng.random() < 0.02:                      # doppeltes "gehe"
+        evts.append((t + timedelta(seconds=60), "gehe"))
+    return evts
+
+def _utc(local_dt):
+    utc = local_dt.replace(tzinfo=BERLIN).astimezone(timezone.utc)
+    return utc.strftime("%Y-%m-%d %H:%M:%S"), calendar.timegm(utc.timetuple())
+
+def _booking_row(uid, local_dt, action, rng):
+    created_at, ts = _utc(local_dt)
+    note = "Projekt Glitzerkram" if rng.random() < 0.02 else None
+    return (uid, action, created_at, note, ts, local_dt.date().isoformat())
+
+def generate(db_path, users=20, years=1, seed=42, progress=print):
+    """DB anlegen (Schema über app/migrate) und füllen. Gibt Kennzahlen zurück.
+
+    Muss vor dem ersten `import app` laufen – DB_PATH wird beim Import festgelegt.
+    """
+    if "app" in sys.modules and sys.modules["app"].DB_PATH != db_path:
+        raise RuntimeError("app ist schon mit einer anderen DB importiert")
+    os.environ["DB_PATH"] = db_path
+    os.environ.setdefault("MAINTENANCE", "0")
+    import app as A
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    keys = [k for k, _ in A.ACTIONS]
+    conn = A._open_connection()
+    pw_hash = generate_password_hash(PASSWORD)   # einmal hashen (pbkdf2 ist teuer)
+
+    conn.execute("INSERT OR IGNORE INTO users (username, password_hash, role, weekly_minutes) VALUES (?, ?, 'admin', 2400)",
+                 (ADMIN, pw_hash))
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (username, password_hash, role, weekly_minutes) VALUES (?, ?, 'user', ?)",
+        [(f"synth{i:04d}", pw_hash, rng.choice([2400, 2400, 1200, 1800, 2100])) for i in range(users)],
+    )
+    conn.commit()
+    uids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'synth0%' ORDER BY id")]
+
+    now = datetime.now(BERLIN).replace(tzinfo=None)
+    today = now.date()
+    start = today - timedelta(days=365 * years)
+    n_bookings = n_journal = n_tickets = 0
+    for k, uid in enumerate(uids, 1):
+        rows, journal, tickets = [], [], []
+        d = start
+        while d <= today:
+            if d.weekday() < 5 or rng.random() < 0.05:
+                for t, action in synth_day(rng, d, keys):
+                    if t <= now:
+                        rows.append(_booking_row(uid, t, action, rng))
+                        if rng.random() < 0.01:          # Ticket zu dieser Buchung
+                            tickets.append((len(rows) - 1, rng.choice(["aendern", "loeschen", None]),
+                                            rng.choice(TICKET_MESSAGES), rows[-1][2]))
+                if rng.random() < 0.6 and d < today:
+                    journal.append((uid, d.isoformat(), "; ".join(rng.sample(JOURNAL_LINES, rng.randint(1, 3)))))
+            d += timedelta(days=1)
+        # AUTOINCREMENT vergibt fortlaufend ab max(seq, MAX(id)) + 1 -> ids für die Tickets
+        first_id = conn.execute("""
+            SELECT MAX(IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'bookings'), 0),
+                       IFNULL((SELECT MAX(id) FROM bookings), 0)) + 1
+        """).fetchone()[0]
+        conn.executemany("""
+            INSERT INTO bookings (user_id, action, created_at, note, ts, local_day)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        ticket_rows = [(uid, first_id + i, action, msg, created_at) for i, action, msg, created_at in tickets]
+        if rng.random() < 0.1:                   # offenes Blanko-Ticket
+            t = now - timedelta(days=rng.randint(0, 20))
+            ticket_rows.append((uid, None, None, "Buchung fehlt | Datum: " + t.date().isoformat(), _utc(t)[0]))
+        conn.executemany("INSERT INTO tickets (user_id, booking_id, action, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                         ticket_rows)
+        conn.executemany("INSERT INTO journal_entries (user_id, entry_date, content) VALUES (?, ?, ?)", journal)
+        conn.commit()
+        n_bookings += len(rows)
+        n_journal += len(journal)
+        n_tickets += len(ticket_rows)
+        if progress and (k % 10 == 0 or k == len(uids)):
+            progress(f"  {k}/{len(uids)} User, {n_bookings} Buchungen")
+
+    if progress:
+        progress("  Projektionen neu aufbauen …")
+    A._rebuild_projections(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    sqlite3.Connection.close(conn)
+    return {"db_path": db_path, "users": len(uids), "years": years, "bookings": n_bookings,
+            "tickets": n_tickets, "journal_entries": n_journal, "admin": ADMIN, "password": PASSWORD,
+            "user_ids": uids, "start": start.isoformat(), "end": today.isoformat()}
+
+def main(argv):
+    ap = argparse.ArgumentParser(description="Synthetische Zeiterfassungs-Daten erzeugen")
+    ap.add_argument("db", help="Ziel-DB (wird angelegt; vorhandene synth-User werden ergänzt)")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--years", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    info = generate(os.path.abspath(args.db), args.users, args.years, args.seed)
+    print(f"OK: {info['users']} User, {info['bookings']} Buchungen, {info['tickets']} Tickets, "
+          f"{info['journal_entries']} Tagebuch-Einträge ({info['start']} bis {info['end']}) -> {info['db_path']}")
+    print(f"Login: {ADMIN} / {PASSWORD} (Admin), synth0000 / {PASSWORD} (User)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
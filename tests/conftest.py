@@ -0,0 +1,13 @@
+# Gemeinsame Test-Einstellungen: eigene DB und Dateien in einem Temp-Verzeichnis,
+# kein Wartungs-Thread. Muss vor dem ersten "import app" greifen.
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="zeiterfassung-tests-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "users.db")
+os.environ["BOOKING_SPOOL"] = os.path.join(_TMP, "booking_spool.jsonl")
+os.environ["SLOW_QUERY_LOG"] = os.path.join(_TMP, "slow_queries.log")
+os.environ["PROFILE_DIR"] = os.path.join(_TMP, "profiles")
+os.environ["MAINTENANCE"] = "0"
@@ -0,0 +1,92 @@
+# Ticket-Queue /admin: Keyset-Paginierung über (created_at, id) liefert jedes offene Ticket
+# genau einmal, neueste zuerst – auch mit Filtern nach User, Wunsch-Aktion und Zeitraum.
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from flask import template_rendered
+
+import app as A
+
+KINDS = ("aendern", "loeschen", "pruefen", "blank")
+
+
+@pytest.fixture(scope="module")
+def tickets():
+    """14 offene Tickets zweier User vom 3.–9.2.2025, je zwei mit gleichem created_at."""
+    conn = A._open_connection()
+    try:
+        n = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        uids = [conn.execute("INSERT INTO users (username, password_hash, role) VALUES (?, 'x', 'user')",
+                             (f"queue{n}_{i}",)).lastrowid for i in range(2)]
+        out = []
+        for i in range(14):
+            uid, kind = uids[i % 2], KINDS[(i + i // 2) % 4]
+            created = datetime(2025, 2, 3, 12) + timedelta(days=i // 2)
+            at = created.strftime("%Y-%m-%d %H:%M:%S")
+            booking = None
+            if kind != "blank":
+                booking = conn.execute(A.BOOKING_INSERT_AT_SQL, (uid, "bin da", at, None, at, at)).lastrowid
+            tid = conn.execute(
+                "INSERT INTO tickets (user_id, booking_id, action, message, created_at) VALUES (?, ?, ?, 'x', ?)",
+                (uid, booking, kind if kind in ("aendern", "loeschen") else None, at)
+            ).lastrowid
+            out.append({"id": tid, "uid": uid, "kind": kind, "day": created.date().isoformat(), "at": at})
+        for uid in uids:
+            A._after_ticket_write(conn, uid)
+        conn.commit()
+    finally:
+        sqlite3.Connection.close(conn)
+    return uids, out
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(A, "TICKETS_PAGE_SIZE", 3)
+    c = A.app.test_client()
+    c.post("/", data={"username": "chef", "password": "secret123"})
+    return c
+
+
+def _pages(client, url):
+    """Alle Seiten über den "Ältere"-Link abrufen; Liste der Ticket-ids je Seite."""
+    pages = []
+    while url:
+        seen = []
+        with template_rendered.connected_to(lambda s, template, context, **kw: seen.append(context), A.app):
+            assert client.get(url).status_code == 200
+        ctx = seen[0]
+        pages.append([(r["ticket_created_at"], r["id"]) for r in ctx["tickets"]])
+        url = ctx["next_url"]
+        assert len(pages) < 100
+    return pages
+
+
+def _check(client, url, expected):
+    pages = _pages(client, url)
+    got = [key for page in pages for key in page]
+    assert all(len(p) == 3 for p in pages[:-1]) and len(pages[-1]) <= 3
+    assert got == sorted(got, reverse=True)                      # neueste zuerst, über Seitengrenzen
+    assert len(got) == len(set(got))                             # keine Duplikate
+    assert {tid for _, tid in got} == expected                   # keine Lücken
+    return pages
+
+
+def test_unfiltered_queue_pages_through_all_open_tickets(admin, tickets):
+    conn = sqlite3.connect(A.DB_PATH)
+    open_ids = {r[0] for r in conn.execute("SELECT id FROM tickets WHERE closed_at IS NULL")}
+    conn.close()
+    pages = _check(admin, "/admin", open_ids)
+    assert len(pages) >= 5
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_filters_apply_on_every_page(admin, tickets, kind):
+    uids, rows = tickets
+    _check(admin, f"/admin?uid={uids[0]}", {t["id"] for t in rows if t["uid"] == uids[0]})
+    _check(admin, "/admin?from=2025-02-04&to=2025-02-07",
+           {t["id"] for t in rows if "2025-02-04" <= t["day"] <= "2025-02-07"})
+    _check(admin, f"/admin?kind={kind}&from=2025-02-03&to=2025-02-09",
+           {t["id"] for t in rows if t["kind"] == kind})
+    _check(admin, f"/admin?uid={uids[1]}&kind={kind}&from=2025-02-05",
+           {t["id"] for t in rows if t["uid"] == uids[1] and t["kind"] == kind and t["day"] >= "2025-02-05"})
@@ -0,0 +1,137 @@
+# Group-Commit (_BookingWriter): mehrere Buchungen in einer Transaktion, ungültige Aktion
+# nur für ihren Request 400, Spool bei gesperrter DB und Nachtrag ohne Doppelbuchung.
+import json, sqlite3, threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as A
+
+
+@pytest.fixture
+def user():
+    conn = sqlite3.connect(A.DB_PATH)
+    name = f"writer{conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]}"
+    uid = conn.execute(
+        "INSERT INTO users (username, password_hash, role, weekly_minutes) VALUES (?, ?, 'user', 2400)",
+        (name, generate_password_hash("writer123"))
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return uid, name
+
+
+@pytest.fixture
+def action_check():
+    """Wie der CHECK alter DBs: unbekannte Aktion -> IntegrityError nur für dieses Statement."""
+    keys = [k for k, _ in A.ACTIONS] + list(A.MAP_NEW_TO_OLD.values())
+    conn = sqlite3.connect(A.DB_PATH)
+    conn.execute(f"""
+        CREATE TRIGGER test_action_check BEFORE INSERT ON bookings
+        WHEN NEW.action NOT IN ({", ".join(f"'{k}'" for k in keys)})
+        BEGIN SELECT RAISE(ABORT, 'CHECK constraint failed: action'); END
+    """)
+    conn.commit()
+    yield
+    conn.execute("DROP TRIGGER test_action_check")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    path = tmp_path / "booking_spool.jsonl"
+    monkeypatch.setattr(A, "BOOKING_SPOOL_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def conn():
+    c = A._open_connection()
+    yield c
+    sqlite3.Connection.close(c)
+
+
+def _actions(uid):
+    c = sqlite3.connect(A.DB_PATH)
+    try:
+        return sorted(r[0] for r in c.execute("SELECT action FROM bookings WHERE user_id = ?", (uid,)))
+    finally:
+        c.close()
+
+
+def test_concurrent_bookings_share_one_commit(user, spool, action_check, monkeypatch):
+    uid, name = user
+    writer = A._BookingWriter()
+    monkeypatch.setattr(A, "_booking_writer", writer)
+    monkeypatch.setitem(A.app.config, "BOOKING_GROUP_COMMIT", True)
+    monkeypatch.setattr(A, "BOOKING_GROUP_WINDOW_MS", 300)     # alle vier landen im selben Batch
+
+    actions = ["bin da", "päuschen", "mache weiter", "gibt es nicht"]
+    clients = []
+    for _ in actions:
+        c = A.app.test_client()
+        c.post("/", data={"username": name, "password": "writer123"})
+        clients.append(c)
+    start = threading.Barrier(len(actions))
+    status = {}
+
+    def post(client, action):
+        start.wait()
+        status[action] = client.post("/book", data={"action": action}).status_code
+
+    threads = [threading.Thread(target=post, args=ca) for ca in zip(clients, actions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    assert status == {"bin da": 302, "päuschen": 302, "mache weiter": 302, "gibt es nicht": 400}
+    assert writer.stats["batches"] == 1 and writer.stats["max_batch"] == 4
+    assert writer.stats["rejected"] == 1 and writer.stats["spooled"] == 0
+    assert _actions(uid) == sorted(actions[:3])
+
+
+def test_locked_db_spools_then_replays(user, spool, conn):
+    uid, _ = user
+    writer = A._BookingWriter()
+    locker = sqlite3.connect(A.DB_PATH)
+    locker.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("PRAGMA busy_timeout = 50")
+        req = A._BookingRequest(uid, "bin da", "gesperrt")
+        assert writer._commit(conn, [req]) is False
+        assert req.spooled and req.error is None and req.done.is_set()
+        items = [json.loads(line) for line in spool.read_text(encoding="utf-8").splitlines()]
+        assert [(i["uid"], i["action"], i["note"], i["created_at"]) for i in items] == \
+               [(uid, "bin da", "gesperrt", req.created_at)]
+        assert _actions(uid) == []
+    finally:
+        locker.rollback()
+        locker.close()
+
+    writer._replay(conn)
+    assert _actions(uid) == ["bin da"]
+    assert spool.read_text(encoding="utf-8") == ""
+    assert writer.stats["replayed"] == 1
+
+
+def test_replay_skips_tokens_already_applied(user, spool, conn):
+    # Absturz zwischen commit und Leeren des Spools: der erste Eintrag ist schon gebucht
+    uid, _ = user
+    lines = [{"token": f"t-{uid}-{i}", "uid": uid, "action": action, "note": None,
+              "created_at": f"2026-05-04 0{7 + i}:00:00"} for i, action in enumerate(("bin da", "gehe"))]
+    spool.write_text("".join(json.dumps(it) + "\n" for it in lines), encoding="utf-8")
+    A._insert_booking_at(conn, uid, "bin da", lines[0]["created_at"], None)
+    conn.execute("INSERT INTO booking_spool_done (token) VALUES (?)", (lines[0]["token"],))
+    conn.commit()
+
+    writer = A._BookingWriter()
+    writer._replay(conn)
+    assert _actions(uid) == ["bin da", "gehe"]
+    assert writer.stats["replayed"] == 1
+    assert spool.read_text(encoding="utf-8") == ""
+
+    spool.write_text(json.dumps(lines[1]) + "\n", encoding="utf-8")     # nochmal derselbe Spool
+    writer._replay(conn)
+    assert _actions(uid) == ["bin da", "gehe"]
@@ -0,0 +1,98 @@
+# daily_minutes: die inkrementell gepflegte Projektion stimmt nach Buchen, Ändern und Löschen
+# mit der Referenz (compute_day_minutes über alle Buchungen des Tages) überein.
+import json, random, sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as A
+import report_engine as E
+
+
+@pytest.fixture
+def conn():
+    c = A._open_connection()
+    yield c
+    sqlite3.Connection.close(c)
+
+
+def _new_user(conn, name):
+    uid = conn.execute(
+        "INSERT INTO users (username, password_hash, role, weekly_minutes) VALUES (?, 'x', 'user', 2400)", (name,)
+    ).lastrowid
+    conn.commit()
+    return uid
+
+
+def _projection(conn, uid):
+    return {r["day"]: {"work": r["work"], "breaks": r["breaks"], "afk": r["afk"], "net": r["net"],
+                       "flags": json.loads(r["flags"]) if r["flags"] else []}
+            for r in conn.execute("SELECT * FROM daily_minutes WHERE user_id = ?", (uid,))}
+
+
+def _reference(conn, uid):
+    by_day = {}
+    for day, local, action in conn.execute("""
+        SELECT local_day, datetime(created_at, 'localtime'), action FROM bookings
+         WHERE user_id = ? ORDER BY local_day, ts, id
+    """, (uid,)):
+        by_day.setdefault(day, []).append((local, action))
+    return {day: E.compute_day_minutes(evts) for day, evts in by_day.items()}
+
+
+def _utc(rng, base):
+    # Zeiten rund um Mitternacht (lokal) verschieben local_day – der knifflige Fall
+    return (base + timedelta(minutes=rng.randint(-120, 20 * 60))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_projection_matches_reference(conn, seed):
+    rng = random.Random(seed)
+    uid = _new_user(conn, f"proj{seed}")
+    actions = [k for k, _ in A.ACTIONS]
+    days = [datetime(2026, 5, 4) + timedelta(days=i) for i in range(6)]
+
+    for _ in range(120):
+        op = rng.random()
+        ids = [r[0] for r in conn.execute("SELECT id FROM bookings WHERE user_id = ?", (uid,))]
+        if op < 0.6 or not ids:                 # neue Buchung (wie Nachtrag / Ticket ohne Buchung)
+            at = _utc(rng, rng.choice(days))
+            bid = conn.execute(A.BOOKING_INSERT_AT_SQL, (uid, rng.choice(actions), at, None, at, at)).lastrowid
+            A._after_booking_write(conn, uid, (A._booking_day(conn, bid),))
+        elif op < 0.85:                         # Ticket "ändern": Zeit/Aktion verschieben
+            bid = rng.choice(ids)
+            old_day = A._booking_day(conn, bid)
+            at = _utc(rng, rng.choice(days))
+            conn.execute("""
+                UPDATE bookings SET action = ?, created_at = ?, ts = CAST(strftime('%s', ?) AS INTEGER),
+                                    local_day = date(?, 'localtime')
+                 WHERE id = ?
+            """, (rng.choice(actions), at, at, at, bid))
+            A._after_booking_write(conn, uid, (old_day, A._booking_day(conn, bid)))
+        else:                                   # Ticket "löschen"
+            bid = rng.choice(ids)
+            old_day = A._booking_day(conn, bid)
+            conn.execute("DELETE FROM bookings WHERE id = ?", (bid,))
+            A._after_booking_write(conn, uid, (old_day,))
+        conn.commit()
+
+    expected = _reference(conn, uid)
+    assert expected
+    assert _projection(conn, uid) == expected
+
+
+def test_full_rebuild_matches_incremental(conn):
+    uid = _new_user(conn, "rebuild")
+    for day in range(1, 4):
+        for hm, action in (("07:00", "bin da"), ("10:00", "päuschen"), ("10:20", "mache weiter"), ("15:30", "gehe")):
+            at = f"2026-06-0{day} {hm}:00"
+            bid = conn.execute(A.BOOKING_INSERT_AT_SQL, (uid, action, at, None, at, at)).lastrowid
+            A._after_booking_write(conn, uid, (A._booking_day(conn, bid),))
+    conn.commit()
+    incremental = _projection(conn, uid)
+
+    conn.execute("DELETE FROM daily_minutes WHERE user_id = ?", (uid,))
+    A._store_daily_rows(conn, uid, A._daily_rows_for_user(conn, uid))
+    conn.commit()
+    assert _projection(conn, uid) == incremental
+    assert all(m["net"] == 8 * 60 + 10 for m in incremental.values())
@@ -0,0 +1,85 @@
+# DB-Pool: offene Transaktionen werden vor der Wiederverwendung zurückgerollt, ein
+# erschöpfter Pool liefert nach DB_TIMEOUT 503 statt zu hängen, und nach fork()
+# (gunicorn --preload) nutzt der Worker keine Verbindung des Masters weiter.
+import os, sqlite3, time
+
+import pytest
+
+import app as A
+
+
+def _count_users(name):
+    c = sqlite3.connect(A.DB_PATH)
+    try:
+        return c.execute("SELECT COUNT(*) FROM users WHERE username = ?", (name,)).fetchone()[0]
+    finally:
+        c.close()
+
+
+def test_release_rolls_back_open_transaction():
+    pool = A._ConnectionPool(1)
+    conn = pool.acquire()
+    conn.execute("INSERT INTO users (username, password_hash, role) VALUES ('pool_uncommitted', 'x', 'user')")
+    assert conn.in_transaction
+    conn.close()                                   # zurück in den Pool, ohne commit
+
+    again = pool.acquire()
+    try:
+        assert again is conn and not again.in_transaction
+        assert again.execute("SELECT COUNT(*) FROM users WHERE username = 'pool_uncommitted'").fetchone()[0] == 0
+        assert _count_users("pool_uncommitted") == 0
+    finally:
+        again.close()
+    assert pool.snapshot()["idle"] == 1 and pool.snapshot()["discarded"] == 0
+    pool.close_idle()
+
+
+def test_exhausted_pool_returns_503(monkeypatch):
+    client = A.app.test_client()
+    client.post("/", data={"username": "mimi", "password": "geheim123"})
+
+    pool = A._ConnectionPool(1)
+    monkeypatch.setattr(A, "_db_pool", pool)
+    monkeypatch.setattr(A, "DB_TIMEOUT", 0.2)
+    held = pool.acquire()                          # einzige Verbindung belegt
+    try:
+        t0 = time.perf_counter()
+        r = client.get("/user")
+        elapsed = time.perf_counter() - t0
+    finally:
+        held.close()
+    assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+    assert 0.2 <= elapsed < 5
+
+    assert client.get("/user").status_code == 200  # Verbindung wieder frei
+    pool.close_idle()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="kein fork()")
+def test_pool_resets_after_fork():
+    pool = A._ConnectionPool(2)
+    master_idle = pool.acquire()
+    master_busy = pool.acquire()
+    master_idle.close()
+    assert pool.snapshot()["open"] == 2 and pool.snapshot()["idle"] == 1
+
+    pid = os.fork()
+    if pid == 0:                                   # Worker: Ergebnis nur über den Exit-Code
+        code = 1
+        try:
+            pool.release(master_busy)              # Verbindung des Masters landet nicht im Pool
+            conn = pool.acquire()
+            s = pool.snapshot()
+            ok = (conn is not master_idle and conn is not master_busy
+                  and s["open"] == 1 and s["idle"] == 0
+                  and conn.execute("SELECT 1").fetchone()[0] == 1)
+            code = 0 if ok else 2
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    # im Master bleibt alles beim Alten
+    assert pool.snapshot()["open"] == 2 and pool.snapshot()["idle"] == 1
+    master_busy.close()
+    pool.close_idle()
@@ -0,0 +1,42 @@
+# Sammel-Export: der Pool-Job (report_engine, Nur-Lese-Verbindung) liefert dieselbe CSV wie der Einzel-Export.
+import os, sqlite3
+from datetime import datetime
+
+import pytest
+
+import app as A
+import report_engine
+
+
+@pytest.fixture
+def admin():
+    c = A.app.test_client()
+    c.post("/", data={"username": "chef", "password": "secret123"})
+    return c
+
+
+def test_csv_job_matches_single_export(admin):
+    c = sqlite3.connect(A.DB_PATH)
+    uid, wm = c.execute("SELECT id, weekly_minutes FROM users WHERE username = 'mimi'").fetchone()
+    c.close()
+    start, end = datetime(2026, 10, 1), datetime(2026, 11, 1)
+    name, data, total = report_engine.report_csv_job(A.DB_PATH, uid, "mimi", wm, "month", start, end)
+    single = admin.get(f"/admin/reports/export?uid={uid}&period=month&y=2026&m=10").get_data()
+    assert name == "report_mimi_month_2026-10-01_2026-11-01.csv"
+    assert data == single
+    assert total[0] == "SUMME"
+
+
+def test_readonly_connection_cannot_write():
+    conn = report_engine.open_readonly(A.DB_PATH)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM users")
+    finally:
+        conn.close()
+
+
+def test_readonly_connection_does_not_create_db(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        report_engine.open_readonly(str(tmp_path / "missing.db")).execute("SELECT 1")
+    assert not os.path.exists(tmp_path / "missing.db")
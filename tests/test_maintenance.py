@@ -0,0 +1,41 @@
+# Wartungs-Thread: ein Tick ohne fällige Jobs schreibt nichts, die Lease hält andere Worker fern.
+import sqlite3
+
+import app as A
+
+
+def _data_version(conn):
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def test_idle_tick_does_not_write():
+    conn = A._open_connection()
+    watcher = sqlite3.connect(A.DB_PATH)
+    try:
+        for task in A.MAINTENANCE_TASKS:
+            assert A._run_maintenance_task(conn, task, "test", force=True) is not None
+        assert A._due_maintenance_tasks(conn) == []
+
+        before = _data_version(watcher)
+        for task in A._due_maintenance_tasks(conn):
+            A._run_maintenance_task(conn, task, "test")
+        assert _data_version(watcher) == before
+    finally:
+        watcher.close()
+        sqlite3.Connection.close(conn)
+
+
+def test_lease_is_claimed_once():
+    a, b = A._open_connection(), A._open_connection()
+    try:
+        a.execute("DELETE FROM maintenance_log WHERE task = 'optimize'")
+        a.commit()
+        assert "optimize" in A._due_maintenance_tasks(b)
+        assert A._claim_maintenance_task(a, "optimize", "worker-a", 3600, False)
+        assert "optimize" not in A._due_maintenance_tasks(b)
+        assert not A._claim_maintenance_task(b, "optimize", "worker-b", 3600, True)
+        owner = b.execute("SELECT lease_owner FROM maintenance_log WHERE task = 'optimize'").fetchone()[0]
+        assert owner == "worker-a"
+    finally:
+        sqlite3.Connection.close(a)
+        sqlite3.Connection.close(b)
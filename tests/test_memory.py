@@ -0,0 +1,31 @@
+# /admin/memory/start: Frame-Anzahl außerhalb 1..MEMTRACE_FRAMES_MAX -> 400 statt 500.
+import tracemalloc
+
+import pytest
+
+import app as A
+
+
+@pytest.fixture
+def admin():
+    c = A.app.test_client()
+    c.post("/", data={"username": "chef", "password": "secret123"})
+    yield c
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("frames", ["0", "-3", str(A.MEMTRACE_FRAMES_MAX + 1)])
+def test_start_rejects_invalid_frames(admin, frames):
+    r = admin.post("/admin/memory/start", data={"frames": frames})
+    assert r.status_code == 400
+    assert not tracemalloc.is_tracing()
+
+
+def test_start_and_stop(admin):
+    r = admin.post("/admin/memory/start", data={"frames": "3"})
+    assert r.status_code == 302
+    assert tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() == 3
+    assert admin.get("/admin/memory").status_code == 200
+    admin.post("/admin/memory/stop")
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,187 @@
+# Migrationen: alte DB (Stand vor schema_migrations) bzw. Baseline des alten init_db()
+# -> aktuelles Schema, erneuter Lauf ändert nichts, zwei gleichzeitige Läufe migrieren
+# nur einmal; danach gelten die Ticket-Indizes (ein offenes Ticket pro Buchung).
+import sqlite3, threading
+
+import pytest
+
+import migrate
+
+
+def _legacy_db(path):
+    """DB im Schema vor den versionierten Migrationen (alte Aktions-Keys, Tickets in bookings)."""
+    c = sqlite3.connect(path)
+    c.execute("""CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                 password_hash TEXT NOT NULL, role TEXT NOT NULL CHECK(role IN ('admin','user')))""")
+    c.execute("INSERT INTO users (username, password_hash, role) VALUES ('chef','x','admin'), ('mimi','x','user')")
+    c.execute("""CREATE TABLE bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                 action TEXT NOT NULL, created_at TEXT NOT NULL, note TEXT, needs_review INTEGER DEFAULT 0,
+                 ticket_action TEXT, ticket_message TEXT)""")
+    rows = []
+    for day in range(1, 61):
+        d = f"2026-{1 + (day - 1) // 28:02d}-{1 + (day - 1) % 28:02d}"
+        for action, hm in (("kommt", "08:00"), ("pause", "12:00"), ("pausenende", "12:30"), ("geht", "17:00")):
+            rows.append((2, action, f"{d} {hm}:00", 0, None, None))
+        if day % 5 == 0:      # Änderungswunsch zu einer echten Buchung
+            rows[-1] = (2, "geht", f"{d} 17:00:00", 1, "aendern", f"Tag {day}")
+        if day % 7 == 0:      # Blanko-Ticket (Schein-Buchung)
+            rows.append((2, "pausenende", f"{d} 18:00:00", 1, "blank", f"frei {day}"))
+    c.executemany("""INSERT INTO bookings (user_id, action, created_at, needs_review, ticket_action, ticket_message)
+                     VALUES (?,?,?,?,?,?)""", rows)
+    c.commit()
+    c.close()
+    return {"bookings": sum(1 for r in rows if r[4] != "blank"),
+            "tickets": sum(1 for r in rows if r[3]),
+            "blank": sum(1 for r in rows if r[4] == "blank")}
+
+
+def _state(path):
+    c = sqlite3.connect(path)
+    try:
+        return {
+            "migrations": [r[0] for r in c.execute("SELECT id FROM schema_migrations ORDER BY id")],
+            "version": c.execute("PRAGMA user_version").fetchone()[0],
+            "bookings": c.execute("SELECT id, user_id, action, created_at FROM bookings ORDER BY id").fetchall(),
+            "tickets": c.execute("""SELECT user_id, booking_id, action, message, created_at, closed_at
+                                    FROM tickets ORDER BY created_at, id""").fetchall(),
+            "ticket_counts": c.execute("SELECT * FROM ticket_counts ORDER BY user_id").fetchall(),
+            "progress": c.execute("SELECT COUNT(*) FROM migration_progress").fetchone()[0],
+        }
+    finally:
+        c.close()
+
+
+def _migrate(path, **kw):
+    c = sqlite3.connect(path, timeout=30)
+    try:
+        return migrate.Runner(c, progress=lambda *a: None, **kw).run()
+    finally:
+        c.close()
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    path = str(tmp_path / "users.db")
+    return path, _legacy_db(path)
+
+
+def test_legacy_db_migrates_to_current_schema(legacy):
+    path, n = legacy
+    applied = _migrate(path)
+    assert [mid for mid, _ in applied] == [mid for mid, _ in migrate.MIGRATIONS]
+
+    s = _state(path)
+    assert s["version"] == migrate.SCHEMA_VERSION
+    assert len(s["migrations"]) == len(migrate.MIGRATIONS)
+    assert s["progress"] == 0
+    assert len(s["bookings"]) == n["bookings"]
+    assert {a for _, _, a, _ in s["bookings"]} <= set(migrate.CANONICAL_ACTIONS)
+    assert len(s["tickets"]) == n["tickets"]
+    assert sum(1 for t in s["tickets"] if t[1] is None) == n["blank"]
+    assert s["ticket_counts"] == [(2, n["tickets"])]
+
+
+def test_rerun_is_a_no_op(legacy):
+    path, _ = legacy
+    _migrate(path)
+    before = _state(path)
+    assert _migrate(path) == []
+    assert _state(path) == before
+
+
+def test_concurrent_runners_migrate_once(legacy, tmp_path):
+    path, n = legacy
+    ref = str(tmp_path / "ref.db")
+    _legacy_db(ref)
+    _migrate(ref)
+    expected = _state(ref)
+
+    # kleine Batches + Pause: die Läufe überlappen sicher, falls die Sperre fehlt
+    start = threading.Barrier(2)
+    results, errors = [], []
+
+    def worker():
+        try:
+            start.wait()
+            results.append(_migrate(path, batch=7, pause=0.001))
+        except Exception as e:        # im Haupt-Thread auswerten
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+
+    assert errors == []
+    assert sorted(len(r) for r in results) == [0, len(migrate.MIGRATIONS)]
+    s = _state(path)
+    assert s == expected
+    assert sum(1 for t in s["tickets"] if t[1] is None) == n["blank"]
+
+
+def test_baseline_db_from_old_init_db(tmp_path, monkeypatch):
+    # Stand des alten init_db(): Schema bis 0007, PRAGMA user_version = 1, kein schema_migrations
+    path = str(tmp_path / "users.db")
+    with monkeypatch.context() as m:
+        m.setattr(migrate, "MIGRATIONS", migrate.MIGRATIONS[:7])
+        _migrate(path)
+    c = sqlite3.connect(path)
+    c.execute("INSERT INTO users (username, password_hash, role) VALUES ('mimi', 'x', 'user')")
+    c.executemany("""INSERT INTO bookings (user_id, action, created_at, ts, local_day, needs_review,
+                                           ticket_action, ticket_message)
+                     VALUES (1, ?, ?, CAST(strftime('%s', ?) AS INTEGER), date(?, 'localtime'), ?, ?, ?)""", [
+        ("bin da", "2026-04-01 06:00:00", "2026-04-01 06:00:00", "2026-04-01 06:00:00", 0, None, None),
+        ("gehe", "2026-04-01 15:00:00", "2026-04-01 15:00:00", "2026-04-01 15:00:00", 1, "loeschen", "doppelt"),
+        ("mache weiter", "2026-04-02 09:00:00", "2026-04-02 09:00:00", "2026-04-02 09:00:00", 1, "blank", "frei"),
+    ])
+    c.execute("DROP TABLE schema_migrations")
+    c.execute("DROP TABLE migration_progress")
+    c.execute("PRAGMA user_version = 1")
+    c.commit()
+    c.close()
+
+    applied = [mid for mid, _ in _migrate(path)]
+    assert applied == [mid for mid, _ in migrate.MIGRATIONS[7:]]
+    s = _state(path)
+    assert s["version"] == migrate.SCHEMA_VERSION
+    assert [b[2] for b in s["bookings"]] == ["bin da", "gehe"]
+    assert [(t[1], t[2], t[3]) for t in s["tickets"]] == [(2, "loeschen", "doppelt"), (None, None, "frei")]
+    assert s["ticket_counts"] == [(1, 2)]
+
+
+def test_open_ticket_unique_per_booking(legacy):
+    path, _ = legacy
+    _migrate(path)
+    c = sqlite3.connect(path)
+    try:
+        booking = c.execute("SELECT booking_id FROM tickets WHERE booking_id IS NOT NULL LIMIT 1").fetchone()[0]
+        with pytest.raises(sqlite3.IntegrityError):
+            c.execute("INSERT INTO tickets (user_id, booking_id, created_at) VALUES (2, ?, datetime('now'))", (booking,))
+        c.execute("UPDATE tickets SET closed_at = datetime('now') WHERE booking_id = ?", (booking,))
+        c.execute("INSERT INTO tickets (user_id, booking_id, created_at) VALUES (2, ?, datetime('now'))", (booking,))
+        # Blanko-Tickets (ohne Buchung) beliebig oft
+        c.executemany("INSERT INTO tickets (user_id, booking_id, created_at) VALUES (2, NULL, datetime('now'))", [(), ()])
+        plan = " ".join(r[3] for r in c.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM tickets WHERE closed_at IS NULL ORDER BY created_at DESC, id DESC LIMIT 25"))
+        assert "idx_tickets_open" in plan and "TEMP B-TREE" not in plan
+    finally:
+        c.close()
+
+
+def test_status_is_read_only(legacy, capsys):
+    path, _ = legacy
+    with open(path, "rb") as f:
+        before = f.read()
+    migrate.main([path, "--status"])
+    assert "nicht initialisiert" in capsys.readouterr().out
+    with open(path, "rb") as f:
+        assert f.read() == before
+
+    _migrate(path)
+    c = sqlite3.connect(path)
+    c.execute("PRAGMA journal_mode=WAL")          # wie die App
+    c.close()
+    migrate.main([path, "--status"])
+    out = capsys.readouterr().out
+    assert out.count("✅") == len(migrate.MIGRATIONS) and "⏳" not in out
@@ -0,0 +1,70 @@
+# /presence.json: ETag p<pv> mit 304 und ?since=<pv> als Delta.
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app as A
+
+
+@pytest.fixture
+def client():
+    c = A.app.test_client()
+    c.post("/", data={"username": "mimi", "password": "geheim123"})
+    return c
+
+
+def _book(uid, action, minutes_ago):
+    conn = A._open_connection()
+    try:
+        at = (datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)).strftime("%Y-%m-%d %H:%M:%S")
+        bid = conn.execute(A.BOOKING_INSERT_AT_SQL, (uid, action, at, None, at, at)).lastrowid
+        A._after_booking_write(conn, uid, (A._booking_day(conn, bid),))
+        conn.commit()
+    finally:
+        sqlite3.Connection.close(conn)
+
+
+@pytest.fixture
+def uid():
+    conn = sqlite3.connect(A.DB_PATH)
+    uid = conn.execute(
+        "INSERT INTO users (username, password_hash, role, weekly_minutes) VALUES ('pollbert', 'x', 'user', 2400)"
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return uid
+
+
+def test_etag_304_and_since_delta(client, uid):
+    r0 = client.get("/presence.json")
+    assert r0.status_code == 200 and r0.json["delta"] is False
+    etag0, pv0 = r0.headers["ETag"], r0.json["pv"]
+    assert etag0 == f'"p{pv0}"'
+
+    r = client.get("/presence.json", headers={"If-None-Match": etag0})
+    assert r.status_code == 304 and r.headers["ETag"] == etag0 and not r.data
+
+    _book(uid, "bin da", 60)
+    r1 = client.get("/presence.json", headers={"If-None-Match": etag0})
+    assert r1.status_code == 200 and r1.headers["ETag"] != etag0
+    pv1 = r1.json["pv"]
+    assert pv1 > pv0
+    assert "pollbert" in [p["username"] for p in r1.json["present"]]
+
+    d = client.get(f"/presence.json?since={pv0}").json
+    assert d["delta"] is True and d["pv"] == pv1
+    assert [p["username"] for p in d["upsert"]] == ["pollbert"] and d["remove"] == []
+
+    _book(uid, "gehe", 30)
+    d = client.get(f"/presence.json?since={pv1}").json
+    assert d["delta"] is True and d["upsert"] == [] and d["remove"] == ["pollbert"]
+
+    d = client.get(f"/presence.json?since={d['pv']}").json
+    assert d["delta"] is True and d["upsert"] == [] and d["remove"] == []
+
+
+def test_unknown_since_falls_back_to_snapshot(client):
+    pv = client.get("/presence.json").json["pv"]
+    d = client.get(f"/presence.json?since={pv + 1000}").json
+    assert d["delta"] is False and "present" in d
@@ -0,0 +1,43 @@
+# Profiler auf Abruf: höchstens ein Profil pro Prozess, belegt -> Request läuft ohne Profil weiter.
+import pytest
+
+import app as A
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(A, "PROFILE_MIN_INTERVAL_S", 0)
+    c = A.app.test_client()
+    c.post("/", data={"username": "chef", "password": "secret123"})
+    return c
+
+
+def test_profile_recorded(admin):
+    r = admin.get("/admin/profiles?_profile=1")
+    assert r.status_code == 200
+    pid = r.headers["X-Profile-Id"]
+    assert any(p["id"] == pid and "concurrent" in p for p in A._list_profiles())
+    assert not A._profile_active.locked()
+
+
+def test_second_profile_is_skipped_while_one_runs(admin):
+    assert A._profile_active.acquire(blocking=False)     # ein Profil läuft schon
+    try:
+        r = admin.get("/admin/profiles?_profile=1")
+    finally:
+        A._profile_active.release()
+    assert r.status_code == 200
+    assert r.headers["X-Profile-Skipped"] == "busy"
+    assert "X-Profile-Id" not in r.headers
+
+
+def test_foreign_profiler_does_not_fail_request(admin, monkeypatch):
+    class Busy:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(A.cProfile, "Profile", Busy)
+    r = admin.get("/admin/profiles?_profile=1")
+    assert r.status_code == 200
+    assert r.headers["X-Profile-Skipped"] == "busy"
+    assert not A._profile_active.locked()
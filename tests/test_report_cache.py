@@ -0,0 +1,71 @@
+# Report-Cache: eine Buchung erhöht report_versions, der nächste Report zeigt sie sofort;
+# der Cache hält sich an REPORT_CACHE_ENTRIES / REPORT_CACHE_ROWS (LRU).
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import app as A
+
+
+@pytest.fixture
+def conn():
+    c = A._open_connection()
+    yield c
+    sqlite3.Connection.close(c)
+
+
+@pytest.fixture
+def uid(conn):
+    n = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    uid = conn.execute(
+        "INSERT INTO users (username, password_hash, role, weekly_minutes) VALUES (?, 'x', 'user', 2400)",
+        (f"cache{n}",)
+    ).lastrowid
+    conn.commit()
+    return uid
+
+
+def _book(conn, uid, action, at):
+    bid = conn.execute(A.BOOKING_INSERT_AT_SQL, (uid, action, at, None, at, at)).lastrowid
+    A._after_booking_write(conn, uid, (A._booking_day(conn, bid),))
+    conn.commit()
+
+
+def test_booking_invalidates_cached_report(conn, uid):
+    start, end = datetime(2026, 5, 1), datetime(2026, 6, 1)
+    _book(conn, uid, "bin da", "2026-05-04 08:00:00")
+    _book(conn, uid, "gehe", "2026-05-04 12:00:00")
+    days, sums = A._report_days(conn, uid, start, end)
+    assert sums["work"] == 240
+    assert A._report_days(conn, uid, start, end)[1] is sums          # Treffer: dasselbe Objekt
+
+    stale = A._report_cache.stale
+    _book(conn, uid, "bin da", "2026-05-05 08:00:00")
+    _book(conn, uid, "gehe", "2026-05-05 09:30:00")
+    days, sums = A._report_days(conn, uid, start, end)
+    assert A._report_cache.stale == stale + 1
+    assert sums["work"] == 240 + 90
+    assert [d["work"] for d in days if d["date"] in ("2026-05-04", "2026-05-05")] == [240, 90]
+
+
+def test_eviction_by_entries_and_rows():
+    assert (A._report_cache.max_entries, A._report_cache.max_rows) == (A.REPORT_CACHE_ENTRIES, A.REPORT_CACHE_ROWS)
+    cache = A._ReportCache(max_entries=3, max_rows=10)
+    for i in range(4):
+        cache.put(i, 1, f"v{i}", 2)
+    assert cache.get(0, 1) is None                      # ältester Eintrag verdrängt
+    assert cache.snapshot()["entries"] == 3 and cache.evictions == 1
+
+    assert cache.get(1, 1) == "v1"                      # 1 frisch benutzt -> 2 ist jetzt der älteste
+    cache.put(4, 1, "v4", 7)                            # 2+2+2+7 Zeilen > 10
+    assert cache.get(2, 1) is None and cache.get(3, 1) is None
+    assert cache.get(1, 1) == "v1" and cache.get(4, 1) == "v4"
+    s = cache.snapshot()
+    assert (s["entries"], s["rows"], s["evictions"]) == (2, 9, 3)
+
+    cache.put(5, 1, "zu groß", 11)                      # größer als max_rows: gar nicht erst cachen
+    assert cache.get(5, 1) is None and cache.snapshot()["rows"] == 9
+
+    assert cache.get(4, 2) is None                      # andere Version -> stale, Eintrag fliegt raus
+    assert cache.stale == 1 and cache.snapshot()["rows"] == 2
@@ -0,0 +1,42 @@
+# Perioden-Engine: compute_period_minutes liefert pro Tag dasselbe wie die Referenz compute_day_minutes.
+import calendar, random, time
+from datetime import date, timedelta
+
+import pytest
+
+import report_engine as E
+
+# heutige und alte Aktions-Keys, beide zählen
+ACTIONS = sorted(E.WORK_START | E.WORK_END | E.BRK_START | E.BRK_END | E.AFK_START | E.AFK_END)
+
+
+def _random_days(rng, n_days, start=date(2026, 3, 1)):
+    """(local_day, lokale Sekunden, action) – wilde Reihenfolgen inkl. Fehlbuchungen."""
+    events = []
+    for i in range(n_days):
+        d = start + timedelta(days=i)
+        t = calendar.timegm(d.timetuple()) + rng.randint(6 * 3600, 9 * 3600)
+        for _ in range(rng.randint(1, 12)):
+            events.append((d.isoformat(), t, rng.choice(ACTIONS)))
+            t += rng.choice((0, 30, 59, 60, 61, rng.randint(60, 3 * 3600)))
+    return events
+
+
+def _reference(events):
+    by_day = {}
+    for day, t, action in events:
+        by_day.setdefault(day, []).append((time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t)), action))
+    return {day: E.compute_day_minutes(evts) for day, evts in by_day.items()}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_period_engine_matches_day_reference(seed):
+    events = _random_days(random.Random(seed), 60)
+    days, work, breaks, afk, net, flags = E.compute_period_minutes(events)
+    got = {d: {"work": w, "breaks": b, "afk": a, "net": n, "flags": f or []}
+           for d, w, b, a, n, f in zip(days, work, breaks, afk, net, flags)}
+    assert got == _reference(events)
+
+
+def test_empty_period():
+    assert [list(c) for c in E.compute_period_minutes([])] == [[], [], [], [], [], []]
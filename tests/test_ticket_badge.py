@@ -0,0 +1,34 @@
+# Ticket-Badge: nur Admin-Seiten fragen ticket_counts ab, höchstens einmal pro Request.
+from flask import template_rendered
+
+import app as A
+
+
+def _login(username, password):
+    c = A.app.test_client()
+    c.post("/", data={"username": username, "password": password})
+    return c
+
+
+def _contexts(client, url):
+    seen = []
+    def record(sender, template, context, **extra):
+        seen.append(context)
+    with template_rendered.connected_to(record, A.app):
+        assert client.get(url).status_code == 200
+    return seen
+
+
+def test_user_pages_skip_badge_query():
+    contexts = _contexts(_login("mimi", "geheim123"), "/user")
+    assert contexts and all("open_tickets" not in c for c in contexts)
+
+
+def test_admin_badge_queried_once_per_request():
+    with A.app.test_request_context("/admin"):
+        A.session["role"] = "admin"
+        A.session["user_id"] = 1
+        first = A._inject_ticket_badge()
+        A.g._open_tickets = 42            # zweiter Aufruf im selben Request: aus g
+        assert A._inject_ticket_badge() == {"open_tickets": 42}
+    assert isinstance(first["open_tickets"], int)